@@ -0,0 +1,3 @@
+"""
+AIER Alert System - FastAPI Backend package
+"""
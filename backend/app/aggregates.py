@@ -0,0 +1,314 @@
+"""
+AIER Alert System - Materialized Patient Aggregates
+Incrementally maintained counts, sums and bucket tallies behind
+/api/statistics and /api/visualizations/distribution
+
+All aggregates live in a single item of the aggregates table as flat
+numeric attributes, so ingestion can update them atomically with one
+UpdateItem ADD and the API can read them with one GetItem.
+
+Usage (from backend/):
+    python -m app.aggregates rebuild
+    python -m app.aggregates show
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+from .database import DYNAMODB_BACKEND, create_table
+from .local_table import InMemoryTable
+from .projection import projection
+from .scan import Reducer, scan_table
+
+AGGREGATES_TABLE = os.getenv("AGGREGATES_TABLE_NAME", "aier-patient-aggregates")
+AGGREGATE_ID = "patients"
+# Items recording which loads were applied, expired by TTL afterwards
+MARKER_PREFIX = "applied#"
+AGGREGATE_MARKER_DAYS = int(os.getenv("AGGREGATE_MARKER_DAYS", "30"))
+
+AGE_RANGES = ['<30', '30-40', '40-50', '50-60', '60+']
+
+# Attributes read when aggregating from a table scan
+AGGREGATE_FIELDS = ('Outcome', 'Glucose', 'BMI', 'Age', 'risk_level', 'age_group')
+
+# Flat counter attribute names
+TOTAL = 'patient_count'
+OUTCOME_POSITIVE = 'outcome_positive'
+SUM_GLUCOSE = 'sum_glucose'
+SUM_BMI = 'sum_bmi'
+SUM_AGE = 'sum_age'
+RISK_PREFIX = 'risk#'
+AGE_GROUP_PREFIX = 'age_group#'
+AGE_RANGE_PREFIX = 'age_range#'
+
+
+def age_range(age) -> str:
+    """Bucket an age into the distribution chart ranges"""
+    age = int(age)
+    if age < 30:
+        return '<30'
+    elif age < 40:
+        return '30-40'
+    elif age < 50:
+        return '40-50'
+    elif age < 60:
+        return '50-60'
+    return '60+'
+
+
+def _label(value, default):
+    """Normalize a categorical value; missing and NaN map to the default"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return default
+    return str(value)
+
+
+def compute_deltas(items, sign: int = 1) -> dict:
+    """
+    Compute aggregate counter deltas for a batch of patient records
+
+    Parameters:
+    - items: Iterable of patient dictionaries (DynamoDB items or CSV rows)
+    - sign: 1 when records are added, -1 when they are removed
+    """
+    deltas = {TOTAL: 0, OUTCOME_POSITIVE: 0}
+    sums = {SUM_GLUCOSE: 0.0, SUM_BMI: 0.0, SUM_AGE: 0.0}
+
+    for item in items:
+        deltas[TOTAL] += 1
+        if int(item.get('Outcome', 0)) == 1:
+            deltas[OUTCOME_POSITIVE] += 1
+
+        sums[SUM_GLUCOSE] += float(item.get('Glucose', 0))
+        sums[SUM_BMI] += float(item.get('BMI', 0))
+        sums[SUM_AGE] += float(item.get('Age', 0))
+
+        for attr in (
+            RISK_PREFIX + _label(item.get('risk_level'), 'UNKNOWN'),
+            AGE_GROUP_PREFIX + _label(item.get('age_group'), 'Unknown'),
+            AGE_RANGE_PREFIX + age_range(item.get('Age', 0)),
+        ):
+            deltas[attr] = deltas.get(attr, 0) + 1
+
+    counters = {k: Decimal(v * sign) for k, v in deltas.items() if v}
+    counters.update({k: Decimal(str(round(v * sign, 6))) for k, v in sums.items() if v})
+    return counters
+
+
+def merge_counters(left: dict, right: dict) -> dict:
+    """Add two counter dictionaries together"""
+    for attr, value in right.items():
+        left[attr] = left.get(attr, 0) + value
+    return left
+
+
+def net_deltas(added, removed) -> dict:
+    """
+    Counter deltas for replacing `removed` records with `added` ones
+
+    Counters that cancel out are left out.
+    """
+    deltas = merge_counters(compute_deltas(added), compute_deltas(removed, -1))
+    return {k: v for k, v in deltas.items() if v}
+
+
+class AggregateReducer(Reducer):
+    """Scan reducer computing aggregate counters page by page"""
+
+    def initial(self):
+        return {}
+
+    def step(self, acc, items):
+        return merge_counters(acc, compute_deltas(items))
+
+    def merge(self, left, right):
+        return merge_counters(left, right)
+
+
+def to_statistics(counters: dict) -> dict:
+    """Build the /api/statistics payload from aggregate counters"""
+    total = int(counters.get(TOTAL, 0))
+
+    def average(attr):
+        return round(float(counters.get(attr, 0)) / total, 1) if total > 0 else 0
+
+    return {
+        "total_patients": total,
+        "diabetes_prevalence": round(int(counters.get(OUTCOME_POSITIVE, 0)) / total, 3) if total > 0 else 0,
+        "risk_distribution": _tallies(counters, RISK_PREFIX),
+        "age_distribution": _tallies(counters, AGE_GROUP_PREFIX),
+        "averages": {
+            "glucose": average(SUM_GLUCOSE),
+            "bmi": average(SUM_BMI),
+            "age": average(SUM_AGE)
+        }
+    }
+
+
+def to_distribution(counters: dict) -> dict:
+    """Build the /api/visualizations/distribution payload from aggregate counters"""
+    age_ranges = {r: 0 for r in AGE_RANGES}
+    age_ranges.update(_tallies(counters, AGE_RANGE_PREFIX))
+    return {
+        "age_distribution": age_ranges,
+        "risk_distribution": _tallies(counters, RISK_PREFIX)
+    }
+
+
+def _tallies(counters, prefix):
+    return {
+        name[len(prefix):]: int(value)
+        for name, value in counters.items()
+        if name.startswith(prefix) and int(value) != 0
+    }
+
+
+def create_aggregates_table(
+    table_name: str = AGGREGATES_TABLE,
+    backend: str = DYNAMODB_BACKEND
+):
+    """Create the aggregates Table resource (or the in-memory stand-in)"""
+    if backend == "memory":
+        return InMemoryTable(table_name, hash_key='aggregate_id', range_key=None, indexes={})
+    return create_table(table_name, backend)
+
+
+class AggregateStore:
+    """
+    Read and maintain the materialized aggregate item
+
+    Parameters:
+    - table: Aggregates table (hash key `aggregate_id`)
+    - aggregate_id: Item holding the patient aggregates
+    """
+
+    def __init__(self, table, aggregate_id: str = AGGREGATE_ID):
+        self.table = table
+        self.aggregate_id = aggregate_id
+
+    def load(self):
+        """Return the counters, or None if the aggregates were never built"""
+        response = self.table.get_item(
+            Key={'aggregate_id': self.aggregate_id},
+            ConsistentRead=True
+        )
+        item = response.get('Item')
+        if item is None:
+            return None
+        item.pop('aggregate_id', None)
+        return item
+
+    def apply(self, items, sign: int = 1):
+        """
+        Atomically add the deltas for a batch of ingested records
+
+        Parameters:
+        - items: Patient records that were written (or removed) from the table
+        - sign: 1 for additions, -1 for removals
+        """
+        return self.add(compute_deltas(items, sign))
+
+    def add(self, deltas: dict, marker: str = None):
+        """
+        Atomically add counter deltas
+
+        Parameters:
+        - deltas: Counter deltas (see compute_deltas / net_deltas)
+        - marker: Identity of the change (e.g. a chunk of a source file
+          version). The deltas are added in one transaction with a
+          conditional marker item, so a redelivered or re-run change is
+          counted once. Markers expire after AGGREGATE_MARKER_DAYS.
+
+        Returns the deltas, or None when `marker` was already applied.
+        """
+        if not deltas:
+            return deltas
+
+        names = {}
+        values = {}
+        clauses = []
+        for i, (attr, value) in enumerate(deltas.items()):
+            names[f"#a{i}"] = attr
+            values[f":v{i}"] = value
+            clauses.append(f"#a{i} :v{i}")
+        update = "ADD " + ", ".join(clauses)
+
+        if marker is None:
+            self.table.update_item(
+                Key={'aggregate_id': self.aggregate_id},
+                UpdateExpression=update,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+            return deltas
+
+        serialize = TypeSerializer().serialize
+        expires_at = int(time.time()) + AGGREGATE_MARKER_DAYS * 86400
+        try:
+            self.table.meta.client.transact_write_items(TransactItems=[
+                {'Put': {
+                    'TableName': self.table.name,
+                    'Item': {
+                        'aggregate_id': {'S': MARKER_PREFIX + marker},
+                        'expires_at': {'N': str(expires_at)}
+                    },
+                    'ConditionExpression': 'attribute_not_exists(aggregate_id)'
+                }},
+                {'Update': {
+                    'TableName': self.table.name,
+                    'Key': {'aggregate_id': {'S': self.aggregate_id}},
+                    'UpdateExpression': update,
+                    'ExpressionAttributeNames': names,
+                    'ExpressionAttributeValues': {k: serialize(v) for k, v in values.items()}
+                }}
+            ])
+        except ClientError as e:
+            reasons = e.response.get('CancellationReasons') or [{}]
+            if reasons[0].get('Code') == 'ConditionalCheckFailed':
+                return None
+            raise
+        return deltas
+
+    def replace(self, counters: dict):
+        """Overwrite the aggregate item with freshly computed counters"""
+        item = dict(counters)
+        item['aggregate_id'] = self.aggregate_id
+        self.table.put_item(Item=item)
+
+    def rebuild(self, patient_table):
+        """
+        Recompute the aggregates from a full scan of the patient table
+
+        Use when the aggregates drift (failed ingestion, manual edits).
+        Runs a parallel segmented scan (SCAN_SEGMENTS, SCAN_READ_BUDGET).
+        """
+        counters = scan_table(patient_table, AggregateReducer(), **projection(AGGREGATE_FIELDS))
+        self.replace(counters)
+        return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AIER Patient Aggregates')
+    parser.add_argument('command', choices=['rebuild', 'show'], help='Action to perform')
+    args = parser.parse_args()
+
+    store = AggregateStore(create_aggregates_table())
+
+    if args.command == 'rebuild':
+        print("Rebuilding aggregates from a full table scan...")
+        counters = store.rebuild(create_table())
+    else:
+        counters = store.load() or {}
+
+    print(json.dumps(to_statistics(counters), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+AIER Alert System - Batch Patient Lookup
+Latest record for many patients with bounded parallelism and retries
+
+The table key is (patient_id, timestamp) and callers only know the
+patient_id, so BatchGetItem cannot address the latest record directly.
+Instead each id gets a Limit=1 newest-first key query; the queries run
+concurrently on the AsyncTable executor, capped by a semaphore.
+"""
+
+import asyncio
+import os
+import random
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from .database import AsyncTable
+
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "16"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "4"))
+
+RETRYABLE_ERRORS = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'InternalServerError',
+}
+
+
+async def _latest(db: AsyncTable, patient_id: str, max_retries: int, **kwargs):
+    """Newest item for one patient, retrying throttled requests with backoff"""
+    for attempt in range(max_retries + 1):
+        try:
+            response = await db.query(
+                KeyConditionExpression=Key('patient_id').eq(patient_id),
+                ScanIndexForward=False,  # Most recent first
+                Limit=1,
+                **kwargs
+            )
+            items = response.get('Items', [])
+            return items[0] if items else None
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code not in RETRYABLE_ERRORS or attempt == max_retries:
+                raise
+            # Exponential backoff with full jitter
+            await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+
+async def fetch_latest(
+    db: AsyncTable,
+    patient_ids,
+    max_parallel: int = BATCH_MAX_PARALLEL,
+    max_retries: int = BATCH_MAX_RETRIES,
+    **kwargs
+):
+    """
+    Fetch the latest record for each patient id
+
+    Parameters:
+    - db: AsyncTable to query
+    - patient_ids: Ids to look up; duplicates are fetched once
+    - max_parallel: Maximum queries in flight for this batch
+    - max_retries: Retries per id for throttled requests
+    - kwargs: Extra query parameters (e.g. ProjectionExpression)
+
+    Returns (found, missing): found items in first-seen request order and
+    the ids that have no records.
+    """
+    unique_ids = list(dict.fromkeys(patient_ids))
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def bounded(patient_id):
+        async with semaphore:
+            return await _latest(db, patient_id, max_retries, **kwargs)
+
+    results = await asyncio.gather(*(bounded(pid) for pid in unique_ids))
+
+    found = [item for item in results if item is not None]
+    missing = [pid for pid, item in zip(unique_ids, results) if item is None]
+    return found, missing
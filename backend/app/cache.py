@@ -0,0 +1,176 @@
+"""
+AIER Alert System - Response Cache
+In-process cache for read endpoints with request coalescing,
+stale-while-revalidate and ETag/If-None-Match support
+
+The ETag covers the payload without its build time
+(`metadata.timestamp`), so a refresh over unchanged data keeps the
+validator and polling clients keep getting 304s.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from .responses import encode_json
+
+logger = logging.getLogger(__name__)
+
+# Per-route freshness in seconds; after the TTL an entry is served stale
+# for up to CACHE_STALE_SECONDS while a background refresh runs
+ROUTE_TTLS = {
+    "statistics": float(os.getenv("CACHE_TTL_STATISTICS", "30")),
+    "scatter": float(os.getenv("CACHE_TTL_SCATTER", "60")),
+    "distribution": float(os.getenv("CACHE_TTL_DISTRIBUTION", "30")),
+}
+DEFAULT_TTL = float(os.getenv("CACHE_TTL_DEFAULT", "30"))
+STALE_SECONDS = float(os.getenv("CACHE_STALE_SECONDS", "300"))
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+
+
+# Payload metadata that changes on every build without the data changing
+VOLATILE_METADATA = ('timestamp',)
+
+
+def _validated_part(payload):
+    """The payload without its volatile metadata"""
+    metadata = payload.get('metadata') if isinstance(payload, dict) else None
+    if not isinstance(metadata, dict):
+        return payload
+    return {
+        **payload,
+        'metadata': {k: v for k, v in metadata.items() if k not in VOLATILE_METADATA}
+    }
+
+
+class CacheEntry:
+    """Encoded response body with its validator and age"""
+
+    __slots__ = ("body", "etag", "created")
+
+    def __init__(self, payload):
+        self.body = encode_json(payload)
+        digest = hashlib.sha1(encode_json(_validated_part(payload))).hexdigest()
+        self.etag = '"' + digest + '"'
+        self.created = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.created
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of encoded responses
+
+    Parameters:
+    - max_entries: Maximum cached responses before the least recently
+      used entry is evicted
+    - stale_seconds: How long past its TTL an entry may still be served
+      while it is refreshed in the background
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, stale_seconds: float = STALE_SECONDS):
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self._entries = OrderedDict()
+        # key -> fetch task shared by every caller waiting for the key
+        self._inflight = {}
+        # Background refreshes, referenced until done so they are not
+        # garbage collected mid-run
+        self._tasks = set()
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def _fill(self, key, fetch):
+        """
+        Run fetch once per key; concurrent callers share the result
+
+        The fetch runs in its own task and every caller awaits it through
+        asyncio.shield, so a cancelled caller (e.g. a disconnected
+        client) only stops waiting and never cancels the others' fetch.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._build(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    async def _build(self, key, fetch):
+        entry = CacheEntry(await fetch())
+        self._store(key, entry)
+        return entry
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved: a failure nobody awaited anymore is not logged twice
+            task.exception()
+
+    async def _refresh(self, key, fetch):
+        try:
+            await self._fill(key, fetch)
+        except Exception as e:
+            logger.warning("Background refresh of %s failed: %s", key, e)
+
+    async def get(self, key, fetch, ttl: float = DEFAULT_TTL) -> CacheEntry:
+        """
+        Return a cached entry for key, fetching it if needed
+
+        Parameters:
+        - key: Cache key
+        - fetch: Async callable returning the JSON payload
+        - ttl: Seconds the entry is considered fresh
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = entry.age()
+            if age < ttl:
+                self._entries.move_to_end(key)
+                return entry
+            if age < ttl + self.stale_seconds:
+                if key not in self._inflight:
+                    task = asyncio.create_task(self._refresh(key, fetch))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                self._entries.move_to_end(key)
+                return entry
+
+        return await self._fill(key, fetch)
+
+    async def respond(self, request: Request, route: str, fetch, key=None) -> Response:
+        """
+        Serve a cached JSON response, or 304 when the client copy is current
+
+        Parameters:
+        - request: Incoming request (for If-None-Match)
+        - route: Route name used to look up the TTL
+        - fetch: Async callable returning the JSON payload
+        - key: Cache key (defaults to the route name)
+        """
+        ttl = ROUTE_TTLS.get(route, DEFAULT_TTL)
+        entry = await self.get(key or route, fetch, ttl)
+
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and entry.etag in [t.strip() for t in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=entry.body, media_type="application/json", headers=headers)
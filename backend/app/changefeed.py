@@ -0,0 +1,541 @@
+"""
+AIER Alert System - Alert Change Feed
+Fans out new and changed HIGH/CRITICAL patients to server-sent event
+subscribers
+
+Changes come from one source per process, either the patient table's
+DynamoDB Stream or the snapshot refresh. On the in-memory backend, the
+stand-in stream of local_table.InMemoryTable replaces the DynamoDB
+Stream.
+
+DynamoDB Streams serves only about two concurrent readers per shard, so
+a StreamLease makes sure that only one process reads the stream, across
+workers and instances. That process holds a lease item, renewed while
+it reads. Every other process diffs its snapshot refreshes instead, and
+retries the lease every CHANGEFEED_LEASE_SECONDS. When the reader stops
+renewing, the next process to retry takes over the stream. A reader
+that cannot renew its lease switches to the snapshot and starts
+retrying itself. Changes made during a handover may be missed, since a
+new reader starts at the end of the stream. Each alert is encoded once into an SSE frame and stored in a
+ring buffer under an increasing sequence number. Publishing costs the
+same however many clients are connected. Every client reads the ring
+at its own pace with its own cursor, so a slow client only falls
+behind itself. A client that falls more than CHANGEFEED_BUFFER events
+behind gets a `reset` event and continues from the newest event.
+
+Event ids are "<epoch>-<sequence>". The epoch changes on every restart.
+A reconnecting client sends its last id (Last-Event-ID) and resumes
+right after it. If that id is no longer in the ring, the client gets a
+`reset` event and should reload /api/patients.
+"""
+
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+from .database import AWS_REGION
+from .models import PATIENT_FIELDS
+from .responses import encode_json
+
+logger = logging.getLogger(__name__)
+
+# "stream" (DynamoDB Stream, falling back to the snapshot when the table
+# has none), "snapshot" or "off"
+CHANGEFEED_SOURCE = os.getenv("CHANGEFEED_SOURCE", "stream")
+# Risk levels that raise an alert
+ALERT_LEVELS = tuple(
+    level.strip() for level in os.getenv("ALERT_LEVELS", "HIGH,CRITICAL").split(",") if level.strip()
+)
+# Events kept for resuming clients
+CHANGEFEED_BUFFER = int(os.getenv("CHANGEFEED_BUFFER", "10000"))
+CHANGEFEED_POLL_SECONDS = float(os.getenv("CHANGEFEED_POLL_SECONDS", "1"))
+CHANGEFEED_HEARTBEAT_SECONDS = float(os.getenv("CHANGEFEED_HEARTBEAT_SECONDS", "15"))
+CHANGEFEED_MAX_CLIENTS = int(os.getenv("CHANGEFEED_MAX_CLIENTS", "1000"))
+# Stream reader lease: lifetime without renewal, and the item holding it
+CHANGEFEED_LEASE_SECONDS = float(os.getenv("CHANGEFEED_LEASE_SECONDS", "30"))
+CHANGEFEED_LEASE_ID = os.getenv("CHANGEFEED_LEASE_ID", "lease#changefeed-stream")
+
+# Frames written to a client per send
+SEND_BATCH = 500
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+
+class ChangeFeed:
+    """
+    Sequence-numbered ring buffer of alert events
+
+    An alert is published when a patient's newest reading is at one of
+    `levels`. A `cleared` event follows when a later reading (or the
+    removal of the alerting one) takes the patient out of them.
+
+    Parameters:
+    - levels: Risk levels that raise an alert
+    - capacity: Events kept for resuming clients
+    """
+
+    def __init__(self, levels=ALERT_LEVELS, capacity: int = CHANGEFEED_BUFFER):
+        self.levels = frozenset(levels)
+        self.capacity = capacity
+        # Where published changes come from: "stream", "snapshot" or "off"
+        self.source = "off"
+        self.epoch = secrets.token_hex(4)
+        self.sequence = 0
+        self.subscribers = 0
+        # Slot sequence % capacity holds (sequence, alert level, SSE frame)
+        self._ring = [None] * capacity
+        # patient_id -> (timestamp, risk_level) of alerting patients
+        self._alerting = {}
+        self._wakeup = asyncio.Event()
+
+    @property
+    def oldest(self) -> int:
+        """Sequence number of the oldest event still in the ring"""
+        return max(1, self.sequence - self.capacity + 1)
+
+    def event_id(self, sequence: int) -> str:
+        return f"{self.epoch}-{sequence}"
+
+    def parse_event_id(self, value: str):
+        """Sequence number from an event id of this feed (None otherwise)"""
+        epoch, _, sequence = (value or "").strip().partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+
+    def seed(self, items):
+        """
+        Record which patients are alerting without publishing events
+
+        Ignored once an event was published: the events are newer than a
+        snapshot that finished loading after them, and seeding could
+        bring back alerts they cleared.
+        """
+        if self.sequence:
+            return
+        for item in sorted(items, key=lambda i: int(i.get('timestamp', 0))):
+            self._classify(item)
+
+    def publish(self, records) -> int:
+        """
+        Publish alerts for a batch of changes and wake the subscribers
+
+        Parameters:
+        - records: (event name, new image, old image) tuples in stream
+          order; event name is INSERT, MODIFY or REMOVE
+        """
+        published = 0
+        for event_name, new_image, old_image in records:
+            if event_name == 'REMOVE':
+                change = self._classify_removal(old_image)
+                item = old_image
+            else:
+                change = self._classify(new_image)
+                item = new_image
+            if change is not None:
+                self._append(change[0], item, change[1])
+                published += 1
+
+        if published:
+            self._wakeup.set()
+            self._wakeup = asyncio.Event()
+        return published
+
+    def _classify(self, item):
+        """('alert' | 'cleared', previous level) for a new reading, or None"""
+        patient_id = item.get('patient_id')
+        timestamp = int(item.get('timestamp', 0))
+        level = item.get('risk_level')
+        latest = self._alerting.get(patient_id)
+        if latest is not None and timestamp < latest[0]:
+            # Late change to an older reading
+            return None
+
+        if level in self.levels:
+            self._alerting[patient_id] = (timestamp, level)
+            return 'alert', latest[1] if latest else None
+        if latest is not None:
+            del self._alerting[patient_id]
+            return 'cleared', latest[1]
+        return None
+
+    def _classify_removal(self, item):
+        latest = self._alerting.get(item.get('patient_id'))
+        if latest is None or latest[0] != int(item.get('timestamp', 0)):
+            return None
+        del self._alerting[item.get('patient_id')]
+        return 'cleared', latest[1]
+
+    def _append(self, event_type: str, item: dict, previous_level):
+        self.sequence += 1
+        patient = {field: item[field] for field in PATIENT_FIELDS if field in item}
+        data = encode_json({
+            "type": event_type,
+            "sequence": self.sequence,
+            "previous_risk_level": previous_level,
+            "patient": patient,
+            "published_at": int(time.time() * 1000)
+        })
+        frame = b"id: %s\nevent: %s\ndata: %s\n\n" % (
+            self.event_id(self.sequence).encode(), event_type.encode(), data
+        )
+        # Subscribers filter on the alert level involved: the new level of
+        # an alert, the level left behind by a clear
+        level = previous_level if event_type == 'cleared' else item.get('risk_level')
+        self._ring[self.sequence % self.capacity] = (self.sequence, level, frame)
+
+    # ------------------------------------------------------------------
+    # Subscribing
+    # ------------------------------------------------------------------
+
+    def _reset_frame(self, reason: str) -> bytes:
+        data = encode_json({"type": "reset", "reason": reason, "sequence": self.sequence})
+        return b"id: %s\nevent: reset\ndata: %s\n\n" % (self.event_id(self.sequence).encode(), data)
+
+    def _read(self, after: int, levels):
+        """Frames after sequence `after` (at most SEND_BATCH) and the new cursor"""
+        frames = []
+        while after < self.sequence and len(frames) < SEND_BATCH:
+            after += 1
+            _, level, frame = self._ring[after % self.capacity]
+            if levels is None or level in levels:
+                frames.append(frame)
+        return frames, after
+
+    async def _wait(self, after: int, timeout: float) -> bool:
+        """Wait until an event after `after` exists; False on timeout"""
+        if self.sequence > after:
+            return True
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stream(self, last_event_id: str = None, levels=None, heartbeat: float = CHANGEFEED_HEARTBEAT_SECONDS):
+        """
+        SSE byte stream for one client
+
+        Parameters:
+        - last_event_id: Id of the last event the client received
+        - levels: Only forward alerts into and clears out of these risk
+          levels (default: all)
+        - heartbeat: Seconds of silence before a keepalive comment
+        """
+        self.subscribers += 1
+        try:
+            yield b"retry: %d\n\n" % RETRY_MS
+
+            after = self.sequence
+            if last_event_id:
+                resumed = self.parse_event_id(last_event_id)
+                if resumed is None or resumed > self.sequence:
+                    yield self._reset_frame("unknown_event_id")
+                elif resumed < self.oldest - 1:
+                    yield self._reset_frame("expired")
+                else:
+                    after = resumed
+
+            while True:
+                if after < self.oldest - 1:
+                    # Overwritten while this client was sending
+                    yield self._reset_frame("lagged")
+                    after = self.sequence
+
+                frames, after = self._read(after, levels)
+                if frames:
+                    yield b"".join(frames)
+                elif after >= self.sequence and not await self._wait(after, heartbeat):
+                    yield b": keepalive\n\n"
+        finally:
+            self.subscribers -= 1
+
+
+# ----------------------------------------------------------------------
+# Sources
+# ----------------------------------------------------------------------
+
+class LocalStreamReader:
+    """Reads the change stream of an InMemoryTable from the current end"""
+
+    blocking = False
+
+    def __init__(self, table, limit: int = 1000):
+        self.table = table
+        self.limit = limit
+        self.position = table.stream_sequence
+
+    def read(self) -> list:
+        records = self.table.stream_records(self.position, self.limit)
+        if records:
+            self.position = records[-1][0]
+        return [(event_name, new, old) for _, event_name, new, old in records]
+
+
+class StreamLease:
+    """
+    Conditional-write lease allowing one stream reader at a time
+
+    The lease is an item of a small table (the aggregates table in the
+    API). It is taken when missing, expired or already ours, and renewed
+    by the holder at least every third of its lifetime. A holder that
+    stalls longer than that loses it to the next process to try.
+
+    Parameters:
+    - table: Table resource with a string hash key `key_name`
+    - lease_id: Hash key value of the lease item
+    - seconds: Lease lifetime without renewal
+    """
+
+    def __init__(
+        self,
+        table,
+        lease_id: str = CHANGEFEED_LEASE_ID,
+        seconds: float = CHANGEFEED_LEASE_SECONDS,
+        key_name: str = 'aggregate_id'
+    ):
+        self.table = table
+        self.lease_id = lease_id
+        self.seconds = seconds
+        self.key_name = key_name
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self.renewed = None
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; False when another process holds it"""
+        now = time.time()
+        try:
+            self.table.put_item(
+                Item={
+                    self.key_name: self.lease_id,
+                    'owner': self.owner,
+                    'lease_expires': Decimal(str(round(now + self.seconds, 3)))
+                },
+                ConditionExpression=(
+                    Attr(self.key_name).not_exists()
+                    | Attr('owner').eq(self.owner)
+                    | Attr('lease_expires').lt(Decimal(str(round(now, 3))))
+                )
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+        self.renewed = time.monotonic()
+        return True
+
+    def due(self) -> bool:
+        """True when the holder should renew"""
+        return self.renewed is None or time.monotonic() - self.renewed > self.seconds / 3
+
+
+class DynamoDBStreamReader:
+    """
+    Polls every shard of a DynamoDB Stream (NEW_AND_OLD_IMAGES)
+
+    Run one reader per stream (see StreamLease): each shard allows only
+    about two concurrent GetRecords readers.
+
+    Shards open at start-up are read from LATEST. Shards found later,
+    the children of split or rotated shards, are read from TRIM_HORIZON
+    so no record is missed. Records within a shard are in order. Across
+    a parent and child shard read in the same poll, order can differ
+    slightly.
+
+    Parameters:
+    - stream_arn: The table's LatestStreamArn
+    - client: dynamodbstreams client (created if omitted)
+    - discover_seconds: Interval between shard list refreshes
+    """
+
+    blocking = True
+
+    def __init__(self, stream_arn: str, client=None, limit: int = 1000, discover_seconds: float = 60):
+        self.stream_arn = stream_arn
+        self.client = client or boto3.client('dynamodbstreams', region_name=AWS_REGION)
+        self.limit = limit
+        self.discover_seconds = discover_seconds
+        self.iterators = {}
+        self.known = set()
+        self.discovered = None
+        self._deserializer = TypeDeserializer()
+
+    def _discover(self):
+        initial = self.discovered is None
+        start = None
+        while True:
+            kwargs = {'StreamArn': self.stream_arn}
+            if start:
+                kwargs['ExclusiveStartShardId'] = start
+            description = self.client.describe_stream(**kwargs)['StreamDescription']
+            for shard in description['Shards']:
+                shard_id = shard['ShardId']
+                if shard_id in self.known:
+                    continue
+                self.known.add(shard_id)
+                closed = 'EndingSequenceNumber' in shard['SequenceNumberRange']
+                if initial and closed:
+                    continue
+                self.iterators[shard_id] = self.client.get_shard_iterator(
+                    StreamArn=self.stream_arn,
+                    ShardId=shard_id,
+                    ShardIteratorType='LATEST' if initial else 'TRIM_HORIZON'
+                )['ShardIterator']
+            start = description.get('LastEvaluatedShardId')
+            if not start:
+                break
+        self.discovered = time.monotonic()
+
+    def _image(self, image):
+        if image is None:
+            return None
+        return {name: self._deserializer.deserialize(value) for name, value in image.items()}
+
+    def read(self) -> list:
+        if self.discovered is None or time.monotonic() - self.discovered > self.discover_seconds:
+            self._discover()
+
+        records = []
+        for shard_id, iterator in list(self.iterators.items()):
+            try:
+                response = self.client.get_records(ShardIterator=iterator, Limit=self.limit)
+            except self.client.exceptions.ExpiredIteratorException:
+                # Re-open on the next discovery
+                del self.iterators[shard_id]
+                self.known.discard(shard_id)
+                self.discovered = 0
+                continue
+            for record in response['Records']:
+                data = record['dynamodb']
+                records.append((
+                    record['eventName'],
+                    self._image(data.get('NewImage')),
+                    self._image(data.get('OldImage'))
+                ))
+            if response.get('NextShardIterator'):
+                self.iterators[shard_id] = response['NextShardIterator']
+            else:
+                # Shard closed and fully read
+                del self.iterators[shard_id]
+        return records
+
+
+def stream_reader(table):
+    """Reader for the table's change stream, or None if it has none"""
+    if hasattr(table, 'stream_records'):
+        return LocalStreamReader(table)
+    stream_arn = table.latest_stream_arn
+    return DynamoDBStreamReader(stream_arn) if stream_arn else None
+
+
+async def run_stream(feed: ChangeFeed, reader, interval: float = CHANGEFEED_POLL_SECONDS, lease: StreamLease = None):
+    """
+    Publish stream records; intended to run as a background task
+
+    With a lease, the lease is renewed between polls. If it cannot be
+    renewed, the feed switches to the snapshot source and reading stops.
+    """
+    loop = asyncio.get_running_loop()
+    feed.source = "stream"
+    while True:
+        if lease is not None and lease.due():
+            try:
+                held = await loop.run_in_executor(None, lease.acquire)
+            except Exception as e:
+                logger.warning("Stream lease renewal failed: %s", e)
+                held = False
+            if not held:
+                logger.warning("Lost the stream lease; alerts follow the snapshot refresh")
+                feed.source = "snapshot"
+                return
+
+        records = []
+        try:
+            if reader.blocking:
+                records = await loop.run_in_executor(None, reader.read)
+            else:
+                records = reader.read()
+            if records:
+                feed.publish(records)
+        except Exception as e:
+            logger.warning("Change stream read failed: %s", e)
+        if len(records) < reader.limit:
+            await asyncio.sleep(interval)
+
+
+async def follow_stream(feed: ChangeFeed, lease: StreamLease, open_reader, retry: float = CHANGEFEED_LEASE_SECONDS):
+    """
+    Read the change stream whenever this process holds the lease
+
+    Without the lease (or after losing it) the feed follows the snapshot
+    and the lease is retried every `retry` seconds. Intended to run as a
+    background task.
+
+    Parameters:
+    - feed: ChangeFeed to publish to
+    - lease: StreamLease shared by every process reading the stream
+    - open_reader: Blocking callable returning a stream reader, or None
+      when the table has no stream
+    - retry: Seconds between lease attempts
+    """
+    loop = asyncio.get_running_loop()
+    waiting = False
+    while True:
+        try:
+            held = await loop.run_in_executor(None, lease.acquire)
+        except Exception as e:
+            logger.warning("Cannot take the stream lease: %s", e)
+            held = False
+
+        if held:
+            waiting = False
+            try:
+                reader = await loop.run_in_executor(None, open_reader)
+            except Exception as e:
+                logger.warning("Cannot open the table's change stream: %s", e)
+                reader = None
+            if reader is None:
+                # Stop renewing; the lease expires for the others, who find
+                # the same table
+                logger.warning("No change stream on the patient table; alerts follow the snapshot refresh")
+                feed.source = "snapshot"
+                return
+            logger.info("Reading the change stream")
+            await run_stream(feed, reader, lease=lease)
+        elif not waiting:
+            logger.info("Another process reads the change stream; alerts follow the snapshot refresh")
+            waiting = True
+        feed.source = "snapshot"
+        await asyncio.sleep(retry)
+
+
+def snapshot_listener(feed: ChangeFeed):
+    """
+    PatientSnapshot listener feeding the change feed
+
+    The initial load only seeds which patients are alerting. Later
+    refreshes publish their new and changed items, then their deleted
+    ones as removals, while the feed's source is "snapshot".
+    """
+    def listener(items, initial, removed=()):
+        if initial:
+            feed.seed(items)
+        elif feed.source == "snapshot":
+            feed.publish(
+                [('INSERT', item, None) for item in items]
+                + [('REMOVE', None, item) for item in removed]
+            )
+    return listener
@@ -0,0 +1,158 @@
+"""
+AIER Alert System - Columnar Patient Files
+Typed, compressed Parquet output for processed patient data
+
+Numerics are written with fixed types and the categorical columns
+(risk_level, age_group, bmi_category) as dictionary-encoded strings, so
+readers get the right dtypes without re-parsing text. Datasets can be
+hive-partitioned (e.g. risk_level=HIGH/age_group=40-50/...) and read back
+with column pruning and partition filters.
+"""
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .models import RISK_LEVELS
+
+PARQUET_COMPRESSION = "zstd"
+
+# Fixed category labels, matching the pipeline's pd.cut labels
+CATEGORIES = {
+    'risk_level': RISK_LEVELS,
+    'age_group': ('<30', '30-40', '40-50', '50-60', '60+'),
+    'bmi_category': ('Underweight', 'Normal', 'Overweight', 'Obese'),
+}
+
+PARTITION_COLUMNS = ('risk_level', 'age_group')
+
+_INT_COLUMNS = ('ingestion_timestamp', 'timestamp', 'Pregnancies', 'Age', 'Outcome')
+_STRING_COLUMNS = ('patient_id',)
+
+
+def _field(name: str) -> pa.Field:
+    if name in CATEGORIES:
+        return pa.field(name, pa.dictionary(pa.int8(), pa.string(), ordered=True))
+    if name in _STRING_COLUMNS:
+        return pa.field(name, pa.string())
+    if name in _INT_COLUMNS:
+        return pa.field(name, pa.int64())
+    return pa.field(name, pa.float64())
+
+
+def patient_schema(columns) -> pa.Schema:
+    """Arrow schema for the given processed-data columns, in order"""
+    return pa.schema([_field(name) for name in columns])
+
+
+def to_arrow(df) -> pa.Table:
+    """Convert a processed DataFrame to an Arrow table with the patient schema"""
+    # Recode categoricals (or plain strings) onto the fixed labels so every
+    # chunk and file shares one dictionary
+    categoricals = {
+        name: pd.Categorical(df[name], categories=labels, ordered=True)
+        for name, labels in CATEGORIES.items() if name in df.columns
+    }
+    return pa.Table.from_pandas(
+        df.assign(**categoricals),
+        schema=patient_schema(df.columns),
+        preserve_index=False
+    )
+
+
+def parquet_bytes(df, compression: str = PARQUET_COMPRESSION) -> bytes:
+    """Serialize a processed DataFrame to an in-memory Parquet file"""
+    buffer = pa.BufferOutputStream()
+    pq.write_table(to_arrow(df), buffer, compression=compression)
+    return buffer.getvalue().to_pybytes()
+
+
+class ParquetSink:
+    """
+    Write processed frames to Parquet one frame at a time
+
+    A single file gets one row group per frame; a partitioned dataset
+    gets one file per frame and partition.
+
+    Parameters:
+    - path: Output file, or dataset directory when partitioned
+    - partition_by: Columns to hive-partition by (subset of PARTITION_COLUMNS)
+    - compression: Parquet codec
+    """
+
+    def __init__(self, path, partition_by=None, compression: str = PARQUET_COMPRESSION):
+        self.path = Path(path)
+        self.partition_by = list(partition_by or [])
+        self.compression = compression
+        self._writer = None
+        self._parts = 0
+
+        unknown = set(self.partition_by) - set(PARTITION_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cannot partition by: {', '.join(sorted(unknown))}")
+
+        # Replace any previous output rather than mixing runs
+        if self.path.is_dir():
+            shutil.rmtree(self.path)
+        elif self.path.exists():
+            self.path.unlink()
+
+    def write(self, df):
+        table = to_arrow(df)
+        if self.partition_by:
+            pq.write_to_dataset(
+                table,
+                root_path=str(self.path),
+                partition_cols=self.partition_by,
+                basename_template=f"part-{self._parts:05d}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+                compression=self.compression
+            )
+        else:
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(str(self.path), table.schema, compression=self.compression)
+            self._writer.write_table(table)
+        self._parts += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _dataset(path):
+    # Partition keys come back dictionary-encoded like the stored columns
+    partitioning = ds.HivePartitioning.discover(infer_dictionary=True)
+    return ds.dataset(str(path), format="parquet", partitioning=partitioning)
+
+
+def read_patients(path, columns=None, filters=None):
+    """
+    Read a Parquet file or partitioned dataset into a DataFrame
+
+    Only the requested columns are decoded, and partition filters skip
+    whole directories.
+
+    Parameters:
+    - path: File or dataset directory written by ParquetSink
+    - columns: Columns to read (default: all)
+    - filters: pyarrow.dataset expression, e.g. ds.field('risk_level') == 'HIGH'
+    """
+    return _dataset(path).to_table(columns=columns, filter=filters).to_pandas()
+
+
+def iter_patient_frames(path, columns=None, batch_size: int = 65536):
+    """Yield the dataset as DataFrames of at most batch_size rows"""
+    for batch in _dataset(path).to_batches(columns=columns, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
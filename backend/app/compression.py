@@ -0,0 +1,148 @@
+"""
+AIER Alert System - Response Compression
+ASGI middleware negotiating brotli or gzip for responses above a size
+threshold
+
+Brotli is used when the client accepts it and the `brotli` package is
+installed, otherwise gzip. Bodies are compressed incrementally, so
+streaming responses (e.g. /api/patients/export) stay streaming.
+"""
+
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/",
+)
+
+# Sent uncompressed: events must reach the client as soon as they are
+# written, not when the compressor's buffer fills
+STREAMING_TYPES = (
+    "text/event-stream",
+)
+
+
+def negotiate(accept_encoding: str):
+    """Pick 'br', 'gzip' or None from an Accept-Encoding header"""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip()] = q
+
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """Uniform incremental interface over zlib and brotli"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress = self._impl.process
+            self.flush = self._impl.finish
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._impl = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress = self._impl.compress
+            self.flush = self._impl.flush
+
+
+class CompressionMiddleware:
+    """
+    Compress responses the client accepts, above `minimum_size` bytes
+
+    Parameters:
+    - app: ASGI application
+    - minimum_size: Smaller single-chunk bodies are sent uncompressed
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                response_headers = dict(start_message.get("headers", []))
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                if (
+                    b"content-encoding" in response_headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith(STREAMING_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding)
+                new_headers = [
+                    (k, v) for k, v in start_message.get("headers", [])
+                    if k not in (b"content-length", b"vary")
+                ]
+                vary = response_headers.get(b"vary")
+                new_headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                new_headers.append((b"content-encoding", encoding.encode("latin-1")))
+
+                data = compressor.compress(body)
+                if not more_body:
+                    data += compressor.flush()
+                    new_headers.append((b"content-length", str(len(data)).encode("latin-1")))
+                await send({**start_message, "headers": new_headers})
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.flush()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,110 @@
+"""
+AIER Alert System - DynamoDB Access Layer
+Non-blocking access to the patient table for the async API handlers
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import boto3
+from botocore.config import Config
+
+from .local_table import InMemoryTable
+from .metrics import record_dynamodb, with_capacity
+
+# AWS Configuration
+AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+DYNAMODB_TABLE = os.getenv("DYNAMODB_TABLE_NAME", "aier-patient-data")
+
+# "aws" talks to DynamoDB, "memory" uses the local in-process stand-in
+DYNAMODB_BACKEND = os.getenv("DYNAMODB_BACKEND", "aws")
+
+# Pool and concurrency limits
+# Keep the connection pool at least as large as the number of worker
+# threads, otherwise urllib3 discards connections under load
+MAX_CONCURRENCY = int(os.getenv("DYNAMODB_MAX_CONCURRENCY", "32"))
+MAX_POOL_CONNECTIONS = int(os.getenv("DYNAMODB_MAX_POOL_CONNECTIONS", str(MAX_CONCURRENCY)))
+CONNECT_TIMEOUT = float(os.getenv("DYNAMODB_CONNECT_TIMEOUT", "2"))
+READ_TIMEOUT = float(os.getenv("DYNAMODB_READ_TIMEOUT", "10"))
+MAX_ATTEMPTS = int(os.getenv("DYNAMODB_MAX_ATTEMPTS", "5"))
+
+
+def create_table(
+    table_name: str = DYNAMODB_TABLE,
+    backend: str = DYNAMODB_BACKEND,
+    max_pool_connections: int = MAX_POOL_CONNECTIONS
+):
+    """
+    Create the boto3 Table resource (or the in-memory stand-in)
+
+    Parameters:
+    - table_name: DynamoDB table name
+    - backend: "aws" or "memory"
+    - max_pool_connections: HTTP connection pool size for the client
+    """
+    if backend == "memory":
+        return InMemoryTable(table_name)
+
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        retries={"max_attempts": MAX_ATTEMPTS, "mode": "adaptive"}
+    )
+    dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION, config=config)
+    return dynamodb.Table(table_name)
+
+
+class AsyncTable:
+    """
+    Async facade over a synchronous boto3 Table
+
+    Every call runs on a bounded thread pool so a slow scan never blocks
+    the event loop. The pool size is the maximum number of DynamoDB
+    requests in flight for this process; further calls wait their turn.
+    Each call is charged to the current API route in the request metrics.
+    """
+
+    def __init__(self, table, max_concurrency: int = MAX_CONCURRENCY):
+        self.table = table
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="dynamodb"
+        )
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable on the DynamoDB thread pool"""
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self._executor,
+            partial(func, *args, **kwargs)
+        )
+        record_dynamodb(getattr(func, '__name__', 'call'), response)
+        return response
+
+    async def scan(self, **kwargs):
+        """Non-blocking table.scan"""
+        return await self.run(self.table.scan, **with_capacity(kwargs))
+
+    async def query(self, **kwargs):
+        """Non-blocking table.query"""
+        return await self.run(self.table.query, **with_capacity(kwargs))
+
+    async def get_item(self, **kwargs):
+        """Non-blocking table.get_item"""
+        return await self.run(self.table.get_item, **with_capacity(kwargs))
+
+    async def put_item(self, **kwargs):
+        """Non-blocking table.put_item"""
+        return await self.run(self.table.put_item, **with_capacity(kwargs))
+
+    async def update_item(self, **kwargs):
+        """Non-blocking table.update_item"""
+        return await self.run(self.table.update_item, **with_capacity(kwargs))
+
+    def close(self):
+        """Release the worker threads"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,147 @@
+"""
+AIER Alert System - Time Series Downsampling
+Server-side reduction of a patient's history to a chart-sized number
+of points
+
+Two methods are available. Both expect samples sorted by time:
+
+- minmax: splits the time range into equal windows and reports min,
+  max and mean per non-empty window. Spikes survive because each
+  window keeps its extremes, and gaps in the data stay visible.
+- lttb: Largest-Triangle-Three-Buckets picks actual samples that
+  preserve the visual shape of each series.
+"""
+
+import os
+
+import numpy as np
+
+# Records read per query while collecting a history to downsample
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "1000"))
+
+# Series charted when the request names none
+DEFAULT_SERIES = ('Glucose', 'BloodPressure', 'BMI', 'risk_score')
+
+
+def column(items, field: str) -> np.ndarray:
+    """float64 values of an attribute across items (NaN where missing)"""
+    return np.fromiter(
+        (np.nan if item.get(field) is None else float(item[field]) for item in items),
+        dtype=np.float64,
+        count=len(items)
+    )
+
+
+def window_index(t: np.ndarray, start: float, end: float, windows: int) -> np.ndarray:
+    """Equal-width time window of each sample in [start, end]"""
+    span = end - start
+    if span <= 0:
+        return np.zeros(len(t), dtype=np.int64)
+    index = np.floor((t - start) / span * windows).astype(np.int64)
+    # The end of the range belongs to the last window
+    return np.clip(index, 0, windows - 1)
+
+
+def minmax(t: np.ndarray, series: dict, windows: int, start: float = None, end: float = None) -> dict:
+    """
+    Min, max and mean per equal-width time window
+
+    Parameters:
+    - t: Sample times, ascending
+    - series: {name: float64 values aligned with t}
+    - windows: Number of windows across [start, end]
+    - start, end: Range to split (default: first and last sample)
+
+    Returns columnar lists: window start times, samples per window
+    and {name: {"min", "max", "mean"}}. Empty windows are left out,
+    and a series with no values in a window reports None there.
+    """
+    if not len(t):
+        return {'t': [], 'count': [], 'series': {name: {'min': [], 'max': [], 'mean': []} for name in series}}
+    start = float(t[0]) if start is None else float(start)
+    end = float(t[-1]) if end is None else float(end)
+
+    index = window_index(t, start, end, windows)
+    # t is sorted, so every window is one contiguous run of samples
+    starts = np.flatnonzero(np.diff(index, prepend=-1))
+    counts = np.diff(np.append(starts, len(t)))
+    width = (end - start) / windows
+
+    result = {}
+    for name, values in series.items():
+        present = ~np.isnan(values)
+        n = np.add.reduceat(present.astype(np.int64), starts)
+        low = np.fmin.reduceat(values, starts)
+        high = np.fmax.reduceat(values, starts)
+        total = np.add.reduceat(np.where(present, values, 0.0), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / n
+        result[name] = {
+            'min': _nullable(low, n),
+            'max': _nullable(high, n),
+            'mean': _nullable(mean, n),
+        }
+    return {
+        't': (start + index[starts] * width).tolist(),
+        'count': counts.tolist(),
+        'series': result,
+    }
+
+
+def lttb(t: np.ndarray, values: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `points` samples that
+    keep the shape of the series
+
+    Missing (NaN) values are never selected. The first and last samples
+    are always kept; each bucket in between contributes the sample
+    forming the largest triangle with the previously selected sample
+    and the mean of the next bucket.
+    """
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) <= points:
+        return valid
+    if points < 3:
+        return valid[np.linspace(0, len(valid) - 1, points).astype(np.int64)]
+
+    x = t[valid].astype(np.float64)
+    y = values[valid]
+    # Buckets over the samples between the fixed first and last
+    edges = np.linspace(1, len(valid) - 1, points - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    # Mean point of every bucket up front; only the selection is sequential.
+    # The last bucket looks ahead to the fixed last sample
+    avg_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / sizes, x[-1])[1:].tolist()
+    avg_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / sizes, y[-1])[1:].tolist()
+    bounds = edges.tolist()
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    previous = 0
+    for i in range(points - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        px, py = x[previous], y[previous]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((px - avg_x[i]) * (y[lo:hi] - py) - (px - x[lo:hi]) * (avg_y[i] - py))
+        previous = lo + int(area.argmax())
+        selected[i + 1] = previous
+    selected[-1] = len(valid) - 1
+    return valid[selected]
+
+
+def lttb_series(t: np.ndarray, series: dict, points: int) -> dict:
+    """
+    LTTB per series: {name: {"t": [...], "value": [...]}}
+
+    Each series keeps its own samples, so their times can differ.
+    """
+    result = {}
+    for name, values in series.items():
+        keep = lttb(t, values, points)
+        result[name] = {'t': t[keep].tolist(), 'value': values[keep].tolist()}
+    return result
+
+
+def _nullable(values: np.ndarray, counts: np.ndarray) -> list:
+    """Values as a list with None where a window had no samples"""
+    return [None if n == 0 else v for v, n in zip(values.tolist(), counts.tolist())]
@@ -0,0 +1,42 @@
+"""
+AIER Alert System - Streaming Export
+Incremental NDJSON/CSV encoders for large patient exports
+
+Each page read from DynamoDB is encoded and yielded before the next one
+is requested, so server memory is bounded by a single page regardless
+of how many patients are exported.
+"""
+
+import csv
+import io
+
+from .responses import encode_json
+from .models import PATIENT_FIELDS
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def ndjson_stream(pages):
+    """Encode pages of items as newline-delimited JSON"""
+    async for items in pages:
+        if items:
+            yield b"".join(encode_json(item) + b"\n" for item in items)
+
+
+async def csv_stream(pages, fields=PATIENT_FIELDS):
+    """Encode pages of items as CSV with a fixed header"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+
+    async for items in pages:
+        if not items:
+            continue
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(items)
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,537 @@
+"""
+AIER Alert System - Bulk Patient Loader
+Streams processed patient files into DynamoDB with BatchWriteItem
+
+Rows are read chunk by chunk (CSV straight from the S3 response stream,
+Parquet batch by batch) and converted column-wise into wire-format
+items, skipping the per-item TypeSerializer walk. Each chunk is split
+into 25-item batches written by a pool of worker threads; unprocessed
+items are retried with exponential backoff, and an adaptive throttle
+keeps consumed write capacity under the configured budget.
+
+Each batch is stamped with its write time (sync_day/synced_at) so it
+shows up in delta syncs. --delete removes the rows of a file instead,
+leaving a tombstone per item for clients to sync.
+
+Aggregates are counted from the items themselves: before a chunk is
+written, the current versions of its keys are read back (BatchGetItem),
+and the chunk's net effect (new items minus the ones they replace, or
+minus the stored items for a delete) is added in one transaction with a
+marker for the chunk of this source version (S3 ETag, or size and
+mtime of a local file). Redelivered events, Lambda retries and re-runs
+therefore leave the counters unchanged, and deleting keys that do not
+exist subtracts nothing.
+
+Usage (from backend/):
+    python -m app.loader s3://bucket/processed/diabetes_processed_<hash>.csv
+    python -m app.loader ../data/diabetes_processed.csv --workers 16
+    python -m app.loader removed_patients.csv --delete
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import unquote
+
+import boto3
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+from .aggregates import AGGREGATE_FIELDS, AggregateStore, create_aggregates_table, net_deltas
+from .batch import RETRYABLE_ERRORS
+from .columnar import iter_patient_frames
+from .database import AWS_REGION, create_table
+from .projection import projection
+from .sync import create_tombstones_table, now_ms, sync_stamp, tombstone_items
+
+logger = logging.getLogger(__name__)
+
+LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", "8"))
+# Write capacity units per second across all workers (0 = unlimited)
+LOADER_WRITE_BUDGET = float(os.getenv("LOADER_WRITE_BUDGET", "0"))
+LOADER_CHUNK_SIZE = int(os.getenv("LOADER_CHUNK_SIZE", "5000"))
+LOADER_MAX_RETRIES = int(os.getenv("LOADER_MAX_RETRIES", "8"))
+# Apply loaded rows to the materialized aggregates
+LOADER_UPDATE_AGGREGATES = os.getenv("LOADER_UPDATE_AGGREGATES", "true").lower() == "true"
+
+# BatchWriteItem accepts at most 25 put/delete requests
+BATCH_SIZE = 25
+# BatchGetItem accepts at most 100 keys
+READ_BATCH_SIZE = 100
+
+KEY_ATTRIBUTES = ('patient_id', 'timestamp')
+# Directory value Hive and pyarrow write for a null partition key
+HIVE_DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+class LoadError(RuntimeError):
+    """Items could not be written within the retry budget"""
+
+
+class WriteThrottle:
+    """
+    Adaptive token bucket over consumed write capacity
+
+    The allowed rate starts at the budget, is halved whenever DynamoDB
+    throttles or leaves items unprocessed, and climbs back towards the
+    budget by 5% of it per clean batch (AIMD).
+
+    Parameters:
+    - budget: Write capacity units per second (0 = unlimited)
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.rate = budget
+        self.tokens = budget
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until the bucket is out of debt"""
+        if self.budget <= 0:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens > 0:
+                    return
+                wait = -self.tokens / self.rate
+            time.sleep(wait)
+
+    def charge(self, units: float):
+        """Deduct capacity consumed by a completed batch"""
+        if self.budget <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self.tokens -= units
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.budget * 0.05, self.rate / 2)
+
+    def recovered(self):
+        with self._lock:
+            self.rate = min(self.budget, self.rate + self.budget * 0.05)
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter, capped at 5 seconds"""
+    return random.uniform(0, min(5.0, 0.05 * 2 ** attempt))
+
+
+def _wire_column(series: pd.Series) -> tuple:
+    """
+    DynamoDB AttributeValues for one column, None where missing
+
+    Infinities count as missing: DynamoDB numbers must be finite, and
+    {'N': 'inf'} would fail the whole batch. Returns the values and
+    whether any of them is None.
+    """
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        missing = missing | np.isinf(series.to_numpy(dtype='float64', na_value=np.nan))
+        values = [{'N': text} for text in series.astype(str).tolist()]
+    else:
+        values = [{'S': text} for text in series.astype(str).tolist()]
+    rows = np.flatnonzero(missing)
+    for row in rows:
+        values[row] = None
+    return values, len(rows) > 0
+
+
+def frame_to_items(df: pd.DataFrame) -> list:
+    """
+    Convert processed rows to wire-format DynamoDB items
+
+    The range key `timestamp` is the row's ingestion_timestamp. Missing
+    values (NaN or infinite vitals, rows outside every pd.cut bin) are
+    left out of the item, since DynamoDB numbers must be finite.
+    """
+    if 'timestamp' not in df.columns:
+        df = df.assign(timestamp=df['ingestion_timestamp'])
+    df = df.dropna(subset=list(KEY_ATTRIBUTES)).drop_duplicates(subset=list(KEY_ATTRIBUTES), keep='last')
+
+    names = list(df.columns)
+    columns, gaps = zip(*(_wire_column(df[name]) for name in names))
+    if not any(gaps):
+        return [dict(zip(names, row)) for row in zip(*columns)]
+    return [
+        {name: value for name, value in zip(names, row) if value is not None}
+        for row in zip(*columns)
+    ]
+
+
+def _counted(item: dict) -> dict:
+    """Aggregated attributes of a wire-format item as python values"""
+    values = {}
+    for name in AGGREGATE_FIELDS:
+        value = item.get(name)
+        if value is not None:
+            values[name] = float(value['N']) if 'N' in value else value.get('S')
+    return values
+
+
+def _partition_values(key: str) -> dict:
+    """
+    Hive partition values encoded in an object key (risk_level=HIGH/...)
+
+    Values are URL-decoded, and __HIVE_DEFAULT_PARTITION__ (a null
+    value) becomes None, so the attribute is left out of the items, as
+    pyarrow does for a local dataset.
+    """
+    values = {}
+    for part in key.split('/')[:-1]:
+        if '=' in part:
+            name, value = part.split('=', 1)
+            values[unquote(name)] = None if value == HIVE_DEFAULT_PARTITION else unquote(value)
+    return values
+
+
+def source_version(source: str, s3_client=None) -> str:
+    """
+    Identity of the current contents of a source
+
+    The object's ETag for s3://, size and mtime for a local file, and a
+    digest of every file's path, size and mtime for a dataset directory.
+    """
+    if source.startswith("s3://"):
+        bucket, _, key = source[len("s3://"):].partition('/')
+        s3_client = s3_client or boto3.client('s3', region_name=AWS_REGION)
+        return s3_client.head_object(Bucket=bucket, Key=key)['ETag'].strip('"')
+
+    path = Path(source)
+    if not path.is_dir():
+        stat = path.stat()
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+    digest = hashlib.sha256()
+    for file in sorted(p for p in path.rglob('*') if p.is_file()):
+        stat = file.stat()
+        digest.update(f"{file.relative_to(path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def read_frames(source: str, chunk_size: int = LOADER_CHUNK_SIZE, s3_client=None, etag: str = None):
+    """
+    Yield DataFrames of at most chunk_size rows from a processed file
+
+    Parameters:
+    - source: s3://bucket/key, a local CSV/Parquet file, or a partitioned
+      Parquet dataset directory
+    - chunk_size: Rows per frame
+    - s3_client: boto3 S3 client (created when needed)
+    - etag: Read only this version of an S3 object (fails if it changed)
+    """
+    if source.startswith("s3://"):
+        bucket, _, key = source[len("s3://"):].partition('/')
+        s3_client = s3_client or boto3.client('s3', region_name=AWS_REGION)
+        condition = {'IfMatch': etag} if etag else {}
+        body = s3_client.get_object(Bucket=bucket, Key=key, **condition)['Body']
+
+        if key.endswith('.parquet'):
+            # Parquet needs random access to the footer, so the object is
+            # buffered; row groups are still decoded one batch at a time
+            parquet = pq.ParquetFile(io.BytesIO(body.read()))
+            partitions = _partition_values(key)
+            for batch in parquet.iter_batches(batch_size=chunk_size):
+                yield batch.to_pandas().assign(**partitions)
+        else:
+            yield from pd.read_csv(body, chunksize=chunk_size)
+        return
+
+    path = Path(source)
+    if path.is_dir() or path.suffix == '.parquet':
+        yield from iter_patient_frames(path, batch_size=chunk_size)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class LoadReport:
+    """Counters for one load; rows_per_second is filled in by finish()"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.rows = 0
+        self.items = 0
+        self.batches = 0
+        # Chunks whose aggregates an earlier run already applied
+        self.chunks_already_applied = 0
+        self.retries = 0
+        self.consumed_capacity = 0.0
+        self.seconds = 0.0
+        self._started = time.perf_counter()
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._started
+        return self
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "rows": self.rows,
+            "items": self.items,
+            "batches": self.batches,
+            "chunks_already_applied": self.chunks_already_applied,
+            "retries": self.retries,
+            "consumed_capacity": round(self.consumed_capacity, 1),
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1)
+        }
+
+
+class BulkLoader:
+    """
+    Parallel BatchWriteItem loader for the patient table
+
+    Parameters:
+    - table: Patient table (boto3 Table or InMemoryTable)
+    - workers: Concurrent BatchWriteItem calls
+    - write_budget: Write capacity units per second (0 = unlimited)
+    - max_retries: Attempts per batch before giving up
+    - aggregate_store: AggregateStore updated after each chunk (optional)
+    - tombstones: Tombstones table written before deletes (optional)
+    """
+
+    def __init__(
+        self,
+        table,
+        workers: int = LOADER_WORKERS,
+        write_budget: float = LOADER_WRITE_BUDGET,
+        max_retries: int = LOADER_MAX_RETRIES,
+        aggregate_store: AggregateStore = None,
+        tombstones=None
+    ):
+        self.table_name = table.name
+        self.client = table.meta.client
+        self.workers = workers
+        self.max_retries = max_retries
+        self.throttle = WriteThrottle(write_budget)
+        self.aggregate_store = aggregate_store
+        self.tombstones = tombstones
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+
+    def _put_batch(self, items):
+        """Write up to 25 items stamped with the current sync time"""
+        ms = now_ms()
+        requests = []
+        for item in items:
+            (patient_id,) = item['patient_id'].values()
+            stamp = sync_stamp(patient_id, ms)
+            requests.append({'PutRequest': {'Item': {
+                **item,
+                'sync_day': {'S': stamp['sync_day']},
+                'synced_at': {'N': str(ms)}
+            }}})
+        return self._write_batch(requests)
+
+    def _delete_batch(self, items):
+        """Tombstone, then delete, up to 25 existing items"""
+        keys = [{name: item[name] for name in KEY_ATTRIBUTES} for item in items]
+        retries, units = 0, 0.0
+        if self.tombstones is not None:
+            python_keys = [
+                {name: self._deserializer.deserialize(value) for name, value in key.items()}
+                for key in keys
+            ]
+            tombstones = [
+                {name: self._serializer.serialize(value) for name, value in tombstone.items()}
+                for tombstone in tombstone_items(python_keys, now_ms())
+            ]
+            retries, units = self._write_batch(
+                [{'PutRequest': {'Item': item}} for item in tombstones],
+                self.tombstones.name,
+                self.tombstones.meta.client
+            )
+        more_retries, more_units = self._write_batch([{'DeleteRequest': {'Key': key}} for key in keys])
+        return retries + more_retries, units + more_units
+
+    def _read_batch(self, items):
+        """Stored versions (keys and aggregated attributes) of up to 100 items"""
+        request = {self.table_name: {
+            'Keys': [{name: item[name] for name in KEY_ATTRIBUTES} for item in items],
+            **projection(KEY_ATTRIBUTES + AGGREGATE_FIELDS)
+        }}
+        found = []
+        retries = 0
+
+        while True:
+            try:
+                response = self.client.batch_get_item(RequestItems=request)
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code not in RETRYABLE_ERRORS or retries >= self.max_retries:
+                    raise
+                time.sleep(_backoff(retries))
+                retries += 1
+                continue
+
+            found.extend(response.get('Responses', {}).get(self.table_name, []))
+            request = response.get('UnprocessedKeys') or {}
+            if not request:
+                return found
+            if retries >= self.max_retries:
+                left = sum(len(r['Keys']) for r in request.values())
+                raise LoadError(f"{left} keys still unread after {retries} retries")
+            time.sleep(_backoff(retries))
+            retries += 1
+
+    def _write_batch(self, requests, table_name: str = None, client=None):
+        """Send up to 25 put/delete requests, retrying whatever DynamoDB leaves unprocessed"""
+        client = client or self.client
+        request = {table_name or self.table_name: requests}
+        retries = 0
+        units = 0.0
+
+        while True:
+            self.throttle.acquire()
+            try:
+                response = client.batch_write_item(
+                    RequestItems=request,
+                    ReturnConsumedCapacity='TOTAL'
+                )
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code not in RETRYABLE_ERRORS or retries >= self.max_retries:
+                    raise
+                self.throttle.throttled()
+                time.sleep(_backoff(retries))
+                retries += 1
+                continue
+
+            consumed = sum(c.get('CapacityUnits', 0) for c in response.get('ConsumedCapacity', []))
+            units += consumed
+            self.throttle.charge(consumed)
+
+            request = response.get('UnprocessedItems') or {}
+            if not request:
+                self.throttle.recovered()
+                return retries, units
+            if retries >= self.max_retries:
+                left = sum(len(r) for r in request.values())
+                raise LoadError(f"{left} items still unprocessed after {retries} retries")
+            self.throttle.throttled()
+            time.sleep(_backoff(retries))
+            retries += 1
+
+    def load_frames(self, frames, source: str = "", delete: bool = False, version: str = None) -> LoadReport:
+        """
+        Write every frame, applying its net effect to the aggregates first
+
+        The stored versions of a frame's keys are read before anything
+        is written, and the aggregate deltas (with the chunk's marker)
+        are applied before the writes. A run interrupted after the apply
+        is completed by a retry, which skips the applied chunks' deltas.
+
+        Parameters:
+        - frames: Iterable of processed DataFrames
+        - source: Label for the report, and part of the chunk markers
+        - delete: Delete the frames' rows (by key) instead of writing them
+        - version: Identity of the source contents (see source_version);
+          without it the aggregate updates are not idempotent
+        """
+        report = LoadReport(source)
+        write = self._delete_batch if delete else self._put_batch
+        operation = 'delete' if delete else 'put'
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="loader") as pool:
+            for frame in frames:
+                items = frame_to_items(frame)
+                offset = report.rows
+                report.rows += len(frame)
+
+                stored = []
+                if delete or self.aggregate_store is not None:
+                    reads = [items[i:i + READ_BATCH_SIZE] for i in range(0, len(items), READ_BATCH_SIZE)]
+                    for found in pool.map(self._read_batch, reads):
+                        stored.extend(found)
+
+                if self.aggregate_store is not None:
+                    added = [] if delete else map(_counted, items)
+                    deltas = net_deltas(added, map(_counted, stored))
+                    marker = None
+                    if version is not None:
+                        marker = f"{operation}#{source}#{version}#{offset}+{len(frame)}"
+                    if self.aggregate_store.add(deltas, marker=marker) is None:
+                        report.chunks_already_applied += 1
+
+                if delete:
+                    # Only keys that exist are tombstoned and deleted
+                    items = stored
+                batches = [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+                for retries, units in pool.map(write, batches):
+                    report.retries += retries
+                    report.consumed_capacity += units
+
+                report.items += len(items)
+                report.batches += len(batches)
+
+        report.finish()
+        logger.info("Loaded %s: %s", source, json.dumps(report.as_dict()))
+        return report
+
+    def load(self, source: str, chunk_size: int = LOADER_CHUNK_SIZE, s3_client=None, delete: bool = False) -> LoadReport:
+        """Stream a processed file (local or s3://) into the table, or delete its rows"""
+        version = None
+        if self.aggregate_store is not None:
+            if source.startswith("s3://"):
+                s3_client = s3_client or boto3.client('s3', region_name=AWS_REGION)
+            version = source_version(source, s3_client)
+        etag = version if source.startswith("s3://") else None
+        frames = read_frames(source, chunk_size, s3_client, etag=etag)
+        return self.load_frames(frames, source, delete, version=version)
+
+
+def load_source(source: str, **kwargs) -> LoadReport:
+    """Load one file into the configured patient table, updating aggregates"""
+    store = AggregateStore(create_aggregates_table()) if LOADER_UPDATE_AGGREGATES else None
+    loader = BulkLoader(create_table(), aggregate_store=store, **kwargs)
+    return loader.load(source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AIER Bulk Patient Loader')
+    parser.add_argument('source', help='s3://bucket/key, CSV/Parquet file or Parquet dataset directory')
+    parser.add_argument('--workers', type=int, default=LOADER_WORKERS, help='Parallel BatchWriteItem calls')
+    parser.add_argument('--write-budget', type=float, default=LOADER_WRITE_BUDGET,
+                        help='Write capacity units per second (0 = unlimited)')
+    parser.add_argument('--chunk-size', type=int, default=LOADER_CHUNK_SIZE, help='Rows read per chunk')
+    parser.add_argument('--skip-aggregates', action='store_true', help='Do not update the aggregates table')
+    parser.add_argument('--delete', action='store_true',
+                        help='Delete the rows of the source (by patient_id/timestamp) and leave tombstones')
+    args = parser.parse_args()
+
+    store = None if args.skip_aggregates else AggregateStore(create_aggregates_table())
+    loader = BulkLoader(
+        create_table(),
+        workers=args.workers,
+        write_budget=args.write_budget,
+        aggregate_store=store,
+        tombstones=create_tombstones_table() if args.delete else None
+    )
+    report = loader.load(args.source, chunk_size=args.chunk_size, delete=args.delete)
+    print(json.dumps(report.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,575 @@
+"""
+AIER Alert System - In-Memory DynamoDB Table
+Local stand-in for the patient table used for development and benchmarks
+
+Implements the subset of the boto3 Table API the backend relies on:
+scan/query with pagination, segments, GSIs, projections and boto3
+condition objects, plus the basic item operations. Table.meta.client
+supports the low-level batch_write_item, batch_get_item and
+transact_write_items calls used by the bulk loader and aggregates.
+
+Every write is also appended to a bounded change stream (INSERT, MODIFY
+or REMOVE with the new and old images), the stand-in for the table's
+DynamoDB Stream read by app.changefeed.
+"""
+
+import math
+import re
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import deque
+from decimal import Decimal
+from itertools import islice
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+# Mirrors aws_dynamodb_table.patient_data in terraform/main.tf
+DEFAULT_INDEXES = {
+    'RiskLevelIndex': ('risk_level', 'timestamp'),
+    'AgeGroupIndex': ('age_group', 'timestamp'),
+    'SyncIndex': ('sync_day', 'synced_at'),
+}
+
+# Change records kept by the stream; DynamoDB keeps 24 hours' worth
+STREAM_RETENTION = 100_000
+
+
+class _Client:
+    """Stand-in for the low-level client behind Table.meta.client"""
+
+    def __init__(self, table):
+        self.table = table
+        self._deserializer = TypeDeserializer()
+        self._serializer = TypeSerializer()
+
+    def _check_table(self, table_name):
+        if table_name != self.table.name:
+            raise ValueError(f"Unknown table: {table_name}")
+
+    def _python(self, wire):
+        return {name: self._deserializer.deserialize(value) for name, value in wire.items()}
+
+    def _wire(self, item):
+        return {
+            name: self._serializer.serialize(Decimal(str(value)) if isinstance(value, float) else value)
+            for name, value in item.items()
+        }
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity=None, **kwargs):
+        """Apply wire-format put/delete requests; everything is processed"""
+        units = 0
+        for table_name, requests in RequestItems.items():
+            self._check_table(table_name)
+            if len(requests) > 25:
+                raise ValueError("Too many items requested for the BatchWriteItem call")
+            for request in requests:
+                if 'PutRequest' in request:
+                    item = {
+                        name: self._deserializer.deserialize(value)
+                        for name, value in request['PutRequest']['Item'].items()
+                    }
+                    self.table.put_item(Item=item)
+                else:
+                    key = {
+                        name: self._deserializer.deserialize(value)
+                        for name, value in request['DeleteRequest']['Key'].items()
+                    }
+                    item = self.table.get_item(Key=key).get('Item', key)
+                    self.table.delete_item(Key=key)
+                units += max(1, math.ceil(_item_size(item) / 1024))
+
+        response = {'UnprocessedItems': {}}
+        if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+            response['ConsumedCapacity'] = [{'TableName': self.table.name, 'CapacityUnits': units}]
+        return response
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        """Read wire-format keys; missing items are left out, nothing is unprocessed"""
+        responses = {}
+        for table_name, request in RequestItems.items():
+            self._check_table(table_name)
+            if len(request['Keys']) > 100:
+                raise ValueError("Too many items requested for the BatchGetItem call")
+            found = []
+            for key in request['Keys']:
+                item = self.table.get_item(
+                    Key=self._python(key),
+                    ProjectionExpression=request.get('ProjectionExpression'),
+                    ExpressionAttributeNames=request.get('ExpressionAttributeNames')
+                ).get('Item')
+                if item is not None:
+                    found.append(self._wire(item))
+            responses[table_name] = found
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        """
+        All-or-nothing Put/Update requests
+
+        Only attribute_exists / attribute_not_exists conditions are
+        supported. A failed condition cancels the whole transaction with
+        a TransactionCanceledException carrying CancellationReasons.
+        """
+        writes = []
+        reasons = []
+        for request in TransactItems:
+            (action, params), = request.items()
+            self._check_table(params['TableName'])
+            if action == 'Put':
+                item = self._python(params['Item'])
+                key = {k: item[k] for k in (self.table.hash_key, self.table.range_key) if k}
+            elif action == 'Update':
+                key = self._python(params['Key'])
+            else:
+                raise NotImplementedError(f"Unsupported transaction action: {action}")
+            current = self.table.get_item(Key=key).get('Item')
+            passed = _check(params.get('ConditionExpression'), params.get('ExpressionAttributeNames'), current)
+            reasons.append({'Code': 'None' if passed else 'ConditionalCheckFailed'})
+            writes.append((action, params, item if action == 'Put' else key))
+
+        if any(r['Code'] != 'None' for r in reasons):
+            raise ClientError(
+                {
+                    'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+                    'CancellationReasons': reasons
+                },
+                'TransactWriteItems'
+            )
+        for action, params, item in writes:
+            if action == 'Put':
+                self.table.put_item(Item=item)
+            else:
+                self.table.update_item(
+                    Key=item,
+                    UpdateExpression=params['UpdateExpression'],
+                    ExpressionAttributeNames=params.get('ExpressionAttributeNames'),
+                    ExpressionAttributeValues=self._python(params.get('ExpressionAttributeValues', {}))
+                )
+        return {}
+
+
+def _check(expression, names, item) -> bool:
+    """Evaluate an attribute_exists / attribute_not_exists condition string"""
+    if not expression:
+        return True
+    match = re.fullmatch(r'\s*(attribute_exists|attribute_not_exists)\(\s*([#\w]+)\s*\)\s*', expression)
+    if match is None:
+        raise NotImplementedError(f"Unsupported condition expression: {expression}")
+    function, path = match.groups()
+    exists = item is not None and (names or {}).get(path, path) in item
+    return exists if function == 'attribute_exists' else not exists
+
+
+class _Meta:
+    """Minimal stand-in for Table.meta"""
+
+    def __init__(self, table):
+        self.table = table
+        self.client = _Client(table)
+
+
+def _attribute_name(attr):
+    return attr.name
+
+
+def evaluate_condition(condition, item):
+    """
+    Evaluate a boto3 Key/Attr condition object against an item
+
+    Parameters:
+    - condition: boto3.dynamodb.conditions.ConditionBase instance
+    - item: Item dictionary
+    """
+    operator = condition.expression_operator
+    values = condition._values
+
+    if operator == 'AND':
+        return evaluate_condition(values[0], item) and evaluate_condition(values[1], item)
+    if operator == 'OR':
+        return evaluate_condition(values[0], item) or evaluate_condition(values[1], item)
+    if operator == 'NOT':
+        return not evaluate_condition(values[0], item)
+
+    name = _attribute_name(values[0])
+    if operator == 'attribute_exists':
+        return name in item
+    if operator == 'attribute_not_exists':
+        return name not in item
+    if name not in item:
+        return False
+
+    value = item[name]
+    try:
+        if operator == '=':
+            return value == values[1]
+        if operator == '<>':
+            return value != values[1]
+        if operator == '<':
+            return value < values[1]
+        if operator == '<=':
+            return value <= values[1]
+        if operator == '>':
+            return value > values[1]
+        if operator == '>=':
+            return value >= values[1]
+        if operator == 'BETWEEN':
+            return values[1] <= value <= values[2]
+        if operator == 'IN':
+            return value in values[1]
+        if operator == 'begins_with':
+            return isinstance(value, str) and value.startswith(values[1])
+        if operator == 'contains':
+            return values[1] in value
+    except TypeError:
+        # Mismatched types never match in DynamoDB
+        return False
+
+    raise NotImplementedError(f"Unsupported condition operator: {operator}")
+
+
+def _split_key_condition(condition, hash_key):
+    """Split a key condition into (hash value, optional range condition)"""
+    if condition.expression_operator == 'AND':
+        left, right = condition._values
+        if _attribute_name(left._values[0]) == hash_key:
+            return left._values[1], right
+        return right._values[1], left
+    return condition._values[1], None
+
+
+def _range_bounds(condition, range_values):
+    """
+    Slice of a sorted partition matching a range key condition, found by
+    bisection like a DynamoDB key condition; None to fall back to a filter
+    """
+    operator = condition.expression_operator
+    values = condition._values
+    try:
+        if operator == 'BETWEEN':
+            return bisect_left(range_values, values[1]), bisect_right(range_values, values[2])
+        if operator == '=':
+            return bisect_left(range_values, values[1]), bisect_right(range_values, values[1])
+        if operator == '>=':
+            return bisect_left(range_values, values[1]), len(range_values)
+        if operator == '>':
+            return bisect_right(range_values, values[1]), len(range_values)
+        if operator == '<=':
+            return 0, bisect_right(range_values, values[1])
+        if operator == '<':
+            return 0, bisect_left(range_values, values[1])
+    except TypeError:
+        # Mixed types (e.g. items missing the range key)
+        return None
+    return None
+
+
+def _projected(item, projection, names):
+    if not projection:
+        return dict(item)
+    names = names or {}
+    result = {}
+    for path in projection.split(','):
+        attr = names.get(path.strip(), path.strip())
+        if attr in item:
+            result[attr] = item[attr]
+    return result
+
+
+def _parse_update(expression):
+    """Split 'SET a = :a ADD b :b, c :c' into [(action, [clauses])]"""
+    actions = []
+    for token in expression.split():
+        if token.upper() in ('SET', 'ADD', 'REMOVE', 'DELETE'):
+            actions.append((token.upper(), []))
+        else:
+            actions[-1][1].append(token)
+    return [
+        (action, [c.strip() for c in ' '.join(tokens).split(',') if c.strip()])
+        for action, tokens in actions
+    ]
+
+
+def _item_size(item):
+    return sum(len(str(k)) + len(str(v)) for k, v in item.items())
+
+
+class InMemoryTable:
+    """
+    Dictionary-backed table with the patient table's key schema
+
+    Parameters:
+    - name: Table name
+    - hash_key / range_key: Primary key attributes
+    - indexes: {index_name: (hash_key, range_key)} for GSIs
+    - max_page_items: Items evaluated per page, emulating the 1 MB limit
+    - stream_retention: Change records kept for stream_records
+    """
+
+    def __init__(
+        self,
+        name: str = "aier-patient-data",
+        hash_key: str = 'patient_id',
+        range_key: str = 'timestamp',
+        indexes: dict = None,
+        max_page_items: int = 1000,
+        stream_retention: int = STREAM_RETENTION
+    ):
+        self.name = name
+        self.table_name = name
+        self.meta = _Meta(self)
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = dict(DEFAULT_INDEXES if indexes is None else indexes)
+        self.max_page_items = max_page_items
+
+        self._items = {}
+        self._order = []
+        self._position = {}
+        self._partitions = {}
+        self._index_partitions = {name: {} for name in self.indexes}
+        self._sorted_cache = {}
+
+        # (sequence, event name, new image, old image), oldest first
+        self.stream = deque(maxlen=stream_retention)
+        self.stream_sequence = 0
+
+    # ------------------------------------------------------------------
+    # Item operations
+    # ------------------------------------------------------------------
+
+    def _key_of(self, item):
+        if self.range_key is None:
+            return (item[self.hash_key], None)
+        return (item[self.hash_key], item[self.range_key])
+
+    def put_item(self, Item, ConditionExpression=None, **kwargs):
+        """Write an item; a boto3 condition object is checked against the current item"""
+        key = self._key_of(Item)
+        old = self._items.get(key)
+        if ConditionExpression is not None and not evaluate_condition(ConditionExpression, old or {}):
+            raise ClientError(
+                {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}},
+                'PutItem'
+            )
+        if old is not None:
+            self._unlink(key)
+        else:
+            self._position[key] = len(self._order)
+            self._order.append(key)
+
+        self._items[key] = dict(Item)
+        self._record('INSERT' if old is None else 'MODIFY', self._items[key], old)
+        self._partitions.setdefault(key[0], set()).add(key)
+        self._sorted_cache.pop((None, key[0]), None)
+        for index_name, (index_hash, _) in self.indexes.items():
+            if index_hash in Item:
+                partition = self._index_partitions[index_name].setdefault(Item[index_hash], set())
+                partition.add(key)
+                self._sorted_cache.pop((index_name, Item[index_hash]), None)
+        return {}
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        item = self._items.get(self._key_of(Key))
+        response = {} if item is None else {'Item': _projected(item, ProjectionExpression, ExpressionAttributeNames)}
+        if kwargs.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+            # Eventually consistent read: 0.5 units per 4 KB, rounded up
+            size = _item_size(item) if item is not None else 0
+            response['ConsumedCapacity'] = {
+                'TableName': self.name,
+                'CapacityUnits': max(0.5, math.ceil(size / 4096) * 0.5)
+            }
+        return response
+
+    def update_item(
+        self,
+        Key,
+        UpdateExpression,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+        **kwargs
+    ):
+        """Apply a SET/ADD update expression (simple paths only)"""
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        key = self._key_of(Key)
+        item = dict(self._items.get(key, Key))
+
+        for action, clauses in _parse_update(UpdateExpression):
+            for clause in clauses:
+                if action == 'SET':
+                    path, placeholder = [p.strip() for p in clause.split('=')]
+                    item[names.get(path, path)] = values[placeholder]
+                elif action == 'ADD':
+                    path, placeholder = clause.split()
+                    attr = names.get(path, path)
+                    item[attr] = item.get(attr, 0) + values[placeholder]
+                else:
+                    raise NotImplementedError(f"Unsupported update action: {action}")
+
+        self.put_item(Item=item)
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        key = self._key_of(Key)
+        if key in self._items:
+            self._unlink(key)
+            self._record('REMOVE', None, self._items.pop(key))
+            self._order = [k for k in self._order if k != key]
+            self._position = {k: i for i, k in enumerate(self._order)}
+        return {}
+
+    def _unlink(self, key):
+        """Remove a key from the partition and index bookkeeping"""
+        item = self._items[key]
+        self._partitions.get(key[0], set()).discard(key)
+        self._sorted_cache.pop((None, key[0]), None)
+        for index_name, (index_hash, _) in self.indexes.items():
+            if index_hash in item:
+                self._index_partitions[index_name].get(item[index_hash], set()).discard(key)
+                self._sorted_cache.pop((index_name, item[index_hash]), None)
+
+    def __len__(self):
+        return len(self._items)
+
+    # ------------------------------------------------------------------
+    # Change stream
+    # ------------------------------------------------------------------
+
+    def _record(self, event_name, new_image, old_image):
+        self.stream_sequence += 1
+        self.stream.append((self.stream_sequence, event_name, new_image, old_image))
+
+    def stream_records(self, after: int = 0, limit: int = 1000) -> list:
+        """
+        Change records with a sequence number above `after`, oldest first
+
+        Records already dropped by retention are skipped, like reading
+        an expired position of a DynamoDB Stream shard.
+        """
+        if not self.stream:
+            return []
+        start = max(0, after - self.stream[0][0] + 1)
+        return list(islice(self.stream, start, start + limit))
+
+    # ------------------------------------------------------------------
+    # Scan / Query
+    # ------------------------------------------------------------------
+
+    def _last_key(self, key, index_name):
+        item = self._items[key]
+        last = {self.hash_key: key[0]}
+        if self.range_key is not None:
+            last[self.range_key] = key[1]
+        if index_name:
+            for attr in self.indexes[index_name]:
+                last[attr] = item[attr]
+        return last
+
+    def _page(self, keys, start, kwargs, index_name):
+        """Evaluate one page of keys starting at position `start`"""
+        limit = kwargs.get('Limit') or self.max_page_items
+        limit = min(limit, self.max_page_items)
+        filter_condition = kwargs.get('FilterExpression')
+        projection = kwargs.get('ProjectionExpression')
+        names = kwargs.get('ExpressionAttributeNames')
+
+        page_keys = keys[start:start + limit]
+        items = []
+        scanned_bytes = 0
+        for key in page_keys:
+            item = self._items[key]
+            scanned_bytes += _item_size(item)
+            if filter_condition is not None and not evaluate_condition(filter_condition, item):
+                continue
+            items.append(_projected(item, projection, names))
+
+        response = {'Count': len(items), 'ScannedCount': len(page_keys)}
+        if kwargs.get('Select') != 'COUNT':
+            response['Items'] = items
+        if start + limit < len(keys) and page_keys:
+            response['LastEvaluatedKey'] = self._last_key(page_keys[-1], index_name)
+        if kwargs.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+            response['ConsumedCapacity'] = {
+                'TableName': self.name,
+                'CapacityUnits': max(0.5, math.ceil(scanned_bytes / 4096) * 0.5)
+            }
+        return response
+
+    def scan(self, **kwargs):
+        index_name = kwargs.get('IndexName')
+        keys = self._order
+        if index_name:
+            index_hash, _ = self.indexes[index_name]
+            keys = [k for k in keys if index_hash in self._items[k]]
+
+        total_segments = kwargs.get('TotalSegments')
+        if total_segments:
+            segment = kwargs['Segment']
+            keys = [
+                k for k in keys
+                if zlib.crc32(str(k[0]).encode()) % total_segments == segment
+            ]
+
+        start = 0
+        start_key = kwargs.get('ExclusiveStartKey')
+        if start_key:
+            key = self._key_of(start_key)
+            if index_name or total_segments:
+                start = keys.index(key) + 1
+            else:
+                start = self._position[key] + 1
+
+        return self._page(keys, start, kwargs, index_name)
+
+    def _sorted_partition(self, index_name, hash_value):
+        cache_key = (index_name, hash_value)
+        if cache_key not in self._sorted_cache:
+            if index_name:
+                _, index_range = self.indexes[index_name]
+                keys = self._index_partitions[index_name].get(hash_value, set())
+                ordered = sorted(keys, key=lambda k: (self._items[k].get(index_range), k))
+                sort_values = [(self._items[k].get(index_range), k) for k in ordered]
+            else:
+                ordered = sorted(self._partitions.get(hash_value, set()), key=lambda k: k[1])
+                sort_values = [(k[1], k) for k in ordered]
+            self._sorted_cache[cache_key] = (ordered, sort_values, [v for v, _ in sort_values])
+        return self._sorted_cache[cache_key]
+
+    def query(self, KeyConditionExpression, **kwargs):
+        index_name = kwargs.get('IndexName')
+        if index_name:
+            hash_attr, range_attr = self.indexes[index_name]
+        else:
+            hash_attr, range_attr = self.hash_key, self.range_key
+
+        hash_value, range_condition = _split_key_condition(KeyConditionExpression, hash_attr)
+        keys, sort_values, range_values = self._sorted_partition(index_name, hash_value)
+
+        if range_condition is not None:
+            bounds = _range_bounds(range_condition, range_values)
+            if bounds is not None:
+                keys = keys[bounds[0]:bounds[1]]
+                sort_values = sort_values[bounds[0]:bounds[1]]
+            else:
+                keys = [
+                    k for k in keys
+                    if evaluate_condition(range_condition, self._items[k])
+                ]
+                sort_values = [
+                    (self._items[k].get(range_attr), k) for k in keys
+                ]
+
+        forward = kwargs.get('ScanIndexForward', True)
+        start = 0
+        start_key = kwargs.get('ExclusiveStartKey')
+        if start_key:
+            marker = (start_key[range_attr], self._key_of(start_key))
+            if forward:
+                start = bisect_right(sort_values, marker)
+            else:
+                start = len(keys) - bisect_left(sort_values, marker)
+        if not forward:
+            keys = keys[::-1]
+
+        return self._page(keys, start, kwargs, index_name)
@@ -3,19 +3,75 @@ AIER Alert System - FastAPI Backend
 Main application entry point
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from typing import List, Optional
-import boto3
 from boto3.dynamodb.conditions import Key
-import os
 from datetime import datetime
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from . import aggregates, planner
+from .aggregates import AggregateStore, create_aggregates_table
+from .cache import ResponseCache
+from .changefeed import (
+    CHANGEFEED_MAX_CLIENTS,
+    CHANGEFEED_SOURCE,
+    ChangeFeed,
+    StreamLease,
+    follow_stream,
+    snapshot_listener,
+    stream_reader,
+)
+from .batch import fetch_latest
+from .compression import CompressionMiddleware
+from .database import AsyncTable, create_table
+from .downsample import DEFAULT_SERIES, HISTORY_PAGE_SIZE, column, lttb_series, minmax
+from .export import EXPORT_FORMATS, csv_stream, ndjson_stream
+from .metrics import METRICS_ENABLED, REGISTRY, MetricsMiddleware
+from .models import (
+    MAX_HISTORY_POINTS,
+    NUMERIC_FIELDS,
+    PATIENT_FIELDS,
+    PatientBatchRequest,
+    ScoreRequest,
+)
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, iter_pages
+from .projection import UnknownFields, parse_fields, projection, validate_fields
+from .responses import FastJSONResponse
+from .scan import parallel_scan
+from .scoring import load_scorer
+from .scatter import (
+    BIN_FIELDS,
+    SAMPLE_FIELDS,
+    HistogramReducer,
+    ReservoirReducer,
+    binned_payload,
+    scatter_point,
+)
+from .snapshot import SNAPSHOT_ENABLED, PatientSnapshot
+from .sync import (
+    SYNC_FIELDS,
+    TOMBSTONE_FIELDS,
+    SyncExpired,
+    create_tombstones_table,
+    read_page,
+    rows,
+    sync_window,
+)
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AIER Alert System API",
     description="API for patient monitoring and visualization",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # CORS Configuration - Allow frontend to access API
@@ -29,15 +85,80 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # Lets the client send If-None-Match
 )
 
-# AWS Configuration
-AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
-DYNAMODB_TABLE = os.getenv("DYNAMODB_TABLE_NAME", "aier-patient-data")
+# br/gzip for JSON and export bodies above COMPRESSION_MIN_SIZE
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency, response size and DynamoDB cost, served at /metrics.
+# Added last so it is outermost and times compression too
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Initialize DynamoDB access
+# All table calls go through the bounded executor in AsyncTable so a
+# slow scan never blocks the event loop
+table = create_table()
+db = AsyncTable(table)
+
+# Deleted patient keys, kept for /api/sync clients
+tombstone_db = AsyncTable(create_tombstones_table(), max_concurrency=4)
+
+# Materialized aggregates maintained by the ingestion path
+aggregate_store = AggregateStore(create_aggregates_table())
+
+async def load_tallies():
+    """Aggregate counters for the query planner (None until built)"""
+    return await db.run(aggregate_store.load)
+
+# Partition sizes the listing planner compares indexes by
+table_stats = planner.TableStats(load_tallies)
+
+# Shared cache for the dashboard read endpoints
+response_cache = ResponseCache()
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
-table = dynamodb.Table(DYNAMODB_TABLE)
+# Columnar in-process copy of the table for the analytics endpoints
+snapshot = PatientSnapshot(db, tombstones=tombstone_db)
+
+# Risk score weights and buckets shared with scripts/data-pipeline.py
+scorer = load_scorer()
+
+# HIGH/CRITICAL changes pushed to /api/alerts/stream subscribers
+alert_feed = ChangeFeed()
+
+@app.on_event("startup")
+async def startup():
+    """
+    Start the background snapshot refresh and the alert change feed
+    """
+    if CHANGEFEED_SOURCE != "off":
+        alert_feed.source = "snapshot"
+    if CHANGEFEED_SOURCE == "stream":
+        # One process per stream reads it; the others diff the snapshot
+        # and retry the lease
+        app.state.changefeed_task = asyncio.create_task(follow_stream(
+            alert_feed,
+            StreamLease(aggregate_store.table),
+            lambda: stream_reader(table)
+        ))
+
+    if SNAPSHOT_ENABLED:
+        # The first load tells the feed which patients are already alerting
+        snapshot.listeners.append(snapshot_listener(alert_feed))
+        app.state.snapshot_task = asyncio.create_task(snapshot.run())
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Stop background work and release DynamoDB worker threads
+    """
+    for name in ("snapshot_task", "changefeed_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    db.close()
+    tombstone_db.close()
 
 @app.get("/")
 async def root():
@@ -51,8 +172,15 @@ async def root():
         "endpoints": {
             "patients": "/api/patients",
             "patient_detail": "/api/patients/{patient_id}",
+            "patient_history": "/api/patients/{patient_id}/history",
+            "patient_export": "/api/patients/export",
+            "patient_batch": "/api/patients/batch",
+            "sync": "/api/sync",
+            "score": "/api/score",
+            "alert_stream": "/api/alerts/stream",
             "statistics": "/api/statistics",
-            "visualization_data": "/api/visualizations/{chart_type}"
+            "visualization_data": "/api/visualizations/{chart_type}",
+            "metrics": "/metrics"
         },
         "timestamp": datetime.utcnow().isoformat()
     }
@@ -64,7 +192,7 @@ async def health_check():
     """
     try:
         # Test DynamoDB connection
-        response = table.scan(Limit=1)
+        response = await db.scan(Limit=1)
         
         return {
             "status": "healthy",
@@ -78,44 +206,287 @@ async def health_check():
             detail=f"Service unhealthy: {str(e)}"
         )
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Request and DynamoDB metrics in Prometheus text format
+    """
+    return PlainTextResponse(
+        REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+def requested_fields(fields: Optional[str]):
+    """
+    Validate a `fields` query parameter up front
+
+    Unknown attributes are rejected with 400 before DynamoDB is called.
+    """
+    try:
+        return parse_fields(fields)
+    except UnknownFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def patient_filters(
+    risk_level: Optional[str] = None,
+    age_group: Optional[str] = None,
+    bmi_category: Optional[str] = None,
+    glucose_min: Optional[float] = None,
+    glucose_max: Optional[float] = None,
+    age_min: Optional[float] = None,
+    age_max: Optional[float] = None,
+    bmi_min: Optional[float] = None,
+    bmi_max: Optional[float] = None,
+    risk_score_min: Optional[float] = None,
+    risk_score_max: Optional[float] = None
+) -> dict:
+    """
+    Filter query parameters of a patient listing (the ones that were set)
+    
+    Parameters:
+    - risk_level: LOW, MEDIUM, HIGH or CRITICAL
+    - age_group: <30, 30-40, 40-50, 50-60 or 60+
+    - bmi_category: Underweight, Normal, Overweight or Obese
+    - glucose_min ... risk_score_max: Inclusive numeric bounds
+    """
+    # Every argument is a query parameter
+    return {name: value for name, value in locals().items() if value is not None}
+
+def listing_predicates(params: dict) -> list:
+    """Validated predicates for patient_filters parameters (400 if impossible)"""
+    try:
+        return planner.predicates(params)
+    except planner.InvalidFilter as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/patients")
 async def get_patients(
     limit: int = Query(50, ge=1, le=100),
-    risk_level: Optional[str] = None
+    filters: dict = Depends(patient_filters),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
     """
     Get list of patients with optional filtering
     
+    Filters combine with AND. The planner reads the smallest matching
+    GSI partition (or scans) and pushes the other filters down as a
+    FilterExpression; metadata.plan and metadata.scanned_count show
+    what was read.
+    
     Parameters:
     - limit: Number of records to return (1-100)
-    - risk_level: Filter by risk level (LOW, MEDIUM, HIGH, CRITICAL)
+    - risk_level, age_group, bmi_category: Exact matches
+    - glucose_min/max, age_min/max, bmi_min/max, risk_score_min/max:
+      Inclusive ranges
+    - cursor: next_cursor from the previous page
+    - fields: Comma-separated attributes to return (default: all)
     """
+    predicates = listing_predicates(filters)
+    scope = planner.scope(predicates)
+    selected = requested_fields(fields)
+    
+    index, start_key = None, None
+    if cursor:
+        try:
+            position = decode_cursor(cursor, scope)
+            # Later pages stay on the read the first page was planned on
+            index = position['plan']
+            start_key = {
+                name[2:]: value for name, value in position.items() if name.startswith('k_')
+            }
+        except (InvalidCursor, KeyError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
+    
     try:
-        if risk_level:
-            # Query using Global Secondary Index
-            response = table.query(
-                IndexName='RiskLevelIndex',
-                KeyConditionExpression=Key('risk_level').eq(risk_level.upper()),
-                Limit=limit
-            )
-        else:
-            # Scan all records
-            response = table.scan(Limit=limit)
+        chosen = planner.plan(predicates, await table_stats.counters(), index)
+    except planner.InvalidFilter as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
+    
+    try:
+        result = await planner.execute(db, chosen, limit, start_key, selected)
         
-        patients = response.get('Items', [])
+        patients = result['items']
+        last_key = result['last_key']
+        next_cursor = None
+        if last_key:
+            position = {
+                'plan': chosen.index or 'scan',
+                **{f"k_{name}": value for name, value in last_key.items()}
+            }
+            next_cursor = encode_cursor(position, scope)
         
-        return {
+        # Returned directly so FastAPI does not walk every item through
+        # jsonable_encoder; Decimals are converted by the encoder
+        return FastJSONResponse({
             "status": "success",
             "data": {
                 "patients": patients,
                 "count": len(patients),
-                "has_more": 'LastEvaluatedKey' in response
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor
             },
             "metadata": {
                 "timestamp": datetime.utcnow().isoformat(),
-                "filters": {"risk_level": risk_level} if risk_level else {}
+                "filters": filters,
+                "plan": chosen.describe(),
+                "scanned_count": result['scanned_count']
             }
-        }
+        })
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch patients: {str(e)}"
+        )
+
+@app.get("/api/patients/export")
+async def export_patients(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    filters: dict = Depends(patient_filters),
+    page_size: int = Query(500, ge=1, le=1000),
+    fields: Optional[str] = None
+):
+    """
+    Stream every matching patient as NDJSON or CSV
+    
+    Pages are read and written one at a time, so memory use does not
+    grow with the number of patients exported.
+    
+    Parameters:
+    - format: ndjson or csv
+    - risk_level ... risk_score_max: Filters, as for /api/patients
+    - page_size: Items read from DynamoDB per page
+    - fields: Comma-separated attributes to export (default: all)
+    """
+    selected = requested_fields(fields)
+    chosen = planner.plan(listing_predicates(filters), await table_stats.counters())
+    kwargs = chosen.read_kwargs()
+    kwargs.update(projection(selected))
+    pages = iter_pages(db, chosen.operation, Limit=page_size, **kwargs)
+    if format == "ndjson":
+        body = ndjson_stream(pages)
+    else:
+        body = csv_stream(pages, selected or PATIENT_FIELDS)
+    
+    filename = f"patients_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/api/sync")
+async def sync_patients(
+    since: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=5000)
+):
+    """
+    Patients added, changed or deleted since the client's last sync
+    
+    Pages are columnar: `rows` hold values in `fields` order and
+    `deleted` holds tombstones in `deleted_fields` order. Apply a
+    tombstone only if its synced_at is newer than the local copy's.
+    Follow next_cursor until it is null, then store `watermark` and send
+    it as `since` next time.
+    
+    Parameters:
+    - since: Watermark from the previous sync (omit for a full sync)
+    - cursor: next_cursor from the previous page
+    - limit: Maximum rows plus tombstones per page
+    """
+    scope = f"sync:{since if since is not None else 'full'}"
+    if cursor:
+        try:
+            position = decode_cursor(cursor, scope)
+            key = {
+                name[2:]: value for name, value in position.items() if name.startswith('k_')
+            }
+            state = {
+                'until': int(position['until']),
+                'phase': position['phase'],
+                'partition': int(position['partition']),
+                'key': key or None
+            }
+        except (InvalidCursor, KeyError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
+    else:
+        try:
+            state = {'until': sync_window(since), 'phase': 'items', 'partition': 0, 'key': None}
+        except SyncExpired as e:
+            # Tombstones for that window are gone; only a full sync is safe
+            raise HTTPException(status_code=410, detail=str(e))
+    
+    try:
+        items, deleted, next_state = await read_page(db, tombstone_db, since, state, limit)
+        
+        next_cursor = None
+        if next_state is not None:
+            position = {
+                'until': next_state['until'],
+                'phase': next_state['phase'],
+                'partition': next_state['partition'],
+                **{f"k_{name}": value for name, value in (next_state['key'] or {}).items()}
+            }
+            next_cursor = encode_cursor(position, scope)
+        
+        return FastJSONResponse({
+            "status": "success",
+            "data": {
+                "fields": SYNC_FIELDS,
+                "rows": rows(items, SYNC_FIELDS),
+                "deleted_fields": TOMBSTONE_FIELDS,
+                "deleted": rows(deleted, TOMBSTONE_FIELDS),
+                "count": len(items) + len(deleted),
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor,
+                "watermark": state['until'] if next_cursor is None else None
+            },
+            "metadata": {
+                "since": since,
+                "until": state['until'],
+                "full": since is None,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        })
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to sync patients: {str(e)}"
+        )
+
+@app.post("/api/patients/batch")
+async def get_patients_batch(request: PatientBatchRequest):
+    """
+    Get the latest record for many patients in one request
+    
+    Parameters:
+    - patient_ids: Patient identifiers (duplicates are ignored, max 500 distinct)
+    - fields: Attributes to return (default: all)
+    """
+    selected = None
+    if request.fields is not None:
+        try:
+            selected = validate_fields(request.fields + ['patient_id'])
+        except UnknownFields as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        patients, missing = await fetch_latest(db, request.patient_ids, **projection(selected))
+        
+        return FastJSONResponse({
+            "status": "success",
+            "data": {
+                "patients": patients,
+                "count": len(patients),
+                "missing": missing
+            },
+            "metadata": {
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        })
         
     except Exception as e:
         raise HTTPException(
@@ -123,19 +494,125 @@ async def get_patients(
             detail=f"Failed to fetch patients: {str(e)}"
         )
 
+@app.post("/api/score")
+async def score_patients(request: ScoreRequest):
+    """
+    Risk score and categories for a batch of patient vitals
+    
+    Uses the same scoring engine as the data pipeline, so a patient
+    scores exactly as they would after processing.
+    
+    Parameters:
+    - patients: Vitals per patient (max 5000); patient_id is echoed back
+    """
+    missing = [
+        col for col in scorer.input_columns
+        if any(getattr(p, col, None) is None for p in request.patients)
+    ]
+    if missing:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Missing vitals: {', '.join(missing)}"
+        )
+    
+    try:
+        patients = request.patients
+        columns = {
+            col: np.fromiter((float(getattr(p, col)) for p in patients), dtype=np.float64, count=len(patients))
+            for col in scorer.input_columns
+        }
+        
+        start = time.perf_counter()
+        result = scorer.score_batch(columns)
+        compute_ms = (time.perf_counter() - start) * 1000
+        
+        names = list(scorer.buckets)
+        fields = [result['risk_score'].tolist()] + [scorer.labels(name, result[name]) for name in names]
+        scores = []
+        for patient, row in zip(patients, zip(*fields)):
+            entry = {"patient_id": patient.patient_id, "risk_score": row[0]}
+            entry.update(zip(names, row[1:]))
+            scores.append(entry)
+        
+        return FastJSONResponse({
+            "status": "success",
+            "data": {
+                "scores": scores,
+                "count": len(scores)
+            },
+            "metadata": {
+                "compute_ms": round(compute_ms, 3),
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        })
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to score patients: {str(e)}"
+        )
+
+@app.get("/api/alerts/stream")
+async def stream_alerts(
+    request: Request,
+    risk_level: Optional[str] = None,
+    last_event_id: Optional[str] = None
+):
+    """
+    Server-sent events for patients entering or leaving HIGH/CRITICAL
+    
+    Each `alert` event carries the patient's new reading. A `cleared`
+    event follows when a later reading drops below the alert levels. A
+    `reset` event means events were missed and the client should reload
+    /api/patients.
+    
+    Parameters:
+    - risk_level: Comma-separated alert levels to receive (default: all)
+    - last_event_id: Resume after this event; EventSource sends it as
+      the Last-Event-ID header when it reconnects
+    """
+    levels = None
+    if risk_level:
+        levels = {level.strip().upper() for level in risk_level.split(",") if level.strip()}
+        unknown = levels - alert_feed.levels
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Not alert levels: {', '.join(sorted(unknown))}"
+            )
+    
+    if CHANGEFEED_SOURCE == "off":
+        raise HTTPException(status_code=503, detail="Alert stream is disabled")
+    if alert_feed.subscribers >= CHANGEFEED_MAX_CLIENTS:
+        raise HTTPException(status_code=503, detail="Too many alert stream clients")
+    
+    resume = request.headers.get("last-event-id") or last_event_id
+    return StreamingResponse(
+        alert_feed.stream(resume, levels),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx)
+        }
+    )
+
 @app.get("/api/patients/{patient_id}")
-async def get_patient(patient_id: str):
+async def get_patient(patient_id: str, fields: Optional[str] = None):
     """
     Get detailed information for a specific patient
     
     Parameters:
     - patient_id: Patient identifier (e.g., PT-00001)
+    - fields: Comma-separated attributes to return (default: all)
     """
+    read_fields = projection(requested_fields(fields))
+    
     try:
-        response = table.query(
+        response = await db.query(
             KeyConditionExpression=Key('patient_id').eq(patient_id),
             ScanIndexForward=False,  # Most recent first
-            Limit=1
+            Limit=1,
+            **read_fields
         )
         
         items = response.get('Items', [])
@@ -145,13 +622,13 @@ async def get_patient(patient_id: str):
                 detail=f"Patient {patient_id} not found"
             )
         
-        return {
+        return FastJSONResponse({
             "status": "success",
             "data": items[0],
             "metadata": {
                 "timestamp": datetime.utcnow().isoformat()
             }
-        }
+        })
         
     except HTTPException:
         raise
@@ -161,58 +638,198 @@ async def get_patient(patient_id: str):
             detail=f"Failed to fetch patient: {str(e)}"
         )
 
-@app.get("/api/statistics")
-async def get_statistics():
+def history_condition(patient_id: str, start: Optional[int], end: Optional[int]):
     """
-    Get overall dataset statistics and aggregations
+    Key condition for a patient's records with timestamp in [start, end]
+
+    The bounds go into the range key condition, so DynamoDB reads only
+    the records inside the range.
+    """
+    condition = Key('patient_id').eq(patient_id)
+    if start is not None and end is not None:
+        return condition & Key('timestamp').between(start, end)
+    if start is not None:
+        return condition & Key('timestamp').gte(start)
+    if end is not None:
+        return condition & Key('timestamp').lte(end)
+    return condition
+
+@app.get("/api/patients/{patient_id}/history")
+async def get_patient_history(
+    patient_id: str,
+    start: Optional[int] = Query(None, alias="from", ge=0),
+    end: Optional[int] = Query(None, alias="to", ge=0),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(500, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    downsample: Optional[str] = Query(None, pattern="^(minmax|lttb)$"),
+    points: int = Query(500, ge=2, le=MAX_HISTORY_POINTS)
+):
+    """
+    Records of a patient over time
+    
+    Without `downsample`, records are returned a page at a time; follow
+    next_cursor for the rest of the range. With `downsample`, the whole
+    range is read on the server and reduced to about `points` values
+    per series, so a long history charts from one small response.
+    
+    Parameters:
+    - patient_id: Patient identifier (e.g., PT-00001)
+    - from, to: Inclusive timestamp bounds (epoch seconds)
+    - order: asc (oldest first) or desc
+    - limit: Records per page (1-1000)
+    - cursor: next_cursor from the previous page
+    - fields: Attributes to return; with downsample, the numeric series
+      to reduce (default: Glucose, BloodPressure, BMI, risk_score)
+    - downsample: minmax (min/max/mean per time window) or lttb
+    - points: Windows (minmax) or samples per series (lttb)
     """
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    condition = history_condition(patient_id, start, end)
+    window = {"from": start, "to": end}
+    
+    if downsample:
+        if cursor:
+            raise HTTPException(status_code=400, detail="cursor does not apply to downsampled history")
+        series = requested_fields(fields) or DEFAULT_SERIES
+        not_numeric = [f for f in series if f not in NUMERIC_FIELDS]
+        if not_numeric:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot downsample non-numeric fields: {', '.join(not_numeric)}"
+            )
+        return await downsampled_history(patient_id, condition, window, series, downsample, points)
+    
+    scope = f"history:{patient_id}:{start}:{end}:{order}"
+    kwargs = {
+        'KeyConditionExpression': condition,
+        'ScanIndexForward': order == "asc",
+        'Limit': limit,
+        **projection(requested_fields(fields))
+    }
+    if cursor:
+        try:
+            kwargs['ExclusiveStartKey'] = decode_cursor(cursor, scope)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        # Scan all records for statistics
-        # In production, cache this or use pre-computed aggregates
-        response = table.scan()
-        patients = response.get('Items', [])
+        response = await db.query(**kwargs)
+        records = response.get('Items', [])
+        last_key = response.get('LastEvaluatedKey')
         
-        # Calculate statistics
-        total_patients = len(patients)
+        return FastJSONResponse({
+            "status": "success",
+            "data": {
+                "patient_id": patient_id,
+                "records": records,
+                "count": len(records),
+                "has_more": last_key is not None,
+                "next_cursor": encode_cursor(last_key, scope) if last_key else None
+            },
+            "metadata": {
+                **window,
+                "order": order,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        })
         
-        # Risk level distribution
-        risk_distribution = {}
-        for patient in patients:
-            risk = patient.get('risk_level', 'UNKNOWN')
-            risk_distribution[risk] = risk_distribution.get(risk, 0) + 1
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch patient history: {str(e)}"
+        )
+
+async def downsampled_history(patient_id, condition, window, series, method, points):
+    """
+    Read every record in the range (timestamp plus the series only)
+    and reduce it with the requested downsampling method
+    """
+    try:
+        start = time.perf_counter()
+        times, values = [], {name: [] for name in series}
+        pages = iter_pages(
+            db, 'query',
+            KeyConditionExpression=condition,
+            Limit=HISTORY_PAGE_SIZE,
+            **projection(('timestamp',) + tuple(series))
+        )
+        async for items in pages:
+            times.append(column(items, 'timestamp'))
+            for name in series:
+                values[name].append(column(items, name))
         
-        # Age group distribution
-        age_distribution = {}
-        for patient in patients:
-            age_group = patient.get('age_group', 'Unknown')
-            age_distribution[age_group] = age_distribution.get(age_group, 0) + 1
+        t = np.concatenate(times)
+        arrays = {name: np.concatenate(chunks) for name, chunks in values.items()}
+        if method == "minmax":
+            reduced = minmax(t, arrays, points, window["from"], window["to"])
+        else:
+            reduced = {"series": lttb_series(t, arrays, points)}
         
-        # Diabetes prevalence
-        diabetes_count = sum(1 for p in patients if p.get('Outcome') == 1)
-        diabetes_prevalence = diabetes_count / total_patients if total_patients > 0 else 0
+        return FastJSONResponse({
+            "status": "success",
+            "data": {
+                "patient_id": patient_id,
+                "method": method,
+                "samples": len(t),
+                **reduced
+            },
+            "metadata": {
+                **window,
+                "points": points,
+                "compute_ms": round((time.perf_counter() - start) * 1000, 3),
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        })
         
-        # Average metrics
-        avg_glucose = sum(float(p.get('Glucose', 0)) for p in patients) / total_patients if total_patients > 0 else 0
-        avg_bmi = sum(float(p.get('BMI', 0)) for p in patients) / total_patients if total_patients > 0 else 0
-        avg_age = sum(float(p.get('Age', 0)) for p in patients) / total_patients if total_patients > 0 else 0
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to downsample patient history: {str(e)}"
+        )
+
+async def load_aggregates():
+    """
+    Read the materialized aggregate counters (one GetItem)
+
+    Falls back to a parallel full-table scan when the aggregate
+    item has not been built yet; run `python -m app.aggregates rebuild`
+    to materialize it.
+    """
+    counters = await db.run(aggregate_store.load)
+    if counters is None:
+        counters = await parallel_scan(
+            db,
+            aggregates.AggregateReducer(),
+            **projection(aggregates.AGGREGATE_FIELDS)
+        )
+    return counters
+
+@app.get("/api/statistics")
+async def get_statistics(request: Request):
+    """
+    Get overall dataset statistics and aggregations
+    """
+    async def build():
+        # Served from the in-memory snapshot, or from pre-computed
+        # aggregates until the snapshot has loaded; no table scan
+        if snapshot.ready:
+            data = snapshot.statistics()
+        else:
+            data = aggregates.to_statistics(await load_aggregates())
         
         return {
             "status": "success",
-            "data": {
-                "total_patients": total_patients,
-                "diabetes_prevalence": round(diabetes_prevalence, 3),
-                "risk_distribution": risk_distribution,
-                "age_distribution": age_distribution,
-                "averages": {
-                    "glucose": round(avg_glucose, 1),
-                    "bmi": round(avg_bmi, 1),
-                    "age": round(avg_age, 1)
-                }
-            },
+            "data": data,
             "metadata": {
                 "timestamp": datetime.utcnow().isoformat()
             }
         }
+    
+    try:
+        return await response_cache.respond(request, "statistics", build)
         
     except Exception as e:
         raise HTTPException(
@@ -221,37 +838,61 @@ async def get_statistics():
         )
 
 @app.get("/api/visualizations/scatter")
-async def get_scatter_data():
+async def get_scatter_data(
+    request: Request,
+    mode: str = Query("points", pattern="^(points|binned|sample)$"),
+    bins: int = Query(40, ge=5, le=200),
+    budget: int = Query(2000, ge=10, le=20000)
+):
     """
     Get data formatted for scatter plot visualization
     Returns: BMI vs Glucose with risk level coloring
+    
+    Parameters:
+    - mode: points (first 500 patients), binned (2D histogram of every
+      patient per risk level) or sample (stratified sample of every
+      patient, up to `budget` points)
+    - bins: Bins per axis for binned mode
+    - budget: Maximum points for sample mode
     """
-    try:
-        response = table.scan(Limit=500)
-        patients = response.get('Items', [])
-        
-        scatter_data = []
-        for patient in patients:
-            scatter_data.append({
-                "patient_id": patient.get('patient_id'),
-                "bmi": float(patient.get('BMI', 0)),
-                "glucose": float(patient.get('Glucose', 0)),
-                "age": int(patient.get('Age', 0)),
-                "risk_level": patient.get('risk_level', 'UNKNOWN'),
-                "outcome": int(patient.get('Outcome', 0))
-            })
+    async def build():
+        if mode == "binned":
+            if snapshot.ready:
+                scatter_data = snapshot.scatter_binned(bins, bins)
+            else:
+                counts = await parallel_scan(
+                    db, HistogramReducer(bins, bins), **projection(BIN_FIELDS)
+                )
+                scatter_data = binned_payload(counts)
+        elif mode == "sample":
+            if snapshot.ready:
+                scatter_data = snapshot.scatter_sample(budget)
+            else:
+                reducer = ReservoirReducer(budget)
+                reservoirs = await parallel_scan(db, reducer, **projection(SAMPLE_FIELDS))
+                scatter_data = [scatter_point(p) for p in reducer.finish(reservoirs)]
+        elif snapshot.ready:
+            scatter_data = snapshot.scatter(limit=500)
+        else:
+            response = await db.scan(Limit=500, **projection(SAMPLE_FIELDS))
+            scatter_data = [scatter_point(p) for p in response.get('Items', [])]
         
         return {
             "status": "success",
             "data": scatter_data,
             "metadata": {
                 "chart_type": "scatter",
+                "mode": mode,
                 "x_axis": "BMI",
                 "y_axis": "Glucose",
                 "color": "risk_level",
                 "timestamp": datetime.utcnow().isoformat()
             }
         }
+    
+    try:
+        key = f"scatter:{mode}:{bins if mode == 'binned' else budget if mode == 'sample' else ''}"
+        return await response_cache.respond(request, "scatter", build, key=key)
         
     except Exception as e:
         raise HTTPException(
@@ -260,49 +901,27 @@ async def get_scatter_data():
         )
 
 @app.get("/api/visualizations/distribution")
-async def get_distribution_data():
+async def get_distribution_data(request: Request):
     """
     Get data for distribution charts (histograms, bar charts)
     """
-    try:
-        response = table.scan()
-        patients = response.get('Items', [])
-        
-        # Age distribution
-        age_ranges = {
-            '<30': 0, '30-40': 0, '40-50': 0, '50-60': 0, '60+': 0
-        }
-        
-        for patient in patients:
-            age = int(patient.get('Age', 0))
-            if age < 30:
-                age_ranges['<30'] += 1
-            elif age < 40:
-                age_ranges['30-40'] += 1
-            elif age < 50:
-                age_ranges['40-50'] += 1
-            elif age < 60:
-                age_ranges['50-60'] += 1
-            else:
-                age_ranges['60+'] += 1
-        
-        # Risk level distribution
-        risk_dist = {}
-        for patient in patients:
-            risk = patient.get('risk_level', 'UNKNOWN')
-            risk_dist[risk] = risk_dist.get(risk, 0) + 1
+    async def build():
+        if snapshot.ready:
+            data = snapshot.distribution()
+        else:
+            data = aggregates.to_distribution(await load_aggregates())
         
         return {
             "status": "success",
-            "data": {
-                "age_distribution": age_ranges,
-                "risk_distribution": risk_dist
-            },
+            "data": data,
             "metadata": {
                 "chart_type": "distribution",
                 "timestamp": datetime.utcnow().isoformat()
             }
         }
+    
+    try:
+        return await response_cache.respond(request, "distribution", build)
         
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,254 @@
+"""
+AIER Alert System - Request Metrics
+Prometheus text-format metrics for the API and its DynamoDB usage
+
+MetricsMiddleware records per-route latency, in-flight requests,
+status codes and response sizes. The route template of the current
+request is kept in a contextvar, so every DynamoDB call made through
+AsyncTable (including the pages of a parallel scan) is charged to the
+route that caused it. Calls made outside a request, such as the
+snapshot refresh, are charged to the "background" route.
+
+Recording is only dict and integer arithmetic on the event loop.
+Nothing is formatted until /metrics is scraped.
+"""
+
+import bisect
+import contextvars
+import os
+import time
+
+from starlette.routing import Match
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Route labels for DynamoDB calls outside a request and for paths that
+# match no route (kept as one label so 404 scans cannot grow the series)
+BACKGROUND_ROUTE = "background"
+UNMATCHED_ROUTE = "unmatched"
+
+_current_route = contextvars.ContextVar("metrics_route", default=BACKGROUND_ROUTE)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{v}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        return repr(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+class Counter:
+    """Monotonic value per label tuple"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, labels: tuple = (), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Gauge(Counter):
+    """Value per label tuple that can go up and down"""
+
+    kind = "gauge"
+
+    def dec(self, labels: tuple = (), amount=1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram:
+    """Bucketed observations per label tuple, with _sum and _count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, labels: tuple, value: float):
+        state = self.values.get(labels)
+        if state is None:
+            # Per-bucket (non-cumulative) counts, last slot is +Inf; sum
+            state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(float(bound))
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    """Ordered set of metrics rendered together"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    "aier_http_requests_total", "HTTP requests by route and status",
+    ("method", "route", "status")
+))
+http_in_flight = REGISTRY.register(Gauge(
+    "aier_http_requests_in_flight", "HTTP requests currently being served",
+    ("method", "route")
+))
+http_duration = REGISTRY.register(Histogram(
+    "aier_http_request_duration_seconds", "Time to serve a request, including the response body",
+    ("method", "route"), LATENCY_BUCKETS
+))
+http_response_size = REGISTRY.register(Histogram(
+    "aier_http_response_size_bytes", "Response body bytes sent (after compression)",
+    ("method", "route"), SIZE_BUCKETS
+))
+dynamodb_calls = REGISTRY.register(Counter(
+    "aier_dynamodb_calls_total", "DynamoDB calls by the route that made them",
+    ("route", "operation")
+))
+dynamodb_items = REGISTRY.register(Counter(
+    "aier_dynamodb_items_returned_total", "Items returned by DynamoDB reads",
+    ("route", "operation")
+))
+dynamodb_scanned = REGISTRY.register(Counter(
+    "aier_dynamodb_items_scanned_total", "Items evaluated by scans and queries (before filters)",
+    ("route", "operation")
+))
+dynamodb_capacity = REGISTRY.register(Counter(
+    "aier_dynamodb_consumed_capacity_units_total", "Capacity units reported by ReturnConsumedCapacity",
+    ("route", "operation")
+))
+
+
+def with_capacity(kwargs: dict) -> dict:
+    """Ask DynamoDB to report consumed capacity for this call"""
+    if METRICS_ENABLED:
+        kwargs.setdefault("ReturnConsumedCapacity", "TOTAL")
+    return kwargs
+
+
+def record_dynamodb(operation: str, response):
+    """
+    Charge one DynamoDB call to the current route
+
+    Parameters:
+    - operation: scan, query, get_item, ...
+    - response: The call's response (non-dict results only count the call)
+    """
+    if not METRICS_ENABLED:
+        return
+    labels = (_current_route.get(), operation)
+    dynamodb_calls.inc(labels)
+    if not isinstance(response, dict):
+        return
+
+    if "Items" in response:
+        dynamodb_items.inc(labels, len(response["Items"]))
+    elif "Item" in response:
+        dynamodb_items.inc(labels)
+    if "ScannedCount" in response:
+        dynamodb_scanned.inc(labels, response["ScannedCount"])
+
+    consumed = response.get("ConsumedCapacity")
+    if consumed:
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        dynamodb_capacity.inc(labels, float(sum(c.get("CapacityUnits", 0) for c in consumed)))
+
+
+def route_label(scope) -> str:
+    """Route template (e.g. /api/patients/{patient_id}) for a request scope"""
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Per-route request metrics; add it last so it wraps every other
+    middleware and sees the bytes actually sent
+
+    Parameters:
+    - app: ASGI application
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = route_label(scope)
+        labels = (scope["method"], route)
+        status = 500
+        size = 0
+
+        async def send_measured(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        token = _current_route.set(route)
+        http_in_flight.inc(labels)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            http_duration.observe(labels, time.perf_counter() - started)
+            http_in_flight.dec(labels)
+            http_response_size.observe(labels, size)
+            http_requests.inc(labels + (str(status),))
+            _current_route.reset(token)
@@ -0,0 +1,97 @@
+"""
+AIER Alert System - API Models
+Patient schema constants shared by the API endpoints
+"""
+
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+# Attributes of a patient item, in export column order
+# Mirrors the columns written by scripts/data-pipeline.py plus the
+# table's `timestamp` range key
+PATIENT_FIELDS = (
+    'patient_id',
+    'timestamp',
+    'ingestion_timestamp',
+    'Pregnancies',
+    'Glucose',
+    'BloodPressure',
+    'SkinThickness',
+    'Insulin',
+    'BMI',
+    'DiabetesPedigreeFunction',
+    'Age',
+    'Outcome',
+    'risk_score',
+    'risk_level',
+    'age_group',
+    'bmi_category',
+)
+
+# Attributes stored as numbers (the ones a history can be downsampled on)
+NUMERIC_FIELDS = (
+    'Pregnancies',
+    'Glucose',
+    'BloodPressure',
+    'SkinThickness',
+    'Insulin',
+    'BMI',
+    'DiabetesPedigreeFunction',
+    'Age',
+    'Outcome',
+    'risk_score',
+)
+
+RISK_LEVELS = ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')
+
+# Upper bound on ids per batch lookup request
+MAX_BATCH_IDS = 500
+
+# Upper bound on patients per scoring request
+MAX_SCORE_BATCH = 5000
+
+# Upper bound on points per series in a downsampled history
+MAX_HISTORY_POINTS = 5000
+
+
+class PatientBatchRequest(BaseModel):
+    """
+    Body of POST /api/patients/batch
+
+    Duplicate ids are dropped before the MAX_BATCH_IDS limit applies,
+    so it counts distinct patients.
+    """
+    patient_ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+    fields: Optional[List[str]] = None
+
+    @field_validator('patient_ids', mode='before')
+    @classmethod
+    def _distinct_ids(cls, value):
+        # Anything but a list of strings is left to the type check
+        if isinstance(value, list) and all(isinstance(pid, str) for pid in value):
+            return list(dict.fromkeys(value))
+        return value
+
+
+
+class PatientVitals(BaseModel):
+    """
+    Vitals of one patient to score
+
+    Extra attributes are kept so a SCORING_CONFIG_FILE can weight
+    other columns.
+    """
+    model_config = ConfigDict(extra='allow')
+
+    patient_id: Optional[str] = None
+    Glucose: float
+    BloodPressure: float
+    BMI: float
+    DiabetesPedigreeFunction: float
+    Age: float
+
+
+class ScoreRequest(BaseModel):
+    """Body of POST /api/score"""
+    patients: List[PatientVitals] = Field(..., min_length=1, max_length=MAX_SCORE_BATCH)
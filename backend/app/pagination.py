@@ -0,0 +1,73 @@
+"""
+AIER Alert System - Cursor Pagination
+Opaque continuation tokens built from DynamoDB LastEvaluatedKey
+"""
+
+import base64
+import json
+from decimal import Decimal
+
+from .database import AsyncTable
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor is malformed or belongs to a different query"""
+
+
+def encode_cursor(last_key: dict, scope: str) -> str:
+    """
+    Encode a LastEvaluatedKey as an opaque URL-safe token
+
+    Parameters:
+    - last_key: LastEvaluatedKey from a scan or query response
+    - scope: Identifies the query the key belongs to (e.g. "scan",
+      "risk:HIGH") so a cursor cannot be replayed against another query
+    """
+    key = {
+        attr: ["N", str(value)] if isinstance(value, (int, float, Decimal)) else ["S", value]
+        for attr, value in last_key.items()
+    }
+    raw = json.dumps({"s": scope, "k": key}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, scope: str) -> dict:
+    """
+    Decode a cursor back into an ExclusiveStartKey
+
+    Parameters:
+    - cursor: Token returned as next_cursor by a previous page
+    - scope: Scope of the current query; must match the cursor's scope
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        key = {
+            attr: Decimal(value) if kind == "N" else value
+            for attr, (kind, value) in payload["k"].items()
+        }
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+
+    if payload.get("s") != scope:
+        raise InvalidCursor("Cursor does not belong to this query")
+    return key
+
+
+async def iter_pages(db: AsyncTable, operation: str = 'scan', **kwargs):
+    """
+    Yield the items of each page of a scan or query, following
+    LastEvaluatedKey until the result set is exhausted
+
+    Parameters:
+    - db: AsyncTable to read from
+    - operation: "scan" or "query"
+    - kwargs: Scan/query parameters
+    """
+    call = db.scan if operation == 'scan' else db.query
+    while True:
+        response = await call(**kwargs)
+        yield response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
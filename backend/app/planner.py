@@ -0,0 +1,296 @@
+"""
+AIER Alert System - Patient Query Planner
+Chooses how to read a filtered patient listing
+
+A listing can filter on risk level, age group, BMI category and
+numeric ranges. At most one equality filter can become a key condition,
+on the GSI whose hash key it names. The planner estimates every
+candidate's size from the materialized aggregate tallies (one GetItem,
+cached for PLANNER_STATS_SECONDS) and picks the smallest, a table scan
+included. All remaining predicates are pushed down as a FilterExpression,
+so non-matching items never leave DynamoDB. They are still read,
+though, so `scanned_count` shows how well an index fits a query.
+
+Without aggregates, the first usable index in INDEXES order is chosen.
+"""
+
+import os
+import time
+from decimal import Decimal
+
+from boto3.dynamodb.conditions import Attr, Key
+
+from .aggregates import AGE_GROUP_PREFIX, RISK_PREFIX, TOTAL
+from .projection import projection
+
+# Seconds the aggregate tallies are reused between plans
+PLANNER_STATS_SECONDS = float(os.getenv("PLANNER_STATS_SECONDS", "60"))
+# Items evaluated per DynamoDB call while a filter is pushed down
+PLANNER_READ_SIZE = int(os.getenv("PLANNER_READ_SIZE", "500"))
+# Items evaluated per request before a partial page is returned
+PLANNER_MAX_SCANNED = int(os.getenv("PLANNER_MAX_SCANNED", "5000"))
+
+# GSIs of aggregate-tallied attributes: index -> (hash key, tally prefix)
+# Mirrors aws_dynamodb_table.patient_data in terraform/main.tf
+INDEXES = {
+    'RiskLevelIndex': ('risk_level', RISK_PREFIX),
+    'AgeGroupIndex': ('age_group', AGE_GROUP_PREFIX),
+}
+
+# Equality filters (query parameter = attribute)
+CATEGORY_FILTERS = ('risk_level', 'age_group', 'bmi_category')
+
+# Range filters: query parameter prefix -> attribute (`<prefix>_min`, `<prefix>_max`)
+RANGE_FILTERS = {
+    'glucose': 'Glucose',
+    'age': 'Age',
+    'bmi': 'BMI',
+    'risk_score': 'risk_score',
+}
+
+TABLE_KEYS = ('patient_id', 'timestamp')
+
+
+class InvalidFilter(ValueError):
+    """Raised when a filter combination can never match"""
+
+
+def predicates(params: dict) -> list:
+    """
+    Normalize listing filters into (attribute, operator, values) tuples
+
+    Parameters:
+    - params: Query parameters: CATEGORY_FILTERS names and the
+      `<prefix>_min` / `<prefix>_max` bounds of RANGE_FILTERS (inclusive)
+
+    Operators are =, between, >= and <=; the list is in a canonical
+    order so equal filters produce equal cursor scopes.
+    """
+    result = []
+    for attr in CATEGORY_FILTERS:
+        value = params.get(attr)
+        if value:
+            result.append((attr, '=', (value.upper() if attr == 'risk_level' else value,)))
+    for prefix, attr in RANGE_FILTERS.items():
+        low, high = params.get(f"{prefix}_min"), params.get(f"{prefix}_max")
+        if low is not None and high is not None:
+            if low > high:
+                raise InvalidFilter(f"{prefix}_min is above {prefix}_max")
+            result.append((attr, 'between', (_number(low), _number(high))))
+        elif low is not None:
+            result.append((attr, '>=', (_number(low),)))
+        elif high is not None:
+            result.append((attr, '<=', (_number(high),)))
+    return result
+
+
+def describe(predicate) -> str:
+    """Human-readable form of a predicate, used in plans and scopes"""
+    attr, operator, values = predicate
+    if operator == 'between':
+        return f"{attr} between {values[0]} and {values[1]}"
+    return f"{attr} {operator} {values[0]}"
+
+
+def _number(value) -> Decimal:
+    # boto3 serializes numbers only from int or Decimal
+    return Decimal(str(value))
+
+
+def _condition(predicate):
+    attr, operator, values = predicate
+    if operator == '=':
+        return Attr(attr).eq(values[0])
+    if operator == 'between':
+        return Attr(attr).between(*values)
+    if operator == '>=':
+        return Attr(attr).gte(values[0])
+    return Attr(attr).lte(values[0])
+
+
+class QueryPlan:
+    """
+    A chosen read: a scan, or a query on one GSI partition, plus the
+    predicates left for the FilterExpression
+
+    Parameters:
+    - index: GSI name, or None for a table scan
+    - key: Predicate used as the key condition (None for a scan)
+    - filters: Remaining predicates
+    - candidates: Estimated items per considered read (None without tallies)
+    """
+
+    def __init__(self, index, key, filters, candidates):
+        self.index = index
+        self.key = key
+        self.filters = filters
+        self.candidates = candidates
+
+    @property
+    def operation(self) -> str:
+        return 'scan' if self.index is None else 'query'
+
+    @property
+    def key_attributes(self) -> tuple:
+        """Attributes of a LastEvaluatedKey for the plan's table or index"""
+        if self.index:
+            return TABLE_KEYS + (INDEXES[self.index][0],)
+        return TABLE_KEYS
+
+    def read_kwargs(self) -> dict:
+        """Scan or query parameters carrying out the plan (without Limit)"""
+        kwargs = {}
+        if self.index:
+            attr, _, values = self.key
+            kwargs['IndexName'] = self.index
+            kwargs['KeyConditionExpression'] = Key(attr).eq(values[0])
+        condition = None
+        for predicate in self.filters:
+            condition = _condition(predicate) if condition is None else condition & _condition(predicate)
+        if condition is not None:
+            kwargs['FilterExpression'] = condition
+        return kwargs
+
+    def describe(self) -> dict:
+        """The plan as reported in response metadata"""
+        return {
+            'operation': self.operation,
+            'index': self.index,
+            'key_condition': describe(self.key) if self.key else None,
+            'filter': [describe(p) for p in self.filters],
+            'estimated_items': self.candidates[self.index or 'scan'],
+            'candidates': self.candidates,
+        }
+
+
+def plan(filters: list, counters: dict = None, index: str = None) -> QueryPlan:
+    """
+    Choose the cheapest read for a list of predicates
+
+    Parameters:
+    - filters: Predicates from `predicates`
+    - counters: Aggregate counters, or None when unavailable
+    - index: Read to use regardless of estimates ("scan" or a GSI name);
+      set from a cursor so every page of a listing reads the same way
+
+    Raises InvalidFilter when `index` cannot serve the filters.
+    """
+    def estimate(count):
+        return None if counters is None else int(counters.get(count, 0))
+
+    candidates = {'scan': estimate(TOTAL)}
+    keyed = {}
+    for name, (attr, prefix) in INDEXES.items():
+        for predicate in filters:
+            if predicate[0] == attr and predicate[1] == '=':
+                candidates[name] = estimate(prefix + predicate[2][0])
+                keyed[name] = predicate
+
+    if index is not None:
+        if index not in candidates:
+            raise InvalidFilter(f"{index} cannot serve these filters")
+        chosen = index
+    elif not keyed:
+        chosen = 'scan'
+    elif counters is None:
+        chosen = next(iter(keyed))
+    else:
+        # Ties go to an index; its partition is read with no wasted items
+        chosen = min(candidates, key=lambda name: (candidates[name], name == 'scan'))
+
+    key = keyed.get(chosen)
+    return QueryPlan(
+        index=None if chosen == 'scan' else chosen,
+        key=key,
+        filters=[p for p in filters if p is not key],
+        candidates=candidates
+    )
+
+
+def scope(filters: list) -> str:
+    """Cursor scope of a filtered listing"""
+    return "patients:" + "&".join(describe(p) for p in filters)
+
+
+async def execute(db, chosen: QueryPlan, limit: int, start_key: dict = None, fields: tuple = None) -> dict:
+    """
+    Read up to `limit` matching patients
+
+    With a pushed-down filter, DynamoDB may return few or no matches
+    per call, so reads continue until the page is full, the table is
+    exhausted or PLANNER_MAX_SCANNED items were evaluated. When the
+    last call returns more matches than fit, the page ends at the last
+    kept item and the cursor is built from its key.
+
+    Parameters:
+    - db: AsyncTable of patients
+    - chosen: Plan from `plan`
+    - limit: Page size
+    - start_key: ExclusiveStartKey from the client's cursor
+    - fields: Sparse fieldset, or None for full items
+
+    Returns {"items", "last_key", "scanned_count", "calls"}.
+    """
+    call = db.query if chosen.operation == 'query' else db.scan
+    kwargs = chosen.read_kwargs()
+    keys = chosen.key_attributes
+    extra = ()
+    if fields is not None:
+        # Key attributes are needed to end a page mid-response
+        extra = tuple(k for k in keys if k not in fields)
+        kwargs.update(projection(tuple(fields) + extra))
+
+    items, scanned, calls = [], 0, 0
+    last_key = start_key
+    while True:
+        remaining = limit - len(items)
+        if chosen.filters:
+            kwargs['Limit'] = max(1, min(PLANNER_READ_SIZE, PLANNER_MAX_SCANNED - scanned))
+        else:
+            kwargs['Limit'] = remaining
+        if last_key:
+            kwargs['ExclusiveStartKey'] = last_key
+        response = await call(**kwargs)
+        calls += 1
+        scanned += response.get('ScannedCount', 0)
+        page = response.get('Items', [])
+        last_key = response.get('LastEvaluatedKey')
+        if len(page) > remaining:
+            page = page[:remaining]
+            last_key = {k: page[-1][k] for k in keys}
+        items.extend(page)
+        if not last_key or len(items) >= limit or scanned >= PLANNER_MAX_SCANNED:
+            break
+
+    if extra:
+        for item in items:
+            for k in extra:
+                item.pop(k, None)
+    return {'items': items, 'last_key': last_key, 'scanned_count': scanned, 'calls': calls}
+
+
+class TableStats:
+    """
+    Aggregate tallies for planning, refreshed at most every
+    PLANNER_STATS_SECONDS
+
+    Parameters:
+    - load: Coroutine function returning the aggregate counters or None
+    """
+
+    def __init__(self, load, ttl: float = PLANNER_STATS_SECONDS):
+        self.load = load
+        self.ttl = ttl
+        self._counters = None
+        self._loaded = None
+
+    async def counters(self):
+        now = time.monotonic()
+        if self._loaded is None or now - self._loaded > self.ttl:
+            try:
+                self._counters = await self.load()
+            except Exception:
+                # Planning without estimates beats failing the listing
+                self._counters = None
+            self._loaded = now
+        return self._counters
@@ -0,0 +1,55 @@
+"""
+AIER Alert System - Sparse Fieldsets
+Translate requested field lists into DynamoDB ProjectionExpressions so
+only the needed attributes are read and serialized
+"""
+
+from typing import Iterable, Optional
+
+from .models import PATIENT_FIELDS
+
+
+class UnknownFields(ValueError):
+    """Raised when a fieldset names attributes that patients do not have"""
+
+
+def parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    """
+    Parse a comma-separated `fields` query parameter
+
+    Returns None when no fieldset was requested (full items).
+    Raises UnknownFields for attributes outside PATIENT_FIELDS.
+    """
+    if fields is None:
+        return None
+    return validate_fields(f.strip() for f in fields.split(',') if f.strip())
+
+
+def validate_fields(fields: Iterable[str]) -> tuple:
+    """Deduplicate and validate a list of field names"""
+    fields = tuple(dict.fromkeys(fields))
+    unknown = [f for f in fields if f not in PATIENT_FIELDS]
+    if unknown:
+        raise UnknownFields(
+            f"Unknown fields: {', '.join(unknown)}. "
+            f"Valid fields: {', '.join(PATIENT_FIELDS)}"
+        )
+    if not fields:
+        raise UnknownFields("fields must name at least one attribute")
+    return fields
+
+
+def projection(fields: Optional[Iterable[str]]) -> dict:
+    """
+    Build scan/query/get_item kwargs reading only `fields`
+
+    Attribute names go through placeholders because several patient
+    attributes (e.g. `timestamp`) are DynamoDB reserved words.
+    """
+    if fields is None:
+        return {}
+    fields = tuple(fields)
+    return {
+        'ProjectionExpression': ', '.join(f"#p{i}" for i in range(len(fields))),
+        'ExpressionAttributeNames': {f"#p{i}": f for i, f in enumerate(fields)},
+    }
@@ -0,0 +1,62 @@
+"""
+AIER Alert System - Fast JSON Responses
+orjson-backed encoding with native Decimal support
+
+DynamoDB returns every number as Decimal. FastAPI's default path walks
+each payload through jsonable_encoder before json.dumps; for lists of
+patient items that walk dominates response time. encode_json hands the
+payload straight to orjson and converts Decimals in its default hook.
+Falls back to the standard library when orjson is not installed.
+"""
+
+import json
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(obj):
+    """Encode types orjson/json do not handle natively"""
+    if isinstance(obj, Decimal):
+        # Integral values stay ints (DynamoDB normalizes 5.0 to 5)
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):  # NumPy scalars and arrays
+        return obj.tolist()
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def encode_json(payload) -> bytes:
+        """Encode a response payload to JSON bytes"""
+        return orjson.dumps(payload, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def encode_json(payload) -> bytes:
+        """Encode a response payload to JSON bytes"""
+        return json.dumps(
+            payload,
+            default=_default,
+            ensure_ascii=False,
+            separators=(",", ":")
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse using encode_json
+
+    Return it directly from handlers so FastAPI skips jsonable_encoder.
+    """
+
+    def render(self, content) -> bytes:
+        return encode_json(content)
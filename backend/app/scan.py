@@ -0,0 +1,143 @@
+"""
+AIER Alert System - Parallel Scan Engine
+Segmented full-table scans that follow every page and stream items
+into a reducer
+
+Each of TotalSegments segments is scanned by its own coroutine on the
+AsyncTable executor. Pages are folded into a per-segment accumulator as
+they arrive, so memory stays bounded by one page per segment, and the
+segment results are merged at the end.
+"""
+
+import asyncio
+import os
+import time
+
+from .database import AsyncTable
+
+SCAN_SEGMENTS = int(os.getenv("SCAN_SEGMENTS", "4"))
+# Read capacity units per second across all segments (0 = unlimited)
+SCAN_READ_BUDGET = float(os.getenv("SCAN_READ_BUDGET", "0"))
+
+
+class Reducer:
+    """
+    Fold scanned items into an accumulator
+
+    Subclasses override initial/step/merge. step is called once per page
+    with that page's items; merge combines two segment accumulators.
+    """
+
+    def initial(self):
+        return []
+
+    def step(self, acc, items):
+        acc.extend(items)
+        return acc
+
+    def merge(self, left, right):
+        left.extend(right)
+        return left
+
+
+class CapacityBudget:
+    """
+    Token bucket over consumed read capacity
+
+    Each page is charged its actual ConsumedCapacity after it returns;
+    new pages wait while the bucket is in debt.
+
+    Parameters:
+    - units_per_second: Sustained read capacity to stay under
+    """
+
+    def __init__(self, units_per_second: float):
+        self.rate = units_per_second
+        self.tokens = units_per_second
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until the bucket is out of debt"""
+        self._refill()
+        while self.tokens <= 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+            self._refill()
+
+    def charge(self, units: float):
+        """Deduct capacity consumed by a completed request"""
+        self._refill()
+        self.tokens -= units
+
+
+async def parallel_scan(
+    db: AsyncTable,
+    reducer: Reducer,
+    segments: int = SCAN_SEGMENTS,
+    read_budget: float = SCAN_READ_BUDGET,
+    page_size: int = None,
+    **scan_kwargs
+):
+    """
+    Scan the whole table in parallel segments and reduce the items
+
+    Parameters:
+    - db: AsyncTable to scan
+    - reducer: Reducer folding pages into a result
+    - segments: Degree of parallelism (DynamoDB TotalSegments)
+    - read_budget: Read capacity units per second (0 = unlimited)
+    - page_size: Optional Limit per page
+    - scan_kwargs: Extra scan parameters (FilterExpression, ProjectionExpression, ...)
+    """
+    budget = CapacityBudget(read_budget) if read_budget > 0 else None
+
+    async def scan_segment(segment):
+        acc = reducer.initial()
+        kwargs = dict(scan_kwargs)
+        kwargs['ReturnConsumedCapacity'] = 'TOTAL'
+        if segments > 1:
+            kwargs['Segment'] = segment
+            kwargs['TotalSegments'] = segments
+        if page_size:
+            kwargs['Limit'] = page_size
+
+        while True:
+            if budget:
+                await budget.acquire()
+            response = await db.scan(**kwargs)
+            if budget:
+                budget.charge(response.get('ConsumedCapacity', {}).get('CapacityUnits', 0))
+
+            acc = reducer.step(acc, response.get('Items', []))
+
+            if 'LastEvaluatedKey' not in response:
+                return acc
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    results = await asyncio.gather(*(scan_segment(s) for s in range(segments)))
+
+    result = results[0]
+    for other in results[1:]:
+        result = reducer.merge(result, other)
+    return result
+
+
+def scan_table(table, reducer: Reducer, **kwargs):
+    """
+    Blocking wrapper around parallel_scan for scripts and CLIs
+
+    Parameters:
+    - table: boto3 Table (or in-memory stand-in)
+    - reducer: Reducer folding pages into a result
+    - kwargs: Passed through to parallel_scan
+    """
+    segments = kwargs.get('segments', SCAN_SEGMENTS)
+    db = AsyncTable(table, max_concurrency=max(1, segments))
+    try:
+        return asyncio.run(parallel_scan(db, reducer, **kwargs))
+    finally:
+        db.close()
@@ -0,0 +1,197 @@
+"""
+AIER Alert System - Scatter Level of Detail
+Server-side binning and stratified sampling for the BMI vs glucose chart
+
+Both modes cover the whole population and return a payload whose size
+depends only on the requested resolution or point budget, not on the
+number of patients.
+"""
+
+import numpy as np
+
+from .models import RISK_LEVELS
+from .scan import Reducer
+
+# Risk strata; items without a level fall into UNKNOWN
+STRATA = RISK_LEVELS + ('UNKNOWN',)
+_STRATUM_CODES = {label: code for code, label in enumerate(STRATA)}
+
+# Plot extents match the pipeline's outlier thresholds; values outside
+# are clamped into the edge bins so every patient is counted
+BMI_RANGE = (15.0, 60.0)
+GLUCOSE_RANGE = (40.0, 300.0)
+
+# Attributes needed to bin or sample from a table scan
+BIN_FIELDS = ('BMI', 'Glucose', 'risk_level')
+SAMPLE_FIELDS = ('patient_id', 'BMI', 'Glucose', 'Age', 'risk_level', 'Outcome')
+
+
+def scatter_point(item) -> dict:
+    """Scatter plot point for a DynamoDB item"""
+    return {
+        "patient_id": item.get('patient_id'),
+        "bmi": float(item.get('BMI', 0)),
+        "glucose": float(item.get('Glucose', 0)),
+        "age": int(item.get('Age', 0)),
+        "risk_level": item.get('risk_level', 'UNKNOWN'),
+        "outcome": int(item.get('Outcome', 0))
+    }
+
+
+def stratum_codes(levels) -> np.ndarray:
+    """Map risk level labels to stratum codes"""
+    fallback = len(STRATA) - 1
+    return np.fromiter(
+        (_STRATUM_CODES.get(level, fallback) for level in levels),
+        dtype=np.int8,
+        count=len(levels)
+    )
+
+
+def histogram(bmi, glucose, strata, bins_x: int, bins_y: int) -> np.ndarray:
+    """
+    Count points per (stratum, BMI bin, glucose bin)
+
+    Returns an int64 array of shape (len(STRATA), bins_x, bins_y).
+    """
+    x = np.clip(np.asarray(bmi, dtype=np.float64), *BMI_RANGE)
+    y = np.clip(np.asarray(glucose, dtype=np.float64), *GLUCOSE_RANGE)
+    counts, _ = np.histogramdd(
+        (np.asarray(strata, dtype=np.float64), x, y),
+        bins=(len(STRATA), bins_x, bins_y),
+        range=((-0.5, len(STRATA) - 0.5), BMI_RANGE, GLUCOSE_RANGE)
+    )
+    return counts.astype(np.int64)
+
+
+def binned_payload(counts: np.ndarray) -> dict:
+    """Sparse per-stratum cell list for a histogram from `histogram`"""
+    _, bins_x, bins_y = counts.shape
+    strata = {}
+    for code, label in enumerate(STRATA):
+        ix, iy = np.nonzero(counts[code])
+        if len(ix):
+            strata[label] = np.stack([ix, iy, counts[code][ix, iy]], axis=1).tolist()
+    return {
+        "x_edges": np.linspace(*BMI_RANGE, bins_x + 1).round(3).tolist(),
+        "y_edges": np.linspace(*GLUCOSE_RANGE, bins_y + 1).round(3).tolist(),
+        "cells": strata,  # [x_bin, y_bin, count] per non-empty cell
+        "total": int(counts.sum())
+    }
+
+
+class HistogramReducer(Reducer):
+    """Scan reducer accumulating the binned histogram page by page"""
+
+    def __init__(self, bins_x: int, bins_y: int):
+        self.bins_x = bins_x
+        self.bins_y = bins_y
+
+    def initial(self):
+        return np.zeros((len(STRATA), self.bins_x, self.bins_y), dtype=np.int64)
+
+    def step(self, acc, items):
+        if not items:
+            return acc
+        return acc + histogram(
+            [float(i.get('BMI', 0)) for i in items],
+            [float(i.get('Glucose', 0)) for i in items],
+            stratum_codes([i.get('risk_level') for i in items]),
+            self.bins_x,
+            self.bins_y
+        )
+
+    def merge(self, left, right):
+        return left + right
+
+
+def allocate(stratum_sizes, budget: int) -> np.ndarray:
+    """
+    Split a point budget across strata proportionally to their size
+
+    Every non-empty stratum keeps at least one point so rare risk levels
+    (e.g. CRITICAL) stay visible.
+    """
+    sizes = np.asarray(stratum_sizes, dtype=np.int64)
+    total = sizes.sum()
+    if total <= budget:
+        return sizes
+    quota = np.minimum(sizes, np.maximum((sizes * budget) // total, (sizes > 0).astype(np.int64)))
+    # Hand out the rounding remainder to the largest strata
+    for code in np.argsort(-sizes):
+        if quota.sum() >= budget:
+            break
+        if quota[code] < sizes[code]:
+            quota[code] += 1
+    return quota
+
+
+def stratified_sample(strata, budget: int, seed: int = 0) -> np.ndarray:
+    """
+    Row indices of a stratified random sample of at most `budget` rows
+
+    A fixed seed keeps the sample stable between requests so cached
+    responses and ETags stay valid while the data is unchanged.
+    """
+    strata = np.asarray(strata)
+    rng = np.random.default_rng(seed)
+    sizes = np.bincount(strata, minlength=len(STRATA))
+    quota = allocate(sizes, budget)
+    picks = [
+        rng.choice(np.flatnonzero(strata == code), size=int(quota[code]), replace=False)
+        for code in range(len(STRATA)) if quota[code]
+    ]
+    return np.sort(np.concatenate(picks)) if picks else np.zeros(0, dtype=np.int64)
+
+
+class ReservoirReducer(Reducer):
+    """
+    Scan reducer keeping a uniform reservoir of `budget` items per stratum
+
+    The per-stratum reservoirs are trimmed to a proportional allocation
+    by `finish` once the scan is complete.
+    """
+
+    def __init__(self, budget: int, seed: int = 0):
+        self.budget = budget
+        self.rng = np.random.default_rng(seed)
+
+    def initial(self):
+        return {code: ([], 0) for code in range(len(STRATA))}
+
+    def step(self, acc, items):
+        for item, code in zip(items, stratum_codes([i.get('risk_level') for i in items])):
+            reservoir, seen = acc[code]
+            seen += 1
+            if len(reservoir) < self.budget:
+                reservoir.append(item)
+            else:
+                slot = self.rng.integers(seen)
+                if slot < self.budget:
+                    reservoir[slot] = item
+            acc[code] = (reservoir, seen)
+        return acc
+
+    def merge(self, left, right):
+        merged = {}
+        for code in left:
+            (a, seen_a), (b, seen_b) = left[code], right[code]
+            pool = a + b
+            keep = min(self.budget, len(pool))
+            if seen_a + seen_b:
+                # Weight each side by how many items its reservoir stands for
+                weights = np.array([seen_a / max(len(a), 1)] * len(a) + [seen_b / max(len(b), 1)] * len(b))
+                chosen = self.rng.choice(len(pool), size=keep, replace=False, p=weights / weights.sum())
+                pool = [pool[i] for i in sorted(chosen)]
+            merged[code] = (pool, seen_a + seen_b)
+        return merged
+
+    def finish(self, acc):
+        """Trim the reservoirs to the proportional allocation"""
+        quota = allocate([acc[code][1] for code in range(len(STRATA))], self.budget)
+        points = []
+        for code in range(len(STRATA)):
+            reservoir = acc[code][0]
+            chosen = self.rng.choice(len(reservoir), size=int(quota[code]), replace=False)
+            points.extend(reservoir[i] for i in sorted(chosen))
+        return points
@@ -0,0 +1,230 @@
+"""
+AIER Alert System - Risk Scoring Engine
+Vectorized risk score and category bucketing shared by the data
+pipeline and POST /api/score
+
+The score is a weighted sum of vitals, each divided by a scale,
+clipped to [0, 1]. Terms are evaluated in configuration order with the
+same float64 operations the pipeline used in pandas, so scores match
+bit for bit. Buckets reproduce pd.cut: intervals are right-closed
+(a, b], and values at or below the first edge, above the last edge or
+NaN get no label.
+
+The defaults can be overridden with a JSON file (SCORING_CONFIG_FILE)
+of the form {"weights": [[column, scale, weight], ...],
+"clip": [0, 1], "buckets": {name: {"column": ..., "edges": [...],
+"labels": [...]}}}.
+
+Usage (from backend/):
+    python -m app.scoring verify ../data/diabetes_processed.csv
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from .models import RISK_LEVELS
+
+SCORING_CONFIG_FILE = os.getenv("SCORING_CONFIG_FILE")
+
+# (column, scale, weight): term = column / scale * weight
+DEFAULT_WEIGHTS = (
+    ('Glucose', 200, 0.3),
+    ('BMI', 50, 0.2),
+    ('Age', 100, 0.2),
+    ('BloodPressure', 150, 0.15),
+    ('DiabetesPedigreeFunction', 1, 0.15),
+)
+
+DEFAULT_CLIP = (0, 1)
+
+DEFAULT_BUCKETS = {
+    'risk_level': {
+        'column': 'risk_score',
+        'edges': [0, 0.3, 0.5, 0.7, 1.0],
+        'labels': list(RISK_LEVELS),
+    },
+    'age_group': {
+        'column': 'Age',
+        'edges': [0, 30, 40, 50, 60, 100],
+        'labels': ['<30', '30-40', '40-50', '50-60', '60+'],
+    },
+    'bmi_category': {
+        'column': 'BMI',
+        'edges': [0, 18.5, 25, 30, 100],
+        'labels': ['Underweight', 'Normal', 'Overweight', 'Obese'],
+    },
+}
+
+
+class ScoringConfigError(ValueError):
+    """Invalid weights or bucket definition"""
+
+
+class RiskScorer:
+    """
+    Risk score and categories for batches of patients
+
+    Parameters:
+    - weights: (column, scale, weight) terms, summed in order
+    - clip: (low, high) bounds applied to the summed score
+    - buckets: {name: {"column", "edges", "labels"}}; "column" may be
+      risk_score or any input column
+    """
+
+    def __init__(self, weights=DEFAULT_WEIGHTS, clip=DEFAULT_CLIP, buckets=None):
+        self.weights = [(str(col), float(scale), float(weight)) for col, scale, weight in weights]
+        self.clip = (float(clip[0]), float(clip[1]))
+        self.buckets = {}
+        for name, spec in (DEFAULT_BUCKETS if buckets is None else buckets).items():
+            edges = np.asarray(spec['edges'], dtype=np.float64)
+            labels = list(spec['labels'])
+            if len(edges) != len(labels) + 1 or np.any(np.diff(edges) <= 0):
+                raise ScoringConfigError(
+                    f"Bucket {name}: edges must be increasing and one longer than labels"
+                )
+            self.buckets[name] = (spec['column'], edges, labels)
+        if not self.weights:
+            raise ScoringConfigError("At least one weight is required")
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Build a scorer from a parsed SCORING_CONFIG_FILE document"""
+        try:
+            return cls(
+                weights=config.get('weights', DEFAULT_WEIGHTS),
+                clip=config.get('clip', DEFAULT_CLIP),
+                buckets=config.get('buckets')
+            )
+        except (KeyError, TypeError) as e:
+            raise ScoringConfigError(f"Invalid scoring config: {e}")
+
+    @property
+    def input_columns(self) -> list:
+        """Vitals a batch must provide"""
+        columns = [col for col, _, _ in self.weights]
+        for column, _, _ in self.buckets.values():
+            if column != 'risk_score' and column not in columns:
+                columns.append(column)
+        return columns
+
+    def describe(self) -> dict:
+        """JSON-serializable configuration (also used as a cache fingerprint)"""
+        return {
+            'weights': [list(w) for w in self.weights],
+            'clip': list(self.clip),
+            'buckets': {
+                name: {'column': column, 'edges': edges.tolist(), 'labels': labels}
+                for name, (column, edges, labels) in self.buckets.items()
+            }
+        }
+
+    def score(self, columns) -> np.ndarray:
+        """
+        Risk scores for a batch
+
+        Parameters:
+        - columns: Mapping of column name to array-like (dict or DataFrame)
+        """
+        total = None
+        for col, scale, weight in self.weights:
+            term = np.asarray(columns[col], dtype=np.float64) / scale * weight
+            total = term if total is None else total + term
+        return np.clip(total, *self.clip)
+
+    def codes(self, name: str, values) -> np.ndarray:
+        """
+        Bucket index per value with pd.cut semantics; -1 means no bucket
+
+        Parameters:
+        - name: Bucket name (e.g. risk_level)
+        - values: Array-like of the bucket's column
+        """
+        _, edges, _ = self.buckets[name]
+        values = np.asarray(values, dtype=np.float64)
+        # side='left' puts x == edge into the bucket ending at that edge
+        codes = np.searchsorted(edges, values, side='left') - 1
+        outside = (codes < 0) | (codes >= len(edges) - 1) | np.isnan(values)
+        codes[outside] = -1
+        return codes.astype(np.int8)
+
+    def labels(self, name: str, codes) -> list:
+        """Label strings for bucket codes (None where -1)"""
+        labels = self.buckets[name][2] + [None]
+        return [labels[c] for c in np.asarray(codes).tolist()]
+
+    def score_batch(self, columns) -> dict:
+        """Scores and bucket codes for a batch: {"risk_score": ..., name: codes}"""
+        scores = self.score(columns)
+        result = {'risk_score': scores}
+        for name, (column, _, _) in self.buckets.items():
+            source = scores if column == 'risk_score' else columns[column]
+            result[name] = self.codes(name, source)
+        return result
+
+    def add_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add risk_score and the bucket columns to a frame
+
+        Bucket columns are ordered categoricals, the dtype pd.cut returns.
+        """
+        result = self.score_batch(df)
+        df['risk_score'] = pd.Series(result.pop('risk_score'), index=df.index)
+        for name, codes in result.items():
+            df[name] = pd.Categorical.from_codes(codes, categories=self.buckets[name][2], ordered=True)
+        return df
+
+
+def load_scorer(path: str = SCORING_CONFIG_FILE) -> RiskScorer:
+    """The configured scorer: SCORING_CONFIG_FILE if set, else the defaults"""
+    if not path:
+        return RiskScorer()
+    with open(path) as f:
+        return RiskScorer.from_config(json.load(f))
+
+
+def verify(path: str, scorer: RiskScorer = None) -> list:
+    """
+    Recompute the derived columns of a processed pipeline output and
+    return the columns that differ (empty when everything matches)
+    """
+    scorer = scorer or load_scorer()
+    # round_trip parsing reads back exactly the floats to_csv wrote
+    df = pd.read_csv(path, float_precision='round_trip')
+    expected = scorer.score_batch(df)
+    mismatches = []
+    if not np.array_equal(expected.pop('risk_score'), df['risk_score'].to_numpy(dtype=np.float64), equal_nan=True):
+        mismatches.append('risk_score')
+    for name, codes in expected.items():
+        labels = pd.Series(scorer.labels(name, codes), dtype=object)
+        if not labels.equals(df[name].astype(object).where(df[name].notna(), None)):
+            mismatches.append(name)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AIER Risk Scoring')
+    parser.add_argument('command', choices=['verify', 'config'], help='Action to perform')
+    parser.add_argument('path', nargs='?', help='Processed CSV to verify against')
+    args = parser.parse_args()
+
+    scorer = load_scorer()
+    if args.command == 'config':
+        print(json.dumps(scorer.describe(), indent=2))
+        return
+
+    if not args.path:
+        parser.error('verify needs the processed CSV path')
+    mismatches = verify(args.path, scorer)
+    if mismatches:
+        print(f"MISMATCH in: {', '.join(mismatches)}")
+        sys.exit(1)
+    print(f"{args.path}: risk_score and {', '.join(scorer.buckets)} match the scoring engine")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+AIER Alert System - Columnar Patient Snapshot
+In-process NumPy copy of the patient table for vectorized analytics
+
+Numeric vitals are held as typed arrays and the categorical columns as
+small integer codes. The first load is a parallel scan. After that the
+snapshot refreshes like a delta sync client: it reads the items and
+tombstones stamped since its synced_at watermark from SyncIndex and the
+tombstones table (see app.sync), upserts the items by (patient_id,
+timestamp) and drops the deleted ones. A refresh costs a few key
+queries, however large the table. Listeners are called with the new,
+changed and removed items of each refresh.
+"""
+
+import asyncio
+import logging
+import os
+
+import numpy as np
+
+from .aggregates import AGE_RANGES
+from .database import AsyncTable
+from .models import RISK_LEVELS
+from .projection import projection
+from .scan import Reducer, parallel_scan
+from .scatter import binned_payload, histogram, stratified_sample
+from .sync import SyncExpired, read_page, sync_window
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "true").lower() == "true"
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "60"))
+# Items plus tombstones read per call during a refresh
+SNAPSHOT_PAGE_SIZE = int(os.getenv("SNAPSHOT_PAGE_SIZE", "1000"))
+
+NUMERIC_COLUMNS = {
+    'timestamp': np.int64,
+    'ingestion_timestamp': np.int64,
+    'synced_at': np.int64,
+    'Glucose': np.float64,
+    'BMI': np.float64,
+    'Age': np.float64,
+    'BloodPressure': np.float64,
+    'DiabetesPedigreeFunction': np.float64,
+    'risk_score': np.float64,
+    'Outcome': np.int8,
+}
+
+# Category labels; the last label of each column is the fallback for
+# missing or unrecognised values. risk_level codes match scatter.STRATA
+CATEGORICAL_COLUMNS = {
+    'risk_level': RISK_LEVELS + ('UNKNOWN',),
+    'age_group': tuple(AGE_RANGES) + ('Unknown',),
+    'bmi_category': ('Underweight', 'Normal', 'Overweight', 'Obese', 'Unknown'),
+}
+
+SNAPSHOT_FIELDS = ('patient_id',) + tuple(NUMERIC_COLUMNS) + tuple(CATEGORICAL_COLUMNS)
+
+# Left edges of the distribution chart age ranges after '<30'
+AGE_RANGE_EDGES = np.array([30, 40, 50, 60])
+
+
+class _Columns:
+    """Immutable set of column arrays; replaced wholesale on refresh"""
+
+    def __init__(self, size: int, arrays: dict, patient_ids: np.ndarray):
+        self.size = size
+        self.arrays = arrays
+        self.patient_ids = patient_ids
+        self._statistics = None
+        self._distribution = None
+
+
+def _empty_columns():
+    arrays = {name: np.zeros(0, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+    arrays.update({name: np.zeros(0, dtype=np.int8) for name in CATEGORICAL_COLUMNS})
+    return _Columns(0, arrays, np.zeros(0, dtype=object))
+
+
+def _encode(items):
+    """Convert DynamoDB items into column arrays"""
+    arrays = {
+        name: np.fromiter(
+            (float(item.get(name, 0)) for item in items),
+            dtype=np.float64,
+            count=len(items)
+        ).astype(dtype)
+        for name, dtype in NUMERIC_COLUMNS.items()
+    }
+    for name, labels in CATEGORICAL_COLUMNS.items():
+        codes = {label: code for code, label in enumerate(labels)}
+        fallback = len(labels) - 1
+        arrays[name] = np.fromiter(
+            (codes.get(item.get(name), fallback) for item in items),
+            dtype=np.int8,
+            count=len(items)
+        )
+    patient_ids = np.array([item.get('patient_id') for item in items], dtype=object)
+    return arrays, patient_ids
+
+
+def _tallies(codes, labels):
+    counts = np.bincount(codes, minlength=len(labels))
+    return {labels[i]: int(c) for i, c in enumerate(counts) if c}
+
+
+class PatientSnapshot:
+    """
+    Columnar, incrementally refreshed copy of the patient table
+
+    Parameters:
+    - db: AsyncTable to load from
+    - tombstones: AsyncTable of delete tombstones (None: deletes are
+      only noticed by a full reload)
+    """
+
+    def __init__(self, db: AsyncTable, tombstones: AsyncTable = None):
+        self.db = db
+        self.tombstones = tombstones
+        self.columns = _empty_columns()
+        self.ready = False
+        # synced_at (ms) up to which every change has been applied
+        self.watermark = None
+        # Called as listener(items, initial, removed) after each refresh
+        # that found new, changed or removed items; initial is True for
+        # the first load, removed holds the images of deleted rows
+        self.listeners = []
+        self._rows = {}
+        self._lock = asyncio.Lock()
+
+    async def refresh(self):
+        """
+        Pull changes since the watermark and merge them into the columns
+
+        Returns the number of items added, changed or removed.
+        """
+        async with self._lock:
+            initial = self.watermark is None
+            deleted = []
+            if not initial:
+                try:
+                    until = sync_window(self.watermark)
+                    items, deleted = await self._changes(self.watermark, until)
+                except SyncExpired:
+                    # Tombstones since the watermark are gone; start over
+                    logger.warning("Snapshot watermark expired; reloading")
+                    self._reset()
+                    initial = True
+            if initial:
+                # Changes stamped while the scan runs are read again next time
+                until = sync_window(None)
+                items = await parallel_scan(self.db, Reducer(), **projection(SNAPSHOT_FIELDS))
+
+            changed = self._latest(items) if initial else [
+                item for item in self._latest(items) if self._is_change(item)
+            ]
+            if changed:
+                self.columns = self._merge(changed)
+            rows = self._removed_rows(deleted)
+            removed = self._images(rows)
+            if removed:
+                self.columns = self._remove(rows)
+            self.watermark = until
+            self.ready = True
+            if changed or removed:
+                for listener in self.listeners:
+                    listener(changed, initial, removed)
+            return len(changed) + len(removed)
+
+    async def _changes(self, since: int, until: int):
+        """Items and tombstones stamped in (since, until]"""
+        state = {'until': until, 'phase': 'items', 'partition': 0, 'key': None}
+        items, deleted = [], []
+        while state is not None:
+            page, gone, state = await read_page(
+                self.db, self.tombstones, since, state, SNAPSHOT_PAGE_SIZE, fields=SNAPSHOT_FIELDS
+            )
+            items.extend(page)
+            deleted.extend(gone)
+        return items, deleted
+
+    def _reset(self):
+        self.columns = _empty_columns()
+        self._rows = {}
+        self.watermark = None
+
+    @staticmethod
+    def _latest(items) -> list:
+        """The newest version (by synced_at) of each (patient_id, timestamp)"""
+        latest = {}
+        for item in sorted(items, key=lambda i: int(i.get('synced_at', 0))):
+            latest[(item.get('patient_id'), int(item.get('timestamp', 0)))] = item
+        return list(latest.values())
+
+    def _is_change(self, item) -> bool:
+        """False for items re-read at the watermark without changes"""
+        row = self._rows.get((item.get('patient_id'), int(item.get('timestamp', 0))))
+        if row is None:
+            return True
+        return int(item.get('synced_at', 0)) != self.columns.arrays['synced_at'][row]
+
+    def _removed_rows(self, tombstones) -> np.ndarray:
+        """
+        Rows deleted by tombstones
+
+        A tombstone only applies to a row written before it, so an item
+        deleted and then loaded again stays.
+        """
+        synced_at = self.columns.arrays['synced_at']
+        rows = set()
+        for tombstone in tombstones:
+            row = self._rows.get((tombstone.get('patient_id'), int(tombstone.get('timestamp', 0))))
+            if row is not None and int(tombstone.get('synced_at', 0)) > synced_at[row]:
+                rows.add(row)
+        return np.fromiter(sorted(rows), dtype=np.int64, count=len(rows))
+
+    def _images(self, rows: np.ndarray) -> list:
+        """Rows as items of the snapshot's fields"""
+        columns = self.columns
+        images = [{'patient_id': pid} for pid in columns.patient_ids[rows].tolist()]
+        for name, values in columns.arrays.items():
+            labels = CATEGORICAL_COLUMNS.get(name)
+            for image, value in zip(images, values[rows].tolist()):
+                image[name] = labels[value] if labels else value
+        return images
+
+    def _remove(self, rows: np.ndarray):
+        """A new column set without `rows`; row numbers are reassigned"""
+        current = self.columns
+        keep = np.ones(current.size, dtype=bool)
+        keep[rows] = False
+        arrays = {name: values[keep] for name, values in current.arrays.items()}
+        patient_ids = current.patient_ids[keep]
+        self._rows = {
+            key: row for row, key in enumerate(zip(patient_ids.tolist(), arrays['timestamp'].tolist()))
+        }
+        return _Columns(len(patient_ids), arrays, patient_ids)
+
+    def _merge(self, items):
+        """Upsert items by (patient_id, timestamp) into a new column set"""
+        current = self.columns
+        updates = {}
+        appended = []
+        for item in items:
+            key = (item.get('patient_id'), int(item.get('timestamp', 0)))
+            row = self._rows.get(key)
+            if row is None:
+                self._rows[key] = current.size + len(appended)
+                appended.append(item)
+            else:
+                updates[row] = item
+
+        new_arrays, new_ids = _encode(appended)
+        arrays = {
+            name: np.concatenate([current.arrays[name], new_arrays[name]])
+            for name in current.arrays
+        }
+        patient_ids = np.concatenate([current.patient_ids, new_ids])
+
+        if updates:
+            rows = np.fromiter(updates, dtype=np.int64, count=len(updates))
+            changed, changed_ids = _encode(list(updates.values()))
+            for name in arrays:
+                arrays[name][rows] = changed[name]
+            patient_ids[rows] = changed_ids
+
+        return _Columns(len(patient_ids), arrays, patient_ids)
+
+    async def run(self, interval: float = SNAPSHOT_REFRESH_SECONDS):
+        """Refresh forever; intended to run as a background task"""
+        while True:
+            try:
+                added = await self.refresh()
+                if added:
+                    logger.info("Snapshot refreshed with %d items (%d rows)", added, self.columns.size)
+            except Exception as e:
+                logger.warning("Snapshot refresh failed: %s", e)
+            await asyncio.sleep(interval)
+
+    # ------------------------------------------------------------------
+    # Vectorized analytics
+    # ------------------------------------------------------------------
+
+    def statistics(self) -> dict:
+        """Same payload as aggregates.to_statistics, computed from the columns"""
+        columns = self.columns
+        if columns._statistics is None:
+            a = columns.arrays
+            total = columns.size
+            columns._statistics = {
+                "total_patients": total,
+                "diabetes_prevalence": round(float(np.count_nonzero(a['Outcome'] == 1)) / total, 3) if total else 0,
+                "risk_distribution": _tallies(a['risk_level'], CATEGORICAL_COLUMNS['risk_level']),
+                "age_distribution": _tallies(a['age_group'], CATEGORICAL_COLUMNS['age_group']),
+                "averages": {
+                    "glucose": round(float(a['Glucose'].mean()), 1) if total else 0,
+                    "bmi": round(float(a['BMI'].mean()), 1) if total else 0,
+                    "age": round(float(a['Age'].mean()), 1) if total else 0
+                }
+            }
+        return columns._statistics
+
+    def distribution(self) -> dict:
+        """Same payload as aggregates.to_distribution, computed from the columns"""
+        columns = self.columns
+        if columns._distribution is None:
+            a = columns.arrays
+            ranges = np.searchsorted(AGE_RANGE_EDGES, a['Age'].astype(np.int64), side='right')
+            counts = np.bincount(ranges, minlength=len(AGE_RANGES))
+            columns._distribution = {
+                "age_distribution": {r: int(c) for r, c in zip(AGE_RANGES, counts)},
+                "risk_distribution": _tallies(a['risk_level'], CATEGORICAL_COLUMNS['risk_level'])
+            }
+        return columns._distribution
+
+    def scatter(self, limit: int = 500) -> list:
+        """BMI vs glucose points for the first `limit` patients"""
+        return self._points(np.arange(min(limit, self.columns.size)))
+
+    def scatter_sample(self, budget: int) -> list:
+        """Stratified sample of at most `budget` points across risk levels"""
+        return self._points(stratified_sample(self.columns.arrays['risk_level'], budget))
+
+    def scatter_binned(self, bins_x: int, bins_y: int) -> dict:
+        """2D BMI x glucose histogram per risk level over every patient"""
+        a = self.columns.arrays
+        return binned_payload(histogram(a['BMI'], a['Glucose'], a['risk_level'], bins_x, bins_y))
+
+    def _points(self, rows) -> list:
+        columns = self.columns
+        a = columns.arrays
+        risk_labels = CATEGORICAL_COLUMNS['risk_level']
+        return [
+            {
+                "patient_id": pid,
+                "bmi": bmi,
+                "glucose": glucose,
+                "age": age,
+                "risk_level": risk_labels[risk],
+                "outcome": outcome
+            }
+            for pid, bmi, glucose, age, risk, outcome in zip(
+                columns.patient_ids[rows].tolist(),
+                a['BMI'][rows].tolist(),
+                a['Glucose'][rows].tolist(),
+                a['Age'][rows].astype(np.int64).tolist(),
+                a['risk_level'][rows].tolist(),
+                a['Outcome'][rows].tolist()
+            )
+        ]
@@ -0,0 +1,213 @@
+"""
+AIER Alert System - Delta Sync
+Incremental download of patients added, changed or deleted since a
+client's last sync
+
+Every write through the bulk loader stamps the item with `synced_at`
+(milliseconds) and `sync_day`. SyncIndex is keyed on (sync_day,
+synced_at). `sync_day` is the UTC date plus a shard derived from the
+patient_id (`2024-01-31#5`), so a day's writes spread over SYNC_SHARDS
+index partitions instead of one hot partition. A delta sync reads every
+shard of every day in its window with a key condition on synced_at. Its
+cost grows with the number of changes, not with the table size. Deletes
+leave a tombstone in a small table with the same key layout.
+
+SYNC_SHARDS may be raised: every old shard number is still read. It
+must not be lowered while stamps younger than SYNC_RETENTION_DAYS use
+the higher shard numbers. DynamoDB TTL expires the
+tombstones after SYNC_RETENTION_DAYS, so a watermark older than that
+requires a full sync.
+
+A sync covers the window (since, until], with until = now minus
+SYNC_SETTLE_SECONDS. Every item stamped inside the window has finished
+writing and reached the index by then. Items stamped later come with
+the next sync. `until` is returned as the client's next watermark.
+"""
+
+import os
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from boto3.dynamodb.conditions import Key
+
+from .database import AsyncTable, DYNAMODB_BACKEND, create_table
+from .local_table import InMemoryTable
+from .models import PATIENT_FIELDS
+from .projection import projection
+
+TOMBSTONES_TABLE = os.getenv("TOMBSTONES_TABLE_NAME", "aier-patient-tombstones")
+# Upper bound on write and index propagation delay
+SYNC_SETTLE_SECONDS = float(os.getenv("SYNC_SETTLE_SECONDS", "60"))
+# Tombstone lifetime, and so the oldest watermark a delta sync accepts
+SYNC_RETENTION_DAYS = int(os.getenv("SYNC_RETENTION_DAYS", "30"))
+# SyncIndex (and tombstone) partitions per UTC day
+SYNC_SHARDS = int(os.getenv("SYNC_SHARDS", "8"))
+
+SYNC_INDEX = 'SyncIndex'
+
+# Columns of a sync page; rows are lists in this order
+SYNC_FIELDS = PATIENT_FIELDS + ('synced_at',)
+TOMBSTONE_FIELDS = ('patient_id', 'timestamp', 'synced_at')
+
+
+class SyncExpired(ValueError):
+    """The watermark is older than the tombstone retention"""
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def sync_day(ms: int) -> str:
+    """UTC date of a millisecond timestamp"""
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def sync_shard(patient_id) -> int:
+    """Shard of a patient's stamps; stable across processes, unlike hash()"""
+    return zlib.crc32(str(patient_id).encode()) % SYNC_SHARDS
+
+
+def sync_partition(ms: int, patient_id) -> str:
+    """SyncIndex partition (`sync_day` value) of a stamp"""
+    return f"{sync_day(ms)}#{sync_shard(patient_id)}"
+
+
+def sync_stamp(patient_id, ms: int = None) -> dict:
+    """Attributes that put a patient's item into SyncIndex"""
+    ms = now_ms() if ms is None else ms
+    return {'sync_day': sync_partition(ms, patient_id), 'synced_at': ms}
+
+
+def sync_days(since: int, until: int) -> list:
+    """Partitions (every shard of every day) that can hold stamps in (since, until], oldest day first"""
+    day = datetime.fromtimestamp((since + 1) / 1000, tz=timezone.utc).date()
+    last = datetime.fromtimestamp(until / 1000, tz=timezone.utc).date()
+    partitions = []
+    while day <= last:
+        partitions.extend(f"{day.isoformat()}#{shard}" for shard in range(SYNC_SHARDS))
+        day += timedelta(days=1)
+    return partitions
+
+
+def tombstone_key(synced_at: int, patient_id: str, timestamp) -> str:
+    """Unique range key of a tombstone; sorts by synced_at"""
+    return f"{synced_at:013d}#{patient_id}#{timestamp}"
+
+
+def create_tombstones_table(
+    table_name: str = TOMBSTONES_TABLE,
+    backend: str = DYNAMODB_BACKEND
+):
+    """Create the tombstones Table resource (or the in-memory stand-in)"""
+    if backend == "memory":
+        return InMemoryTable(table_name, hash_key='sync_day', range_key='tombstone_key', indexes={})
+    return create_table(table_name, backend)
+
+
+def tombstone_items(keys, ms: int = None) -> list:
+    """
+    Tombstones for deleted patient items
+
+    Parameters:
+    - keys: {'patient_id', 'timestamp'} of the deleted items
+    - ms: Deletion time (default: now)
+    """
+    ms = now_ms() if ms is None else ms
+    expires_at = ms // 1000 + SYNC_RETENTION_DAYS * 86400
+    return [
+        {
+            **sync_stamp(key['patient_id'], ms),
+            'tombstone_key': tombstone_key(ms, key['patient_id'], key['timestamp']),
+            'patient_id': key['patient_id'],
+            'timestamp': key['timestamp'],
+            'expires_at': expires_at,
+        }
+        for key in keys
+    ]
+
+
+def sync_window(since, now: int = None) -> int:
+    """
+    Upper bound (`until`) of a sync starting now
+
+    Raises SyncExpired when `since` is past the tombstone retention.
+    """
+    now = now_ms() if now is None else now
+    if since is not None and since < now - SYNC_RETENTION_DAYS * 86400 * 1000:
+        raise SyncExpired(
+            f"Watermark is older than {SYNC_RETENTION_DAYS} days; run a full sync"
+        )
+    return int(now - SYNC_SETTLE_SECONDS * 1000)
+
+
+async def read_page(db: AsyncTable, tombstones: AsyncTable, since, state: dict, limit: int, fields: tuple = None):
+    """
+    Read up to `limit` changes of a sync
+
+    Parameters:
+    - db: Patient table
+    - tombstones: Tombstones table (None to skip deletes)
+    - since: Client watermark, or None for a full sync
+    - state: Position in the sync: {'until', 'phase', 'partition', 'key'}
+      ('partition' indexes sync_days, 'key' is the LastEvaluatedKey to
+      continue from)
+    - limit: Maximum items plus tombstones
+    - fields: Item attributes to read (default: all)
+
+    Returns (items, tombstones, next state or None when the sync is done).
+    Items come first, then tombstones; a full sync has no tombstones.
+    """
+    items, deleted = [], []
+    state = dict(state)
+
+    if since is None:
+        kwargs = {'Limit': limit, **projection(fields)}
+        if state.get('key'):
+            kwargs['ExclusiveStartKey'] = state['key']
+        response = await db.scan(**kwargs)
+        items = response.get('Items', [])
+        state['key'] = response.get('LastEvaluatedKey')
+        return items, deleted, state if state['key'] else None
+
+    partitions = sync_days(since, state['until'])
+    while len(items) + len(deleted) < limit:
+        if state['partition'] >= len(partitions):
+            if state['phase'] == 'deleted' or tombstones is None:
+                return items, deleted, None
+            state.update(phase='deleted', partition=0, key=None)
+            continue
+
+        partition = partitions[state['partition']]
+        if state['phase'] == 'items':
+            kwargs = {
+                'IndexName': SYNC_INDEX,
+                'KeyConditionExpression': Key('sync_day').eq(partition) & Key('synced_at').between(since + 1, state['until']),
+                **projection(fields)
+            }
+            target, table = items, db
+        else:
+            kwargs = {
+                'KeyConditionExpression': Key('sync_day').eq(partition) & Key('tombstone_key').between(
+                    f"{since + 1:013d}", f"{state['until']:013d}#\uffff"
+                ),
+            }
+            target, table = deleted, tombstones
+
+        kwargs['Limit'] = limit - len(items) - len(deleted)
+        if state.get('key'):
+            kwargs['ExclusiveStartKey'] = state['key']
+        response = await table.query(**kwargs)
+        target.extend(response.get('Items', []))
+        state['key'] = response.get('LastEvaluatedKey')
+        if not state['key']:
+            state['partition'] += 1
+    if state['phase'] == 'deleted' and state['partition'] >= len(partitions):
+        return items, deleted, None
+    return items, deleted, state
+
+
+def rows(items, fields) -> list:
+    """Items as value lists in `fields` order (None where missing)"""
+    return [[item.get(field) for field in fields] for item in items]
@@ -0,0 +1,38 @@
+"""
+AIER Alert System - Data Processor Lambda
+Loads processed patient files into DynamoDB when they land in S3
+
+Triggered by the processed/ upload notification in terraform/main.tf;
+handler is `lambda_function.handler`.
+"""
+
+import json
+import logging
+from urllib.parse import unquote_plus
+
+from app.loader import load_source
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def handler(event, context):
+    """
+    Bulk-load every object referenced by an S3 event
+
+    Parameters:
+    - event: S3 ObjectCreated notification
+    - context: Lambda context (unused)
+    """
+    reports = []
+    for record in event.get('Records', []):
+        bucket = record['s3']['bucket']['name']
+        key = unquote_plus(record['s3']['object']['key'])
+        report = load_source(f"s3://{bucket}/{key}")
+        logger.info("Loaded s3://%s/%s: %s", bucket, key, json.dumps(report.as_dict()))
+        reports.append(report.as_dict())
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'loaded': reports})
+    }
@@ -0,0 +1,12 @@
+"""
+AIER Alert System - Test Configuration
+Makes the backend `app` package importable when pytest runs from the
+repository root or from backend/
+"""
+
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
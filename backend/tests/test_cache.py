@@ -0,0 +1,120 @@
+"""
+AIER Alert System - Response Cache Tests
+ETags that survive rebuilds over unchanged data, and request
+coalescing that outlives a cancelled caller
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import asyncio
+from datetime import datetime
+
+from starlette.requests import Request
+
+from app.cache import ResponseCache
+
+
+def request(if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def payload(data):
+    """A build() payload as the read endpoints return it"""
+    return {
+        "status": "success",
+        "data": data,
+        "metadata": {"timestamp": datetime.utcnow().isoformat()}
+    }
+
+
+def test_rebuild_over_unchanged_data_keeps_etag():
+    async def scenario():
+        cache = ResponseCache()
+        builds = []
+
+        async def build():
+            builds.append(1)
+            await asyncio.sleep(0.001)  # A new build timestamp
+            return payload({"total_patients": 768})
+
+        first = await cache.respond(request(), "statistics", build)
+        cache.invalidate()
+        second = await cache.respond(request(first.headers["etag"]), "statistics", build)
+        return builds, first, second
+
+    builds, first, second = asyncio.run(scenario())
+    assert len(builds) == 2
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+def test_changed_data_changes_etag():
+    async def scenario():
+        cache = ResponseCache()
+        totals = iter([768, 769])
+
+        async def build():
+            return payload({"total_patients": next(totals)})
+
+        first = await cache.respond(request(), "statistics", build)
+        cache.invalidate()
+        second = await cache.respond(request(first.headers["etag"]), "statistics", build)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+
+
+def test_cancelled_leader_does_not_fail_waiters():
+    async def scenario():
+        cache = ResponseCache()
+        release = asyncio.Event()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return payload({"value": 1})
+
+        leader = asyncio.create_task(cache.get("key", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get("key", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        entry = await waiter
+        return calls, leader, entry, cache
+
+    calls, leader, entry, cache = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert len(calls) == 1
+    assert b'"value":1' in entry.body
+    # The shared fetch still filled the cache
+    assert "key" in cache._entries
+
+
+def test_background_refresh_is_tracked_until_done():
+    async def scenario():
+        cache = ResponseCache()
+        versions = iter([1, 2])
+
+        async def fetch():
+            return payload({"version": next(versions)})
+
+        await cache.get("key", fetch, ttl=60)
+        # Expired but within the stale window: served stale, refreshed behind
+        stale = await cache.get("key", fetch, ttl=0)
+        tracked = len(cache._tasks)
+        while cache._tasks:
+            await asyncio.sleep(0)
+        return stale, tracked, cache._entries["key"]
+
+    stale, tracked, fresh = asyncio.run(scenario())
+    assert b'"version":1' in stale.body
+    assert tracked == 1
+    assert b'"version":2' in fresh.body
@@ -0,0 +1,72 @@
+"""
+AIER Alert System - Change Feed Tests
+Single-reader stream lease handover and snapshot seeding
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import asyncio
+
+from app.aggregates import create_aggregates_table
+from app.changefeed import ChangeFeed, LocalStreamReader, StreamLease, follow_stream
+from app.local_table import InMemoryTable
+
+
+def patient(level: str, timestamp: int = 1, patient_id: str = "PT-00001") -> dict:
+    return {'patient_id': patient_id, 'timestamp': timestamp, 'risk_level': level}
+
+
+def test_waiting_process_takes_over_the_stream():
+    async def scenario():
+        leases = create_aggregates_table(backend="memory")
+        table = InMemoryTable()
+        first, second = ChangeFeed(), ChangeFeed()
+        holder = asyncio.create_task(follow_stream(
+            first, StreamLease(leases, seconds=0.2), lambda: LocalStreamReader(table), retry=0.05
+        ))
+        await asyncio.sleep(0.05)
+        standby = asyncio.create_task(follow_stream(
+            second, StreamLease(leases, seconds=0.2), lambda: LocalStreamReader(table), retry=0.05
+        ))
+        await asyncio.sleep(0.1)
+        before = (first.source, second.source)
+
+        # The reader dies without releasing; its lease expires
+        holder.cancel()
+        await asyncio.sleep(0.5)
+        after = second.source
+        standby.cancel()
+        return before, after
+
+    before, after = asyncio.run(scenario())
+    assert before == ("stream", "snapshot")
+    assert after == "stream"
+
+
+def test_reader_without_a_stream_falls_back_to_the_snapshot():
+    async def scenario():
+        feed = ChangeFeed()
+        lease = StreamLease(create_aggregates_table(backend="memory"), seconds=0.2)
+        await asyncio.wait_for(follow_stream(feed, lease, lambda: None, retry=0.05), 1)
+        return feed.source
+
+    assert asyncio.run(scenario()) == "snapshot"
+
+
+def test_seed_after_published_events_is_ignored():
+    feed = ChangeFeed(levels=('HIGH', 'CRITICAL'))
+    feed.publish([('INSERT', patient('CRITICAL'), None)])
+    feed.publish([('REMOVE', None, patient('CRITICAL'))])
+    assert feed._alerting == {}
+
+    # A snapshot that finished loading before the removal reached it
+    feed.seed([patient('CRITICAL')])
+    assert feed._alerting == {}
+
+
+def test_seed_before_any_event_records_alerting_patients():
+    feed = ChangeFeed(levels=('HIGH', 'CRITICAL'))
+    feed.seed([patient('HIGH', 1), patient('LOW', 2), patient('CRITICAL', 1, 'PT-00002')])
+    assert feed._alerting == {'PT-00002': (1, 'CRITICAL')}
+    assert feed.sequence == 0
@@ -0,0 +1,38 @@
+"""
+AIER Alert System - Bulk Loader Tests
+Wire-format items must be valid DynamoDB values, and S3 partition keys
+must decode the way pyarrow decodes a local dataset
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import numpy as np
+import pandas as pd
+
+from app.loader import _partition_values, frame_to_items
+
+
+def test_infinite_values_are_left_out_of_items():
+    df = pd.DataFrame({
+        'patient_id': ['PT-00001', 'PT-00002', 'PT-00003'],
+        'timestamp': [1, 2, 3],
+        'bmi': [np.inf, -np.inf, 31.5],
+    })
+    items = frame_to_items(df)
+    assert [item.get('bmi') for item in items] == [None, None, {'N': '31.5'}]
+    assert all(value is not None for item in items for value in item.values())
+
+
+def test_partition_values_are_url_decoded():
+    key = 'processed/age_group=60%2B/risk_level=HIGH/part-0.parquet'
+    assert _partition_values(key) == {'age_group': '60+', 'risk_level': 'HIGH'}
+
+
+def test_default_partition_is_left_out_of_items():
+    key = 'processed/risk_level=__HIVE_DEFAULT_PARTITION__/part-0.parquet'
+    partitions = _partition_values(key)
+    assert partitions == {'risk_level': None}
+
+    df = pd.DataFrame({'patient_id': ['PT-00001'], 'timestamp': [1]}).assign(**partitions)
+    assert frame_to_items(df) == [{'patient_id': {'S': 'PT-00001'}, 'timestamp': {'N': '1'}}]
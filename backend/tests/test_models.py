@@ -0,0 +1,23 @@
+"""
+AIER Alert System - API Model Tests
+Request limits count what the endpoints actually do
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import pytest
+from pydantic import ValidationError
+
+from app.models import MAX_BATCH_IDS, PatientBatchRequest
+
+
+def test_batch_limit_counts_distinct_ids():
+    ids = ['PT-00002', 'PT-00001'] * MAX_BATCH_IDS + ['PT-00003']
+    request = PatientBatchRequest(patient_ids=ids)
+    assert request.patient_ids == ['PT-00002', 'PT-00001', 'PT-00003']
+
+
+def test_batch_limit_rejects_too_many_distinct_ids():
+    with pytest.raises(ValidationError):
+        PatientBatchRequest(patient_ids=[f'PT-{n:05d}' for n in range(MAX_BATCH_IDS + 1)])
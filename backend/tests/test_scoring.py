@@ -0,0 +1,149 @@
+"""
+AIER Alert System - Scoring Engine Tests
+RiskScorer must reproduce the data pipeline's derived columns exactly,
+so POST /api/score and the processed files never disagree
+
+Run (from backend/):
+    python -m pytest tests
+"""
+
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.scoring import RiskScorer
+
+PIPELINE_FILE = Path(__file__).resolve().parents[2] / "scripts" / "data-pipeline.py"
+
+DERIVED_COLUMNS = ('risk_level', 'age_group', 'bmi_category')
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    """scripts/data-pipeline.py as a module (its file name is not importable)"""
+    spec = importlib.util.spec_from_file_location("data_pipeline", PIPELINE_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def reference_features(df: pd.DataFrame) -> pd.DataFrame:
+    """The pipeline's original pandas feature engineering"""
+    df = df.copy()
+    df['risk_score'] = (
+        (df['Glucose'] / 200) * 0.3 +
+        (df['BMI'] / 50) * 0.2 +
+        (df['Age'] / 100) * 0.2 +
+        (df['BloodPressure'] / 150) * 0.15 +
+        (df['DiabetesPedigreeFunction']) * 0.15
+    ).clip(0, 1)
+    df['risk_level'] = pd.cut(
+        df['risk_score'],
+        bins=[0, 0.3, 0.5, 0.7, 1.0],
+        labels=['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+    )
+    df['age_group'] = pd.cut(
+        df['Age'],
+        bins=[0, 30, 40, 50, 60, 100],
+        labels=['<30', '30-40', '40-50', '50-60', '60+']
+    )
+    df['bmi_category'] = pd.cut(
+        df['BMI'],
+        bins=[0, 18.5, 25, 30, 100],
+        labels=['Underweight', 'Normal', 'Overweight', 'Obese']
+    )
+    return df
+
+
+def edge_frame() -> pd.DataFrame:
+    """
+    Patients on, just inside and just outside every bucket edge
+
+    The first rows put risk_score exactly on its edges (0, 0.3, 0.5,
+    0.7, 1.0) through DiabetesPedigreeFunction alone; later rows sweep
+    Age and BMI over their edges, out of range and NaN.
+    """
+    ages = [0, 29.999, 30, 30.001, 40, 50, 59.5, 60, 100, 100.5, np.nan, -1]
+    bmis = [0, 18.5, 18.500001, 24.9, 25, 30, 30.1, 99.9, 100, 101, np.nan, -3]
+    pedigrees = [0, 2.0, 0.5 / 0.15, 0.7 / 0.15, 1.0 / 0.15, 0.29999 / 0.15]
+    rows = []
+    for pedigree in pedigrees:
+        rows.append({'Glucose': 0.0, 'BMI': 0.0, 'Age': 0.0, 'BloodPressure': 0.0,
+                     'DiabetesPedigreeFunction': pedigree})
+    rng = np.random.default_rng(7)
+    for age, bmi in zip(ages, bmis):
+        rows.append({
+            'Glucose': float(rng.uniform(40, 300)),
+            'BMI': bmi,
+            'Age': age,
+            'BloodPressure': float(rng.uniform(40, 200)),
+            'DiabetesPedigreeFunction': float(rng.uniform(0, 2.5)),
+        })
+    # Scores far outside [0, 1] are clipped onto the end edges
+    rows.append({'Glucose': 5000.0, 'BMI': 40.0, 'Age': 50.0, 'BloodPressure': 80.0,
+                 'DiabetesPedigreeFunction': 1.0})
+    rows.append({'Glucose': -5000.0, 'BMI': 40.0, 'Age': 50.0, 'BloodPressure': 80.0,
+                 'DiabetesPedigreeFunction': 1.0})
+    return pd.DataFrame(rows)
+
+
+def random_frame(size: int = 5000) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    return pd.DataFrame({
+        'Glucose': rng.uniform(40, 300, size).round(0),
+        'BMI': rng.uniform(15, 60, size).round(1),
+        'Age': rng.integers(21, 90, size).astype(float),
+        'BloodPressure': rng.uniform(40, 200, size).round(0),
+        'DiabetesPedigreeFunction': rng.uniform(0.05, 2.5, size).round(3),
+    })
+
+
+@pytest.mark.parametrize("make_frame", [edge_frame, random_frame])
+def test_pipeline_features_match_reference(pipeline, make_frame):
+    frame = make_frame()
+    expected = reference_features(frame)
+    actual = pipeline.add_features(frame.copy())
+
+    np.testing.assert_array_equal(
+        actual['risk_score'].to_numpy(dtype=np.float64),
+        expected['risk_score'].to_numpy(dtype=np.float64)
+    )
+    for name in DERIVED_COLUMNS:
+        assert actual[name].astype(object).where(actual[name].notna(), None).tolist() == \
+            expected[name].astype(object).where(expected[name].notna(), None).tolist(), name
+        assert list(actual[name].cat.categories) == list(expected[name].cat.categories)
+        assert actual[name].cat.ordered == expected[name].cat.ordered
+
+
+@pytest.mark.parametrize("make_frame", [edge_frame, random_frame])
+def test_scorer_reproduces_pipeline_output(pipeline, make_frame):
+    processed = pipeline.add_features(make_frame())
+    scorer = RiskScorer()
+    result = scorer.score_batch(processed)
+
+    # Bit-for-bit (NaN where a vital is missing), not approximately
+    np.testing.assert_array_equal(result.pop('risk_score'), processed['risk_score'].to_numpy(dtype=np.float64))
+    for name, codes in result.items():
+        expected = processed[name].astype(object).where(processed[name].notna(), None).tolist()
+        assert scorer.labels(name, codes) == expected, name
+
+
+def test_risk_score_edges_are_right_closed():
+    scorer = RiskScorer()
+    scores = [0.0, 0.3, 0.30000000000000004, 0.5, 0.7, 1.0, np.nan]
+    codes = scorer.codes('risk_level', scores)
+    assert scorer.labels('risk_level', codes) == [None, 'LOW', 'MEDIUM', 'MEDIUM', 'HIGH', 'CRITICAL', None]
+
+
+@pytest.mark.parametrize("name, values, labels", [
+    ('age_group', [0, 30, 30.5, 60, 60.5, 100, 100.5],
+     [None, '<30', '30-40', '50-60', '60+', '60+', None]),
+    ('bmi_category', [0, 18.5, 18.6, 25, 30, 30.01, 100, 100.01],
+     [None, 'Underweight', 'Normal', 'Normal', 'Overweight', 'Obese', 'Obese', None]),
+])
+def test_bucket_edges(name, values, labels):
+    scorer = RiskScorer()
+    assert scorer.labels(name, scorer.codes(name, values)) == labels
@@ -8,13 +8,23 @@
  * - Better error handling with typed exceptions
  */
 
-import axios, { AxiosInstance, AxiosError } from 'axios';
+import axios, { AxiosInstance, AxiosError, AxiosRequestConfig } from 'axios';
 import type { 
+  AlertEvent,
   ApiResponse, 
   ApiError, 
+  HistoryPage,
+  HistoryPoints,
+  HistoryWindows,
   Patient, 
+  PatientFilters,
+  PatientPage,
+  RiskLevel,
   Statistics, 
+  SyncPage,
+  SyncResult,
   ScatterDataPoint,
+  ScatterBins,
   DistributionData 
 } from '../types/patient';
 
@@ -35,6 +45,13 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 class ApiClient {
   private client: AxiosInstance;  // Type annotation - must be AxiosInstance
 
+  /**
+   * Last response body and ETag per URL
+   * Lets cached endpoints revalidate with If-None-Match and reuse the
+   * stored body when the server answers 304 Not Modified
+   */
+  private etagCache = new Map<string, { etag: string; data: unknown }>();
+
   /**
    * Constructor with typed parameters
    * JavaScript: constructor(baseURL = 'http://localhost:8000')
@@ -90,22 +107,68 @@ class ApiClient {
     }
   }
 
+  /**
+   * GET with ETag revalidation
+   *
+   * TypeScript: Generic <T> carries the response type through the cache
+   *
+   * @param url - Endpoint path
+   * @param config - Extra axios request options
+   * @returns Promise resolving to the (possibly cached) response body
+   */
+  private async getWithEtag<T>(url: string, config: AxiosRequestConfig = {}): Promise<T> {
+    const cacheKey = `${url}?${JSON.stringify(config.params ?? {})}`;
+    const cached = this.etagCache.get(cacheKey);
+
+    const response = await this.client.get<T>(url, {
+      ...config,
+      headers: {
+        ...config.headers,
+        ...(cached ? { 'If-None-Match': cached.etag } : {}),
+      },
+      // 304 is a successful revalidation, not an error
+      validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+    });
+
+    if (response.status === 304 && cached) {
+      return cached.data as T;
+    }
+
+    const etag = response.headers['etag'];
+    if (etag) {
+      this.etagCache.set(cacheKey, { etag, data: response.data });
+    }
+    return response.data;
+  }
+
   /**
    * Get list of patients
    * 
    * TypeScript differences:
-   * - Optional parameters with '?' (limit?: number)
+   * - Function overloads: one name, several typed call signatures
+   *   (JavaScript has a single untyped signature and checks at runtime)
    * - Return type Promise<Patient[]> guarantees array of Patient objects
    * - JavaScript: No type safety, could return anything
    * 
+   * getPatients(ids) fetches the latest record for each id through the
+   * batch endpoint (one request per 500 ids instead of one per patient).
+   * getPatients(limit, riskLevel) lists patients.
+   * 
    * @param limit - Maximum number of patients to return
    * @param riskLevel - Filter by risk level
    * @returns Promise resolving to array of Patient objects
    */
+  async getPatients(ids: string[]): Promise<Patient[]>;
+  async getPatients(limit?: number, riskLevel?: string): Promise<Patient[]>;
   async getPatients(
-    limit?: number,
+    limitOrIds?: number | string[],
     riskLevel?: string
   ): Promise<Patient[]> {  // Return type annotation
+    if (Array.isArray(limitOrIds)) {
+      return this.getPatientsByIds(limitOrIds);
+    }
+
+    const limit = limitOrIds;
     const params: Record<string, string | number> = {};  // Typed params object
     
     if (limit) params.limit = limit;
@@ -119,6 +182,143 @@ class ApiClient {
     return response.data.data.patients;
   }
 
+  /**
+   * Latest record for each patient id via POST /api/patients/batch
+   * 
+   * @param ids - Patient identifiers (duplicates are ignored by the server)
+   * @returns Promise resolving to the patients that exist
+   */
+  private async getPatientsByIds(ids: string[]): Promise<Patient[]> {
+    const BATCH_SIZE = 500;  // Server-side maximum per request
+    const batches: string[][] = [];
+    for (let i = 0; i < ids.length; i += BATCH_SIZE) {
+      batches.push(ids.slice(i, i + BATCH_SIZE));
+    }
+
+    const responses = await Promise.all(
+      batches.map((patientIds) =>
+        this.client.post<ApiResponse<{ patients: Patient[]; missing: string[] }>>(
+          '/api/patients/batch',
+          { patient_ids: patientIds }
+        )
+      )
+    );
+
+    return responses.flatMap((response) => response.data.data.patients);
+  }
+
+  /**
+   * Get one page of patients with its continuation cursor
+   * 
+   * @param limit - Maximum number of patients in the page
+   * @param riskLevel - Filter by risk level
+   * @param cursor - next_cursor from the previous page
+   * @param filters - Further filters (age group, BMI category, numeric ranges)
+   * @returns Promise resolving to the page and the cursor for the next one
+   */
+  async getPatientsPage(
+    limit?: number,
+    riskLevel?: string,
+    cursor?: string,
+    filters: PatientFilters = {}
+  ): Promise<PatientPage> {
+    const params: Record<string, string | number> = {};
+    for (const [name, value] of Object.entries(filters)) {
+      if (value !== undefined) params[name] = value;
+    }
+    
+    if (limit) params.limit = limit;
+    if (riskLevel) params.risk_level = riskLevel;
+    if (cursor) params.cursor = cursor;
+
+    const response = await this.client.get<ApiResponse<PatientPage>>(
+      '/api/patients',
+      { params }
+    );
+
+    return response.data.data;
+  }
+
+  /**
+   * Download changes since the last sync
+   * 
+   * Follows next_cursor through every page. Store the returned
+   * watermark and pass it as `since` after the next reconnect. Without
+   * `since`, everything is downloaded (a full sync). If the server
+   * answers 410 Gone, the watermark is too old: the result has
+   * resyncRequired set and no rows, and the caller must drop its local
+   * data and call syncChanges() without `since`.
+   * 
+   * @param since - Watermark from the previous sync
+   * @returns Promise resolving to upserted rows, tombstones and the new watermark
+   */
+  async syncChanges(since?: number): Promise<SyncResult> {
+    const result: SyncResult = { upserts: [], deleted: [], watermark: 0, resyncRequired: false };
+    let cursor: string | null = null;
+
+    do {
+      const params: Record<string, string | number> = {};
+      if (since !== undefined) params.since = since;
+      if (cursor) params.cursor = cursor;
+
+      const response = await this.client.get<ApiResponse<SyncPage>>('/api/sync', {
+        params,
+        // 410 means "resync from scratch", not a failed request
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 410,
+      });
+      if (response.status === 410) {
+        return { upserts: [], deleted: [], watermark: 0, resyncRequired: true };
+      }
+      const page = response.data.data;
+      const toObject = (fields: string[], row: unknown[]) =>
+        Object.fromEntries(fields.map((field, i) => [field, row[i]]));
+
+      page.rows.forEach((row) => {
+        result.upserts.push(toObject(page.fields, row) as SyncResult['upserts'][number]);
+      });
+      page.deleted.forEach((row) => {
+        result.deleted.push(toObject(page.deleted_fields, row) as SyncResult['deleted'][number]);
+      });
+      if (page.watermark !== null) result.watermark = page.watermark;
+      cursor = page.next_cursor;
+    } while (cursor);
+
+    return result;
+  }
+
+  /**
+   * Subscribe to HIGH/CRITICAL alerts pushed by the server (SSE)
+   * 
+   * Replaces polling getPatients(limit, 'CRITICAL'). EventSource
+   * reconnects on its own and sends the last event id, so the server
+   * resumes where the stream broke off. onReset is called when events
+   * were missed (e.g. after a long disconnect). Reload the patient list
+   * with getPatients() when that happens.
+   * 
+   * @param onAlert - Called for every alert and cleared event
+   * @param options - Alert levels to receive and a reset handler
+   * @returns Function that closes the stream
+   */
+  subscribeAlerts(
+    onAlert: (event: AlertEvent) => void,
+    options: { riskLevels?: RiskLevel[]; onReset?: () => void } = {}
+  ): () => void {
+    const url = new URL('/api/alerts/stream', this.client.defaults.baseURL);
+    if (options.riskLevels?.length) {
+      url.searchParams.set('risk_level', options.riskLevels.join(','));
+    }
+
+    const source = new EventSource(url.toString());
+    const handle = (message: MessageEvent<string>) => {
+      onAlert(JSON.parse(message.data) as AlertEvent);
+    };
+    source.addEventListener('alert', handle);
+    source.addEventListener('cleared', handle);
+    source.addEventListener('reset', () => options.onReset?.());
+
+    return () => source.close();
+  }
+
   /**
    * Get single patient by ID
    * 
@@ -133,17 +333,92 @@ class ApiClient {
     return response.data.data;
   }
 
+  /**
+   * Get one page of a patient's records over time
+   * 
+   * @param patientId - Patient identifier
+   * @param from - Earliest timestamp (epoch seconds, inclusive)
+   * @param to - Latest timestamp (epoch seconds, inclusive)
+   * @param cursor - next_cursor from the previous page
+   * @returns Promise resolving to the records (oldest first) and the next cursor
+   */
+  async getPatientHistoryPage(
+    patientId: string,
+    from?: number,
+    to?: number,
+    cursor?: string
+  ): Promise<HistoryPage> {
+    const params: Record<string, string | number> = {};
+    if (from !== undefined) params.from = from;
+    if (to !== undefined) params.to = to;
+    if (cursor) params.cursor = cursor;
+
+    const response = await this.client.get<ApiResponse<HistoryPage>>(
+      `/api/patients/${patientId}/history`,
+      { params }
+    );
+
+    return response.data.data;
+  }
+
+  /**
+   * Get a patient's history downsampled on the server for charting
+   * 
+   * @param patientId - Patient identifier
+   * @param method - minmax (per-window min/max/mean) or lttb (shape-preserving samples)
+   * @param points - Windows (minmax) or samples per series (lttb)
+   * @param fields - Numeric series to chart (default: Glucose, BloodPressure, BMI, risk_score)
+   * @param from - Earliest timestamp (epoch seconds, inclusive)
+   * @param to - Latest timestamp (epoch seconds, inclusive)
+   */
+  async getPatientHistorySeries(
+    patientId: string,
+    method: 'minmax',
+    points?: number,
+    fields?: string[],
+    from?: number,
+    to?: number
+  ): Promise<HistoryWindows>;
+  async getPatientHistorySeries(
+    patientId: string,
+    method: 'lttb',
+    points?: number,
+    fields?: string[],
+    from?: number,
+    to?: number
+  ): Promise<HistoryPoints>;
+  async getPatientHistorySeries(
+    patientId: string,
+    method: 'minmax' | 'lttb',
+    points: number = 500,
+    fields?: string[],
+    from?: number,
+    to?: number
+  ): Promise<HistoryWindows | HistoryPoints> {
+    const params: Record<string, string | number> = { downsample: method, points };
+    if (fields && fields.length) params.fields = fields.join(',');
+    if (from !== undefined) params.from = from;
+    if (to !== undefined) params.to = to;
+
+    const response = await this.client.get<ApiResponse<HistoryWindows | HistoryPoints>>(
+      `/api/patients/${patientId}/history`,
+      { params }
+    );
+
+    return response.data.data;
+  }
+
   /**
    * Get overall statistics
    * 
    * @returns Promise resolving to Statistics object
    */
   async getStatistics(): Promise<Statistics> {
-    const response = await this.client.get<ApiResponse<Statistics>>(
+    const response = await this.getWithEtag<ApiResponse<Statistics>>(
       '/api/statistics'
     );
 
-    return response.data.data;
+    return response.data;
   }
 
   /**
@@ -152,11 +427,41 @@ class ApiClient {
    * @returns Promise resolving to array of scatter data points
    */
   async getScatterData(): Promise<ScatterDataPoint[]> {
-    const response = await this.client.get<ApiResponse<ScatterDataPoint[]>>(
+    const response = await this.getWithEtag<ApiResponse<ScatterDataPoint[]>>(
       '/api/visualizations/scatter'
     );
 
-    return response.data.data;
+    return response.data;
+  }
+
+  /**
+   * Get binned scatter data covering every patient
+   * 
+   * @param bins - Bins per axis (5-200)
+   * @returns Promise resolving to per-risk-level 2D histogram cells
+   */
+  async getScatterBins(bins: number = 40): Promise<ScatterBins> {
+    const response = await this.getWithEtag<ApiResponse<ScatterBins>>(
+      '/api/visualizations/scatter',
+      { params: { mode: 'binned', bins } }
+    );
+
+    return response.data;
+  }
+
+  /**
+   * Get a stratified sample of scatter points across risk levels
+   * 
+   * @param budget - Maximum number of points
+   * @returns Promise resolving to array of scatter data points
+   */
+  async getScatterSample(budget: number = 2000): Promise<ScatterDataPoint[]> {
+    const response = await this.getWithEtag<ApiResponse<ScatterDataPoint[]>>(
+      '/api/visualizations/scatter',
+      { params: { mode: 'sample', budget } }
+    );
+
+    return response.data;
   }
 
   /**
@@ -165,11 +470,11 @@ class ApiClient {
    * @returns Promise resolving to DistributionData object
    */
   async getDistributionData(): Promise<DistributionData> {
-    const response = await this.client.get<ApiResponse<DistributionData>>(
+    const response = await this.getWithEtag<ApiResponse<DistributionData>>(
       '/api/visualizations/distribution'
     );
 
-    return response.data.data;
+    return response.data;
   }
 
   /**
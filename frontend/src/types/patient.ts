@@ -34,6 +34,100 @@ export interface Patient {
   bmi_category: string;
 }
 
+/**
+ * One page of a patient listing
+ * nextCursor is null on the last page
+ */
+export interface PatientPage {
+  patients: Patient[];
+  count: number;
+  has_more: boolean;
+  next_cursor: string | null;
+}
+
+/**
+ * Listing filters for GET /api/patients and the export, combined with AND
+ * Range bounds are inclusive
+ */
+export interface PatientFilters {
+  age_group?: string;
+  bmi_category?: string;
+  glucose_min?: number;
+  glucose_max?: number;
+  age_min?: number;
+  age_max?: number;
+  bmi_min?: number;
+  bmi_max?: number;
+  risk_score_min?: number;
+  risk_score_max?: number;
+}
+
+/**
+ * One page of GET /api/patients/{patient_id}/history
+ */
+export interface HistoryPage {
+  patient_id: string;
+  records: Patient[];
+  count: number;
+  has_more: boolean;
+  next_cursor: string | null;
+}
+
+/**
+ * Downsampled history (downsample=minmax)
+ * One entry per non-empty time window; t is the window start
+ * (epoch seconds), null where a series had no value in the window
+ */
+export interface HistoryWindows {
+  patient_id: string;
+  method: 'minmax';
+  samples: number;
+  t: number[];
+  count: number[];
+  series: Record<string, { min: (number | null)[]; max: (number | null)[]; mean: (number | null)[] }>;
+}
+
+/**
+ * Downsampled history (downsample=lttb)
+ * Each series keeps its own selected samples
+ */
+export interface HistoryPoints {
+  patient_id: string;
+  method: 'lttb';
+  samples: number;
+  series: Record<string, { t: number[]; value: number[] }>;
+}
+
+/**
+ * One page of GET /api/sync
+ * Rows and tombstones are value arrays in `fields` / `deleted_fields`
+ * order; watermark is set on the last page only
+ */
+export interface SyncPage {
+  fields: string[];
+  rows: unknown[][];
+  deleted_fields: string[];
+  deleted: unknown[][];
+  count: number;
+  has_more: boolean;
+  next_cursor: string | null;
+  watermark: number | null;
+}
+
+/**
+ * Result of a complete sync, rows decoded into objects
+ * 
+ * resyncRequired is true when the server answered 410 Gone: the
+ * watermark is older than the kept tombstones, nothing was applied,
+ * and a full sync (no `since`) must replace the local data.
+ */
+export interface SyncResult {
+  upserts: Array<Patient & { synced_at?: number }>;
+  deleted: Array<{ patient_id: string; timestamp: number; synced_at: number }>;
+  watermark: number;
+  resyncRequired: boolean;
+}
+
 /**
  * Risk level type
  * 
@@ -42,6 +136,19 @@ export interface Patient {
  */
 export type RiskLevel = 'LOW' | 'MEDIUM' | 'HIGH' | 'CRITICAL';
 
+/**
+ * Event from GET /api/alerts/stream
+ * 'alert': the patient's newest reading is HIGH or CRITICAL
+ * 'cleared': a later reading dropped below the alert levels
+ */
+export interface AlertEvent {
+  type: 'alert' | 'cleared';
+  sequence: number;
+  previous_risk_level: RiskLevel | null;
+  patient: Patient;
+  published_at: number;            // Unix milliseconds
+}
+
 /**
  * Scatter plot data point
  * Used for D3.js visualization
@@ -55,6 +162,17 @@ export interface ScatterDataPoint {
   outcome: 0 | 1;
 }
 
+/**
+ * Binned scatter data (mode=binned)
+ * Each cell is [xBin, yBin, count]; edges give the bin boundaries
+ */
+export interface ScatterBins {
+  x_edges: number[];
+  y_edges: number[];
+  cells: Partial<Record<RiskLevel | 'UNKNOWN', [number, number, number][]>>;
+  total: number;
+}
+
 /**
  * Statistics data structure
  */
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+AIER Alert System - API Load Benchmark
+Seeds the in-memory DynamoDB stand-in (same key schema and GSIs as
+aier-patient-data) with synthetic patients at several sizes and drives
+each endpoint in-process at a fixed concurrency through httpx's ASGI
+transport. Reports throughput, p50/p95/p99 latency and DynamoDB calls
+per request, and exits non-zero when a threshold or baseline is exceeded.
+
+Usage:
+    python scripts/benchmark-api.py --sizes 10000,100000
+    python scripts/benchmark-api.py --output results.json
+    python scripts/benchmark-api.py --baseline results.json --tolerance 0.25
+    python scripts/benchmark-api.py --thresholds scripts/benchmark-api-thresholds.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+
+# The API reads these at import time
+os.environ["DYNAMODB_BACKEND"] = "memory"
+os.environ["METRICS_ENABLED"] = "true"
+
+import httpx
+
+# Backend modules shared with the API
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR / "backend"))
+from app import main, metrics
+from app.aggregates import AggregateStore, create_aggregates_table
+from app.cache import ResponseCache
+from app.local_table import InMemoryTable
+from app.planner import TableStats
+from app.snapshot import PatientSnapshot
+from app.sync import now_ms, sync_stamp
+
+RISK_LABELS = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+AGE_LABELS = ['<30', '30-40', '40-50', '50-60', '60+']
+BMI_LABELS = ['Underweight', 'Normal', 'Overweight', 'Obese']
+
+BASE_TIMESTAMP = 1700000000
+
+# Loader write times (synced_at) span the last two days, oldest first,
+# and end before the sync settle window
+SYNC_SPAN_MS = 2 * 86400 * 1000
+SYNC_END_MS = now_ms() - 5 * 60 * 1000
+
+# Changes behind the delta sync scenario's watermark
+SYNC_DELTA_ITEMS = 500
+
+# Earlier hourly readings of the first patient, for the history scenarios
+HISTORY_PATIENT = "PT-0000001"
+HISTORY_READINGS = 2000
+
+
+def _decimals(values, decimals: int) -> list:
+    return [Decimal(text) for text in np.round(values, decimals).astype(str)]
+
+
+def synthetic_items(size: int, seed: int = 0) -> list:
+    """
+    Processed patient items as boto3 returns them (numbers as Decimal)
+
+    Vitals are drawn from plausible ranges and the derived columns use
+    the pipeline's formula and pd.cut bins, so the GSI partitions have
+    realistic sizes.
+    """
+    rng = np.random.default_rng(seed)
+    glucose = rng.normal(120, 30, size).clip(44, 199)
+    bmi = rng.normal(32, 7, size).clip(18.2, 59)
+    age = rng.integers(21, 82, size)
+    pressure = rng.normal(72, 12, size).clip(40, 122)
+    pedigree = rng.gamma(2.0, 0.24, size).clip(0.078, 2.42)
+    score = (glucose / 200 * 0.3 + bmi / 50 * 0.2 + age / 100 * 0.2
+             + pressure / 150 * 0.15 + pedigree * 0.15).clip(0, 1)
+
+    risk = np.digitize(score, [0.3, 0.5, 0.7], right=True)
+    age_group = np.digitize(age, [30, 40, 50, 60], right=True)
+    bmi_category = np.digitize(bmi, [18.5, 25, 30], right=True)
+
+    columns = {
+        'Pregnancies': [Decimal(int(v)) for v in rng.integers(0, 13, size)],
+        'Glucose': _decimals(glucose, 1),
+        'BloodPressure': _decimals(pressure, 1),
+        'SkinThickness': _decimals(rng.uniform(10, 50, size), 1),
+        'Insulin': _decimals(rng.uniform(15, 300, size), 1),
+        'BMI': _decimals(bmi, 1),
+        'DiabetesPedigreeFunction': _decimals(pedigree, 3),
+        'Age': [Decimal(int(v)) for v in age],
+        'Outcome': [Decimal(int(v)) for v in (rng.random(size) < score)],
+        'risk_score': _decimals(score, 4),
+    }
+    timestamps = [Decimal(BASE_TIMESTAMP + i // 1000) for i in range(size)]
+    names = list(columns)
+    return [
+        {
+            'patient_id': f"PT-{i + 1:07d}",
+            'timestamp': ts,
+            'ingestion_timestamp': ts,
+            **dict(zip(names, values)),
+            'risk_level': RISK_LABELS[r],
+            'age_group': AGE_LABELS[a],
+            'bmi_category': BMI_LABELS[b],
+            **sync_stamp(f"PT-{i + 1:07d}", sync_time(i, size)),
+        }
+        for i, (ts, values, r, a, b) in enumerate(zip(
+            timestamps, zip(*columns.values()), risk, age_group, bmi_category
+        ))
+    ]
+
+
+def sync_time(i: int, size: int) -> int:
+    """synced_at of the i-th synthetic item"""
+    return SYNC_END_MS - (size - 1 - i) * SYNC_SPAN_MS // max(size, 1)
+
+
+def history_items(latest: dict, seed: int = 0) -> list:
+    """HISTORY_READINGS hourly readings before a patient's latest item"""
+    rng = np.random.default_rng(seed)
+    glucose = _decimals(120 + 25 * np.sin(np.arange(HISTORY_READINGS) / 48)
+                        + rng.normal(0, 5, HISTORY_READINGS), 1)
+    return [
+        {
+            **{k: v for k, v in latest.items() if k not in ('sync_day', 'synced_at')},
+            'timestamp': Decimal(int(latest['timestamp']) - (HISTORY_READINGS - i) * 3600),
+            'Glucose': g,
+        }
+        for i, g in enumerate(glucose)
+    ]
+
+
+async def seed(size: int, use_snapshot: bool, use_cache: bool):
+    """Point the API at a fresh table of `size` patients"""
+    items = synthetic_items(size)
+    table = InMemoryTable()
+    for item in items:
+        table.put_item(Item=item)
+    # Older readings are left out of SyncIndex and the aggregates
+    for item in history_items(items[0]):
+        table.put_item(Item=item)
+
+    main.table = table
+    main.db.table = table
+    main.aggregate_store = AggregateStore(create_aggregates_table())
+    main.aggregate_store.apply(items)
+    main.table_stats = TableStats(main.load_tallies)
+    main.snapshot = PatientSnapshot(main.db)
+    if use_snapshot:
+        await main.snapshot.refresh()
+    # A zero-entry cache stores nothing, so every request does the work
+    main.response_cache = ResponseCache() if use_cache else ResponseCache(max_entries=0)
+    return table
+
+
+def scenarios(size: int, rng: random.Random) -> list:
+    """(name, route template, request factory) for every endpoint"""
+    def patient_id():
+        return f"PT-{rng.randint(1, size):07d}"
+
+    def batch_ids():
+        return [f"PT-{n:07d}" for n in rng.sample(range(1, size + 1), min(100, size))]
+
+    # A client that last synced SYNC_DELTA_ITEMS writes ago
+    since = sync_time(max(size - SYNC_DELTA_ITEMS, 0), size) - 1
+
+    return [
+        ("patients_page", "/api/patients",
+         lambda: ("GET", "/api/patients?limit=50", None)),
+        ("patients_by_risk", "/api/patients",
+         lambda: ("GET", f"/api/patients?limit=50&risk_level={rng.choice(RISK_LABELS)}", None)),
+        ("patients_filtered", "/api/patients",
+         lambda: ("GET", "/api/patients?limit=50&risk_level=HIGH&age_group=50-60&glucose_min=120", None)),
+        ("patient_detail", "/api/patients/{patient_id}",
+         lambda: ("GET", f"/api/patients/{patient_id()}", None)),
+        ("patient_batch", "/api/patients/batch",
+         lambda: ("POST", "/api/patients/batch", {"patient_ids": batch_ids()})),
+        ("statistics", "/api/statistics",
+         lambda: ("GET", "/api/statistics", None)),
+        ("distribution", "/api/visualizations/distribution",
+         lambda: ("GET", "/api/visualizations/distribution", None)),
+        ("scatter_points", "/api/visualizations/scatter",
+         lambda: ("GET", "/api/visualizations/scatter", None)),
+        ("scatter_binned", "/api/visualizations/scatter",
+         lambda: ("GET", "/api/visualizations/scatter?mode=binned&bins=40", None)),
+        ("scatter_sample", "/api/visualizations/scatter",
+         lambda: ("GET", "/api/visualizations/scatter?mode=sample&budget=2000", None)),
+        ("history_page", "/api/patients/{patient_id}/history",
+         lambda: ("GET", f"/api/patients/{HISTORY_PATIENT}/history?limit=500", None)),
+        ("history_minmax", "/api/patients/{patient_id}/history",
+         lambda: ("GET", f"/api/patients/{HISTORY_PATIENT}/history?downsample=minmax&points=200", None)),
+        ("history_lttb", "/api/patients/{patient_id}/history",
+         lambda: ("GET", f"/api/patients/{HISTORY_PATIENT}/history?downsample=lttb&points=200", None)),
+        ("sync_delta", "/api/sync",
+         lambda: ("GET", f"/api/sync?since={since}&limit=1000", None)),
+        ("sync_full_page", "/api/sync",
+         lambda: ("GET", "/api/sync?limit=1000", None)),
+    ]
+
+
+def dynamodb_calls(route: str) -> int:
+    return sum(v for (r, _), v in metrics.dynamodb_calls.values.items() if r == route)
+
+
+async def drive(client, route, make_request, requests: int, concurrency: int) -> dict:
+    """Send `requests` requests from `concurrency` concurrent clients"""
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, url, body = make_request()
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    calls_before = dynamodb_calls(route)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "dynamodb_calls_per_request": round((dynamodb_calls(route) - calls_before) / len(latencies), 3),
+    }
+
+
+async def run(args) -> dict:
+    results = {}
+    selected = set(args.endpoints.split(",")) if args.endpoints else None
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for size in args.sizes:
+            started = time.perf_counter()
+            await seed(size, args.snapshot, args.cache)
+            print(f"\n{size:,} patients (seeded in {time.perf_counter() - started:.1f}s)")
+            print(f"{'endpoint':<18} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ddb/req':>8} {'errors':>7}")
+
+            results[str(size)] = {}
+            for name, route, make_request in scenarios(size, random.Random(0)):
+                if selected and name not in selected:
+                    continue
+                # Warm-up fills caches and the connection-free ASGI path
+                await drive(client, route, make_request, min(args.requests, args.concurrency), args.concurrency)
+                stats = await drive(client, route, make_request, args.requests, args.concurrency)
+                results[str(size)][name] = stats
+                print(f"{name:<18} {stats['rps']:>9.1f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+                      f"{stats['p99_ms']:>9.2f} {stats['dynamodb_calls_per_request']:>8.2f} {stats['errors']:>7}")
+    return results
+
+
+def check(results: dict, thresholds: dict = None, baseline: dict = None, tolerance: float = 0.25) -> list:
+    """
+    Return failure messages
+
+    Parameters:
+    - thresholds: {"default": {...}, "<endpoint>": {...}} with any of
+      p50_ms, p95_ms, p99_ms, dynamodb_calls_per_request (maxima) and
+      rps (minimum); "<endpoint>@<size>" entries override per size
+    - baseline: Earlier --output results; latency may grow by at most
+      `tolerance`, throughput may drop by at most `tolerance`, and
+      DynamoDB calls per request may not grow at all
+    """
+    failures = []
+    for size, endpoints in results.items():
+        for name, stats in endpoints.items():
+            label = f"{name} @ {size}"
+            if stats["errors"]:
+                failures.append(f"{label}: {stats['errors']} error responses")
+
+            limits = {}
+            if thresholds:
+                for key in ("default", name, f"{name}@{size}"):
+                    limits.update(thresholds.get(key, {}))
+            for metric, limit in limits.items():
+                value = stats[metric]
+                if (value < limit) if metric == "rps" else (value > limit):
+                    failures.append(f"{label}: {metric} {value} exceeds threshold {limit}")
+
+            previous = (baseline or {}).get(size, {}).get(name)
+            if previous:
+                for metric in ("p50_ms", "p95_ms", "p99_ms"):
+                    if stats[metric] > previous[metric] * (1 + tolerance):
+                        failures.append(f"{label}: {metric} {stats[metric]} vs baseline {previous[metric]}")
+                if stats["rps"] < previous["rps"] * (1 - tolerance):
+                    failures.append(f"{label}: rps {stats['rps']} vs baseline {previous['rps']}")
+                if stats["dynamodb_calls_per_request"] > previous["dynamodb_calls_per_request"] + 1e-9:
+                    failures.append(
+                        f"{label}: DynamoDB calls/request {stats['dynamodb_calls_per_request']} "
+                        f"vs baseline {previous['dynamodb_calls_per_request']}"
+                    )
+    return failures
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='AIER API Load Benchmark')
+    parser.add_argument('--sizes', default='10000,100000',
+                        help='Comma-separated patient counts (e.g. 10000,100000,1000000)')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--endpoints', default='', help='Comma-separated endpoint names (default: all)')
+    parser.add_argument('--no-snapshot', dest='snapshot', action='store_false',
+                        help='Serve analytics from aggregates/scans instead of the snapshot')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='Disable the response cache so every request does the work')
+    parser.add_argument('--output', help='Write results as JSON (usable as a --baseline)')
+    parser.add_argument('--thresholds', help='JSON file of absolute limits per endpoint')
+    parser.add_argument('--baseline', help='Earlier --output file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative latency/throughput regression against the baseline')
+    args = parser.parse_args()
+    args.sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+
+    results = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    thresholds = json.loads(Path(args.thresholds).read_text()) if args.thresholds else None
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    failures = check(results, thresholds, baseline, args.tolerance)
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    if thresholds or baseline:
+        print("\nAll checks passed")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+AIER Alert System - Response Encoding Benchmark
+Compares FastAPI's default jsonable_encoder + json.dumps path against the
+backend's fast encoder on patient list and scatter payloads, and reports
+gzip/brotli compressed sizes
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+
+# Backend modules shared with the API
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR / "backend"))
+from app import responses
+from app.responses import encode_json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RISK_LEVELS = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+
+
+def patient_item(i: int, rng: random.Random) -> dict:
+    """Synthetic DynamoDB item (numbers as Decimal, like boto3 returns them)"""
+    return {
+        'patient_id': f"PT-{i:05d}",
+        'timestamp': Decimal(1700000000 + i),
+        'ingestion_timestamp': Decimal(1700000000 + i),
+        'Pregnancies': Decimal(rng.randint(0, 12)),
+        'Glucose': Decimal(str(round(rng.uniform(60, 200), 1))),
+        'BloodPressure': Decimal(str(round(rng.uniform(50, 110), 1))),
+        'SkinThickness': Decimal(str(round(rng.uniform(10, 50), 1))),
+        'Insulin': Decimal(str(round(rng.uniform(20, 300), 1))),
+        'BMI': Decimal(str(round(rng.uniform(18, 50), 1))),
+        'DiabetesPedigreeFunction': Decimal(str(round(rng.uniform(0.1, 2.0), 3))),
+        'Age': Decimal(rng.randint(21, 80)),
+        'Outcome': Decimal(rng.randint(0, 1)),
+        'risk_score': Decimal(rng.randint(0, 10)),
+        'risk_level': rng.choice(RISK_LEVELS),
+        'age_group': rng.choice(['Young', 'Middle', 'Senior', 'Elderly']),
+        'bmi_category': rng.choice(['Normal', 'Overweight', 'Obese'])
+    }
+
+
+def build_payloads(size: int) -> dict:
+    rng = random.Random(0)
+    items = [patient_item(i, rng) for i in range(size)]
+    scatter = [
+        {
+            "patient_id": item['patient_id'],
+            "bmi": float(item['BMI']),
+            "glucose": float(item['Glucose']),
+            "age": int(item['Age']),
+            "risk_level": item['risk_level'],
+            "outcome": int(item['Outcome'])
+        }
+        for item in items
+    ]
+    return {
+        "patients": {"status": "success", "data": {"patients": items, "count": len(items)}},
+        "scatter": {"status": "success", "data": scatter},
+    }
+
+
+def default_encode(payload) -> bytes:
+    """What FastAPI's JSONResponse does for a handler returning a dict"""
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def timed(func, payload, repeat: int) -> float:
+    """Best-of-repeat wall time in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(payload)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AIER Response Encoding Benchmark')
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma-separated item counts')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    print(f"Fast encoder backend: {'orjson' if responses.orjson else 'json (stdlib fallback)'}")
+    print(f"Brotli: {'available' if brotli else 'not installed'}\n")
+    print(f"{'payload':<10} {'items':>7} {'default ms':>11} {'fast ms':>9} {'speedup':>8} "
+          f"{'raw KB':>8} {'gzip KB':>8} {'br KB':>7}")
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        for name, payload in build_payloads(size).items():
+            baseline = timed(default_encode, payload, args.repeat)
+            fast = timed(encode_json, payload, args.repeat)
+            body = encode_json(payload)
+            gzipped = len(gzip.compress(body, compresslevel=6))
+            brotlied = f"{len(brotli.compress(body, quality=4)) / 1024:7.1f}" if brotli else f"{'-':>7}"
+            print(f"{name:<10} {size:>7} {baseline:>11.2f} {fast:>9.2f} {baseline / fast:>7.1f}x "
+                  f"{len(body) / 1024:>8.1f} {gzipped / 1024:>8.1f} {brotlied}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+AIER Alert System - Output Format Benchmark
+Compares the processed CSV with Parquet (single file and partitioned):
+file size, full read time and column-pruned read time
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Backend modules shared with the API
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR / "backend"))
+from app.columnar import ParquetSink, read_patients
+
+PROCESSED_FILE = BASE_DIR / "data" / "diabetes_processed.csv"
+
+# Columns a typical downstream reader (scatter chart) needs
+PRUNED_COLUMNS = ['patient_id', 'BMI', 'Glucose', 'risk_level']
+CATEGORICAL_DTYPES = {
+    'risk_level': 'category',
+    'age_group': 'category',
+    'bmi_category': 'category',
+}
+
+
+def size_of(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+def timed(func, repeat: int) -> float:
+    """Best-of-repeat wall time in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def load_processed(scale: int) -> pd.DataFrame:
+    """Processed data repeated `scale` times (with unique patient IDs)"""
+    df = pd.read_csv(PROCESSED_FILE, dtype=CATEGORICAL_DTYPES)
+    if scale > 1:
+        df = pd.concat([df] * scale, ignore_index=True)
+        df['patient_id'] = [f"PT-{i:08d}" for i in range(1, len(df) + 1)]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AIER Output Format Benchmark')
+    parser.add_argument('--scale', type=int, default=100, help='Times to replicate the processed dataset')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    if not PROCESSED_FILE.exists():
+        print(f"ERROR: {PROCESSED_FILE} not found; run scripts/data-pipeline.py first")
+        sys.exit(1)
+
+    df = load_processed(args.scale)
+    workdir = Path(tempfile.mkdtemp(prefix="aier-formats-"))
+    try:
+        csv_path = workdir / "patients.csv"
+        df.to_csv(csv_path, index=False)
+
+        outputs = {"csv": csv_path}
+        for name, partition_by in (("parquet", None), ("parquet/risk", ["risk_level"])):
+            path = workdir / name.replace("/", "_")
+            with ParquetSink(path, partition_by=partition_by) as sink:
+                sink.write(df)
+            outputs[name] = path
+
+        readers = {
+            "csv": (
+                lambda: pd.read_csv(csv_path, dtype=CATEGORICAL_DTYPES),
+                lambda: pd.read_csv(csv_path, usecols=PRUNED_COLUMNS, dtype=CATEGORICAL_DTYPES),
+            ),
+        }
+        for name in ("parquet", "parquet/risk"):
+            path = outputs[name]
+            readers[name] = (
+                lambda path=path: read_patients(path),
+                lambda path=path: read_patients(path, columns=PRUNED_COLUMNS),
+            )
+
+        print(f"Rows: {len(df)}\n")
+        print(f"{'format':<14} {'size KB':>9} {'ratio':>6} {'full ms':>9} {'pruned ms':>10}")
+        csv_size = size_of(csv_path)
+        for name, path in outputs.items():
+            full, pruned = readers[name]
+            size = size_of(path)
+            print(f"{name:<14} {size / 1024:>9.1f} {size / csv_size:>6.2f} "
+                  f"{timed(full, args.repeat):>9.1f} {timed(pruned, args.repeat):>10.1f}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
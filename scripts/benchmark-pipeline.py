@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+AIER Alert System - Pipeline Throughput Benchmark
+Generates synthetic datasets of increasing size and runs the full data
+pipeline over each with --profile, reporting rows/sec and peak memory
+per stage plus the pipeline process's peak RSS
+
+Per-stage memory is measured as peak RSS by default on Linux, since
+tracemalloc slows the stages it measures several-fold.
+
+Each size runs in its own temporary data directory (PIPELINE_DATA_DIR),
+so data/ is never touched.
+
+Usage:
+    python scripts/benchmark-pipeline.py --sizes 100000,1000000
+    python scripts/benchmark-pipeline.py --sizes 5000000 --pipeline-args="--chunk-size 500000 --workers 4"
+"""
+
+import argparse
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).parent
+GENERATOR = SCRIPTS_DIR / "generate-dataset.py"
+PIPELINE = SCRIPTS_DIR / "data-pipeline.py"
+
+
+def run_pipeline(data_dir: Path, extra_args, memory: str) -> tuple:
+    """
+    Run the pipeline with --profile in data_dir
+
+    Returns (wall seconds, peak RSS in MB or None, profile report).
+    """
+    env = dict(os.environ, PIPELINE_DATA_DIR=str(data_dir))
+    command = [sys.executable, str(PIPELINE), "--profile", f"--profile-memory={memory}", *extra_args]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = process.stdout.read()
+    if hasattr(os, "wait4"):
+        # ru_maxrss of this child alone (kilobytes on Linux)
+        _, status, usage = os.wait4(process.pid, 0)
+        returncode = os.waitstatus_to_exitcode(status)
+        process.returncode = returncode
+        peak_rss = usage.ru_maxrss / 1024
+    else:
+        returncode = process.wait()
+        peak_rss = None
+    wall = time.perf_counter() - start
+
+    if returncode != 0:
+        sys.stdout.write(output.decode("utf-8", "replace"))
+        raise RuntimeError(f"Pipeline failed with exit code {returncode}")
+    report = json.loads((data_dir / "pipeline_profile.json").read_text())
+    return wall, peak_rss, report
+
+
+def stage_rows(stage: dict, rows: int) -> int:
+    """Rows a stage worked through (the input size for stages that load it)"""
+    counts = [c for c in (stage.get('rows_in'), stage.get('rows_out')) if c is not None]
+    return max(counts) if counts else rows
+
+
+def benchmark(size: int, extra_args, seed: int, keep: bool, memory: str) -> dict:
+    data_dir = Path(tempfile.mkdtemp(prefix="aier-pipeline-"))
+    try:
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(GENERATOR), "--rows", str(size), "--seed", str(seed),
+             "--output", str(data_dir / "diabetes.csv")],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        generate_seconds = time.perf_counter() - start
+
+        wall, peak_rss, report = run_pipeline(data_dir, extra_args, memory)
+        stages = [
+            {
+                "stage": s['stage'],
+                "depth": s['depth'],
+                "wall_seconds": s['wall_seconds'],
+                "rows_per_second": round(stage_rows(s, size) / s['wall_seconds'], 1) if s['wall_seconds'] else None,
+                "peak_memory_mb": s['peak_memory_mb'],
+                "rows_in": s['rows_in'],
+                "rows_out": s['rows_out'],
+            }
+            for s in report['stages']
+        ]
+        return {
+            "rows": size,
+            "generate_seconds": round(generate_seconds, 3),
+            "pipeline_seconds": round(wall, 3),
+            "rows_per_second": round(size / wall, 1),
+            "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+            "stages": stages,
+        }
+    finally:
+        if keep:
+            print(f"Kept {data_dir}")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def print_result(result: dict):
+    rss = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else "n/a"
+    print(f"\n{result['rows']:,} rows: {result['pipeline_seconds']:.2f}s "
+          f"({result['rows_per_second']:,.0f} rows/s), peak RSS {rss}, "
+          f"generated in {result['generate_seconds']:.2f}s")
+    print(f"  {'stage':<24} {'seconds':>9} {'rows/s':>12} {'peak MB':>9} {'rows in':>10} {'rows out':>10}")
+    for s in result['stages']:
+        name = "  " * s['depth'] + s['stage']
+        rate = f"{s['rows_per_second']:,.0f}" if s['rows_per_second'] is not None else "-"
+        rows_in = "-" if s['rows_in'] is None else f"{s['rows_in']:,}"
+        rows_out = "-" if s['rows_out'] is None else f"{s['rows_out']:,}"
+        print(f"  {name:<24} {s['wall_seconds']:>9.3f} {rate:>12} {s['peak_memory_mb']:>9.1f} {rows_in:>10} {rows_out:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AIER Pipeline Throughput Benchmark')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma-separated row counts')
+    parser.add_argument('--pipeline-args', default='',
+                        help='Extra data-pipeline.py arguments, e.g. "--chunk-size 100000 --workers 4"')
+    parser.add_argument('--seed', type=int, default=0, help='Generator seed')
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary data directories')
+    parser.add_argument('--memory', choices=['rss', 'tracemalloc'],
+                        default='rss' if sys.platform.startswith('linux') else 'tracemalloc',
+                        help='Per-stage peak memory source (tracemalloc slows the stages it measures)')
+    args = parser.parse_args()
+
+    extra_args = shlex.split(args.pipeline_args)
+    if '--upload' in extra_args:
+        parser.error('the benchmark only measures local processing')
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(',') if s.strip()):
+        result = benchmark(size, extra_args, args.seed, args.keep, args.memory)
+        print_result(result)
+        results.append(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"pipeline_args": extra_args, "memory": args.memory, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
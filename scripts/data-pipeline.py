@@ -5,32 +5,664 @@ Processes Kaggle diabetes dataset and uploads to AWS
 """
 
 import os
+import io
 import sys
 import json
+import time
+import shutil
+import cProfile
+import hashlib
 import argparse
+import functools
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+import numpy as np
 import pandas as pd
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 
 # Paths
 BASE_DIR = Path(__file__).parent.parent
-DATA_DIR = BASE_DIR / "data"
+# Input, outputs and caches; override to run against another dataset
+DATA_DIR = Path(os.getenv("PIPELINE_DATA_DIR", BASE_DIR / "data"))
 INPUT_FILE = DATA_DIR / "diabetes.csv"
 OUTPUT_FILE = DATA_DIR / "diabetes_processed.csv"
+PARQUET_OUTPUT = DATA_DIR / "diabetes_processed.parquet"
+
+# --profile output: per-stage report and optional cProfile dumps
+PROFILE_FILE = DATA_DIR / "pipeline_profile.json"
+CPROFILE_DIR = DATA_DIR / "profile"
+
+# Incremental runs: stage checkpoints and the patient ID map
+CACHE_DIR = DATA_DIR / ".cache"
+# Bump when a stage's logic changes so old checkpoints are not reused
+CACHE_VERSION = 1
+
+# Backend modules shared with the API
+sys.path.insert(0, str(BASE_DIR / "backend"))
+from app.columnar import PARTITION_COLUMNS, ParquetSink, parquet_bytes
+from app.scoring import load_scorer
 
 # AWS Configuration
 AWS_REGION = os.getenv("AWS_DEFAULT_REGION", "us-east-1")
 S3_BUCKET = os.getenv("S3_BUCKET_NAME", "aier-data-dev")
+# Custom endpoint for a local S3 stand-in (LocalStack, MinIO)
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "10"))
+S3_PART_SIZE_MB = int(os.getenv("S3_PART_SIZE_MB", "8"))
+
+# Worker processes for the per-row stages (1 = run in this process)
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "1"))
+
+# Object metadata key holding the content hash of an uploaded artifact
+CONTENT_HASH_KEY = "content-sha256"
+
+# Columns that change on every run without the data changing; left out
+# of the content hash so re-running on the same input is a no-op upload
+VOLATILE_COLUMNS = ['ingestion_timestamp']
+
+REQUIRED_COLUMNS = [
+    'Pregnancies', 'Glucose', 'BloodPressure',
+    'SkinThickness', 'Insulin', 'BMI',
+    'DiabetesPedigreeFunction', 'Age', 'Outcome'
+]
+
+# Source row identity carried through cleaning by the incremental run
+ROW_KEY = '_row_key'
+
+# Zero values are medical impossibilities; replaced with the median
+ZERO_COLUMNS = ['Glucose', 'BloodPressure', 'BMI']
+
+# Risk score weights and category edges, shared with the API's
+# /api/score (override with SCORING_CONFIG_FILE)
+SCORER = load_scorer()
+
+# Clinical plausibility ranges; rows outside are dropped
+OUTLIER_THRESHOLDS = {
+    'Glucose': (40, 300),
+    'BloodPressure': (40, 200),
+    'BMI': (15, 60)
+}
+
+# ----------------------------------------------------------------------
+# Per-frame transformations
+#
+# Each stage works on one DataFrame at a time so the same code serves
+# the in-memory run (one frame) and the chunked run (many frames).
+# ----------------------------------------------------------------------
+
+def check_frame(df):
+    """Return (null counts, outlier descriptions) for a frame"""
+    missing = set(REQUIRED_COLUMNS) - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    
+    issues = []
+    if (df['Glucose'] > 300).any():
+        issues.append("Glucose > 300")
+    if (df['BloodPressure'] > 200).any():
+        issues.append("BloodPressure > 200")
+    if (df['BMI'] > 60).any():
+        issues.append("BMI > 60")
+    
+    return df[REQUIRED_COLUMNS].isnull().sum(), issues
+
+def median_from_counts(counts):
+    """Exact median of a multiset given as a value -> count Series"""
+    counts = counts.sort_index()
+    total = int(counts.sum())
+    if total == 0:
+        return np.nan
+    cumulative = counts.cumsum().to_numpy()
+    values = counts.index.to_numpy()
+    lower = values[np.searchsorted(cumulative, (total - 1) // 2 + 1)]
+    upper = values[np.searchsorted(cumulative, total // 2 + 1)]
+    return (lower + upper) / 2
+
+def impute_zeros(df, medians):
+    """Replace zeros with the given medians; returns zero counts per column"""
+    replaced = {}
+    for col in ZERO_COLUMNS:
+        if col in df.columns:
+            zero_count = int((df[col] == 0).sum())
+            if zero_count > 0:
+                df.loc[df[col] == 0, col] = medians[col]
+            replaced[col] = zero_count
+    return df, replaced
+
+def remove_outliers(df):
+    """Drop rows outside OUTLIER_THRESHOLDS; returns rows removed per column"""
+    removed = {}
+    for col, (min_val, max_val) in OUTLIER_THRESHOLDS.items():
+        if col in df.columns:
+            keep = (df[col] >= min_val) & (df[col] <= max_val)
+            removed[col] = int(len(df) - keep.sum())
+            if removed[col] > 0:
+                df = df[keep]
+    return df, removed
+
+def assign_ids(df, start, timestamp):
+    """Add sequential patient IDs from `start` and the ingestion timestamp"""
+    df = df.copy()
+    df['patient_id'] = [f"PT-{i:05d}" for i in range(start, start + len(df))]
+    df['ingestion_timestamp'] = timestamp
+    
+    cols = ['patient_id', 'ingestion_timestamp'] + [col for col in df.columns if col not in ['patient_id', 'ingestion_timestamp']]
+    return df[cols]
+
+def add_features(df):
+    """Add risk score, risk level, age group and BMI category"""
+    return SCORER.add_features(df)
+
+class StatsAccumulator:
+    """
+    Streaming version of the statistics.json summary
+    
+    Sums and category tallies are added frame by frame; means are taken
+    at the end, so one frame or many give the same statistics (up to
+    floating point summation order).
+    """
+    
+    MEAN_COLUMNS = {'diabetes_prevalence': 'Outcome', 'avg_age': 'Age',
+                    'avg_glucose': 'Glucose', 'avg_bmi': 'BMI'}
+    COUNT_COLUMNS = {'risk_distribution': 'risk_level', 'age_distribution': 'age_group'}
+    
+    def __init__(self):
+        self.count = 0
+        self.sums = {col: 0.0 for col in self.MEAN_COLUMNS.values()}
+        self.tallies = {col: None for col in self.COUNT_COLUMNS.values()}
+    
+    def add(self, df):
+        self.count += len(df)
+        for col in self.sums:
+            self.sums[col] += float(df[col].sum())
+        for col, tally in self.tallies.items():
+            counts = df[col].value_counts(sort=False)
+            self.tallies[col] = counts if tally is None else tally.add(counts, fill_value=0)
+        return self
+    
+    def result(self):
+        def mean(col):
+            return self.sums[col] / self.count if self.count else float('nan')
+        
+        def distribution(col):
+            tally = self.tallies[col]
+            if tally is None:
+                return {}
+            return {str(k): int(v) for k, v in tally.sort_values(ascending=False).items()}
+        
+        stats = {'total_patients': self.count}
+        stats.update({key: float(mean(col)) for key, col in self.MEAN_COLUMNS.items()})
+        stats.update({key: distribution(col) for key, col in self.COUNT_COLUMNS.items()})
+        stats['processing_timestamp'] = datetime.utcnow().isoformat()
+        return stats
+    
+    def merge(self, other):
+        """Fold in the partial statistics of another frame or shard"""
+        self.count += other.count
+        for col in self.sums:
+            self.sums[col] += other.sums[col]
+        for col, tally in other.tallies.items():
+            if tally is not None:
+                mine = self.tallies[col]
+                self.tallies[col] = tally if mine is None else mine.add(tally, fill_value=0)
+        return self
+    
+    @classmethod
+    def columns(cls):
+        return list(cls.MEAN_COLUMNS.values()) + list(cls.COUNT_COLUMNS.values())
+
+# ----------------------------------------------------------------------
+# Shard workers
+#
+# Top-level so they can be pickled into a ProcessPoolExecutor. Shards
+# are contiguous row ranges and results are collected in shard order,
+# so the output (and the patient IDs assigned afterwards) does not
+# depend on the number of workers.
+# ----------------------------------------------------------------------
+
+def split_frame(df, parts):
+    """Split a frame into at most `parts` contiguous, non-empty shards"""
+    bounds = np.linspace(0, len(df), max(1, parts) + 1).astype(int)
+    shards = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+    return shards or [df]
+
+def add_counts(total, counts):
+    """Add per-column counts into a running total"""
+    for col, n in counts.items():
+        total[col] = total.get(col, 0) + n
+    return total
+
+def clean_shard(df, medians):
+    """Zero imputation and outlier removal for one shard"""
+    df, replaced = impute_zeros(df, medians)
+    df, removed = remove_outliers(df)
+    return df, replaced, removed
+
+def stats_shard(df):
+    """Partial statistics for one shard"""
+    return StatsAccumulator().add(df)
+
+def process_chunk(df, medians, clean):
+    """
+    Every per-row stage for one chunk of the chunked run
+    
+    Returns (frame, replaced, removed, partial statistics); patient IDs
+    are assigned by the caller, in chunk order.
+    """
+    replaced, removed = {}, {}
+    if clean:
+        df, replaced, removed = clean_shard(df, medians)
+    df = add_features(df)
+    return df, replaced, removed, stats_shard(df)
+
+class ContentHasher:
+    """
+    SHA-256 over processed rows, ignoring VOLATILE_COLUMNS
+    
+    Frames are hashed row by row in order, so the digest does not
+    depend on how the data was chunked.
+    """
+    
+    def __init__(self):
+        self._sha = hashlib.sha256()
+        self._columns = None
+    
+    def update(self, df):
+        stable = df.drop(columns=[c for c in VOLATILE_COLUMNS if c in df.columns])
+        if self._columns is None:
+            self._columns = list(stable.columns)
+            self._sha.update(",".join(self._columns).encode("utf-8"))
+        self._sha.update(pd.util.hash_pandas_object(stable, index=False).to_numpy().tobytes())
+    
+    def hexdigest(self):
+        return self._sha.hexdigest()
+
+def file_fingerprint(path):
+    """SHA-256 of a file's bytes, read in 1 MB blocks"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def fingerprint(*parts):
+    """Stable key for a stage: its inputs' fingerprints and parameters"""
+    return hashlib.sha256(
+        json.dumps([CACHE_VERSION, *parts], sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+class StageCache:
+    """
+    On-disk checkpoints of stage outputs, keyed by fingerprint
+    
+    One Parquet file per stage is kept; dtypes (including categoricals)
+    and the original row positions in the index round-trip exactly.
+    """
+    
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = Path(directory)
+    
+    def _path(self, stage, key):
+        return self.directory / f"{stage}-{key[:16]}.parquet"
+    
+    def load(self, stage, key):
+        path = self._path(stage, key)
+        return pd.read_parquet(path) if path.exists() else None
+    
+    def save(self, stage, key, df):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for stale in self.directory.glob(f"{stage}-*.parquet"):
+            stale.unlink()
+        df.to_parquet(self._path(stage, key))
+
+class IdMap:
+    """
+    Stable patient IDs across runs, keyed by row content
+    
+    A row's key is the hash of its source columns as read from the
+    input, plus an occurrence number (so identical rows get distinct
+    IDs). It is computed before cleaning and carried through it in the
+    ROW_KEY column, so a change of the imputation medians elsewhere in
+    the file does not change it. Rows whose key was seen before keep
+    their patient_id and ingestion_timestamp and are not re-emitted. A
+    row with a new key at the position of a row that changed keeps that
+    row's patient_id with a new ingestion_timestamp; anything else gets
+    the next unused ID.
+    
+    Maps written before keys were taken from the source columns hold
+    keys of the cleaned columns (no KEY_PREFIX). Those are still
+    matched, so the first run after an upgrade does not re-emit every
+    row, and are replaced by source keys as rows are seen.
+    """
+    
+    COLUMNS = ['row_key', 'position', 'patient_id', 'ingestion_timestamp']
+    
+    # Marks keys computed from the source columns
+    KEY_PREFIX = 'src-'
+    
+    def __init__(self, path=CACHE_DIR / "id_map.parquet"):
+        self.path = Path(path)
+        if self.path.exists():
+            self.table = pd.read_parquet(self.path)
+        else:
+            self.table = pd.DataFrame({
+                'row_key': pd.Series(dtype=object),
+                'position': pd.Series(dtype='int64'),
+                'patient_id': pd.Series(dtype=object),
+                'ingestion_timestamp': pd.Series(dtype='int64')
+            })
+    
+    @staticmethod
+    def _hash_keys(df):
+        hashes = pd.util.hash_pandas_object(df[REQUIRED_COLUMNS], index=False)
+        occurrence = hashes.groupby(hashes).cumcount()
+        return hashes.map('{:016x}'.format) + '-' + occurrence.astype(str)
+    
+    @classmethod
+    def row_keys(cls, df):
+        """Keys of source rows; call on the frame as loaded, before cleaning"""
+        return cls.KEY_PREFIX + cls._hash_keys(df)
+    
+    def _next_number(self):
+        numbers = self.table['patient_id'].str.slice(3).astype('int64')
+        return int(numbers.max()) + 1 if len(numbers) else 1
+    
+    def assign(self, df, timestamp):
+        """
+        Add patient_id and ingestion_timestamp columns
+        
+        `df` must carry the ROW_KEY column added by row_keys() before
+        cleaning; it is dropped from the returned frame.
+        
+        Returns (frame, emitted) where emitted marks new or changed rows.
+        """
+        keys = df[ROW_KEY].to_numpy()
+        df = df.drop(columns=ROW_KEY)
+        known = self.table.set_index('row_key')
+        patient_ids = np.array(pd.Series(keys).map(known['patient_id']), dtype=object)
+        timestamps = np.array(pd.Series(keys).map(known['ingestion_timestamp']), dtype='float64')
+        
+        legacy = ~self.table['row_key'].str.startswith(self.KEY_PREFIX)
+        if legacy.any():
+            # Maps from older versions: match on the cleaned columns
+            old_keys = pd.Series(self._hash_keys(df).to_numpy())
+            old = self.table[legacy].set_index('row_key')
+            missing = pd.isna(patient_ids)
+            patient_ids[missing] = old_keys[missing].map(old['patient_id']).to_numpy()
+            timestamps[missing] = old_keys[missing].map(old['ingestion_timestamp']).to_numpy()
+        emitted = pd.isna(patient_ids)
+        
+        # Changed rows reuse the ID of the previous row at their position
+        used = set(patient_ids[~emitted])
+        previous = self.table[self.table['position'] >= 0].set_index('position')['patient_id']
+        next_number = self._next_number()
+        for row in np.flatnonzero(emitted):
+            candidate = previous.get(df.index[row])
+            if candidate is not None and candidate not in used:
+                patient_ids[row] = candidate
+            else:
+                patient_ids[row] = f"PT-{next_number:05d}"
+                next_number += 1
+            used.add(patient_ids[row])
+            timestamps[row] = timestamp
+        
+        out = df.copy()
+        out['patient_id'] = patient_ids
+        out['ingestion_timestamp'] = timestamps.astype('int64')
+        cols = ['patient_id', 'ingestion_timestamp'] + [col for col in df.columns if col not in ['patient_id', 'ingestion_timestamp']]
+        out = out[cols]
+        
+        current = pd.DataFrame({
+            'row_key': keys,
+            'position': df.index.to_numpy(dtype='int64'),
+            'patient_id': patient_ids,
+            'ingestion_timestamp': out['ingestion_timestamp'].to_numpy()
+        })
+        # Keep rows that disappeared so their IDs are never reused
+        retired = self.table[~self.table['patient_id'].isin(used)].assign(position=-1)
+        self._pending = pd.concat([current, retired], ignore_index=True)
+        return out, pd.Series(emitted, index=df.index)
+    
+    def save(self):
+        """Persist the map produced by the last assign()"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._pending.to_parquet(self.path, index=False)
+        self.table = self._pending
+
+def transfer_config(max_concurrency=S3_MAX_CONCURRENCY, part_size_mb=S3_PART_SIZE_MB):
+    """Multipart settings: parts of part_size_mb uploaded max_concurrency at a time"""
+    part_size = part_size_mb * 1024 * 1024
+    return TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=max_concurrency,
+        use_threads=max_concurrency > 1
+    )
+
+def _common_dtype(left, right):
+    """dtype that both chunk dtypes fit into (matches a single read_csv)"""
+    if left == right:
+        return left
+    if pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right):
+        return np.promote_types(left, right)
+    return np.dtype(object)
+
+class CsvSink:
+    """Write processed frames to one CSV file, header first"""
+    
+    def __init__(self, path):
+        self.path = path
+        self._started = False
+    
+    def write(self, df):
+        df.to_csv(self.path, index=False, mode='a' if self._started else 'w', header=not self._started)
+        self._started = True
+    
+    def close(self):
+        pass
+
+class StageProfiler:
+    """
+    Wall time, CPU time, peak memory and row counts per pipeline stage
+    
+    Peak memory comes from one of two sources:
+    - tracemalloc: peak of Python and NumPy allocations while the stage
+      ran. Portable, but slows allocation-heavy code such as to_csv.
+    - rss: the process's peak resident set size, reset per stage through
+      /proc/self/clear_refs. Linux only, with no measurable overhead.
+    
+    CPU time is this process only (worker processes are not included).
+    Stages may nest (process_incremental runs load_data, clean_data,
+    ...); an outer stage's peak covers its inner stages.
+    
+    Parameters:
+    - cprofile_dir: Directory for one cProfile dump per top-level stage
+      (optional)
+    - memory: "tracemalloc" or "rss"
+    """
+    
+    MEMORY_SOURCES = ('tracemalloc', 'rss')
+    
+    def __init__(self, cprofile_dir=None, memory='tracemalloc'):
+        if memory not in self.MEMORY_SOURCES:
+            raise ValueError(f"Unknown memory source: {memory}")
+        if memory == 'rss' and not Path('/proc/self/clear_refs').exists():
+            raise ValueError("rss memory profiling needs Linux /proc")
+        self.cprofile_dir = Path(cprofile_dir) if cprofile_dir else None
+        self.memory = memory
+        self.stages = []
+        self._stack = []
+        self._started = time.perf_counter()
+        self.started_at = datetime.utcnow().isoformat()
+        if memory == 'tracemalloc':
+            tracemalloc.start()
+    
+    def _peak_bytes(self):
+        if self.memory == 'tracemalloc':
+            return tracemalloc.get_traced_memory()[1]
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+    
+    def _reset_peak(self):
+        if self.memory == 'tracemalloc':
+            tracemalloc.reset_peak()
+        else:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+    
+    @contextmanager
+    def stage(self, name, count_rows):
+        """
+        Record one stage
+        
+        Parameters:
+        - name: Stage name (the DataPipeline method)
+        - count_rows: Callable returning the current row count (or None)
+        """
+        if self._stack:
+            parent = self._stack[-1]
+            parent['peak'] = max(parent['peak'], self._peak_bytes())
+        self._reset_peak()
+        
+        record = {'stage': name, 'depth': len(self._stack), 'peak': 0}
+        self._stack.append(record)
+        # Only one cProfile can be active, so nested stages are part of
+        # their parent's dump
+        profile = cProfile.Profile() if self.cprofile_dir and record['depth'] == 0 else None
+        rows_in = count_rows()
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            peak = max(record.pop('peak'), self._peak_bytes())
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            self._reset_peak()
+            
+            record.update({
+                'wall_seconds': round(wall, 6),
+                'cpu_seconds': round(cpu, 6),
+                'peak_memory_mb': round(peak / 2**20, 3),
+                'rows_in': rows_in,
+                'rows_out': count_rows()
+            })
+            if profile:
+                self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+                dump = self.cprofile_dir / f"{len(self.stages):02d}-{name}.prof"
+                profile.dump_stats(dump)
+                record['cprofile'] = str(dump)
+            self.stages.append(record)
+    
+    def report(self, **context):
+        """The run's profile as a JSON-serializable dict"""
+        return {
+            'started_at': self.started_at,
+            'total_wall_seconds': round(time.perf_counter() - self._started, 6),
+            'memory_source': self.memory,
+            **context,
+            'versions': {'python': sys.version.split()[0], 'pandas': pd.__version__, 'numpy': np.__version__},
+            # Completion order: nested stages come before their parent
+            'stages': self.stages
+        }
+    
+    def write(self, path=PROFILE_FILE, **context):
+        with open(path, 'w') as f:
+            json.dump(self.report(**context), f, indent=2)
+        if self.memory == 'tracemalloc':
+            tracemalloc.stop()
+        return path
+
+def stage(method):
+    """Record a DataPipeline step in the run's profile when profiling"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.profiler is None:
+            return method(self, *args, **kwargs)
+        with self.profiler.stage(method.__name__, self._row_count):
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class DataPipeline:
     """Process and upload diabetes dataset"""
     
-    def __init__(self):
+    def __init__(self, chunk_size=None, output_format='csv', partition_by=None,
+                 s3_client=None, transfer=None, incremental=False, workers=PIPELINE_WORKERS,
+                 profiler=None):
         self.df = None
         self.stats = {}
+        self.chunk_size = chunk_size
+        self.output_format = output_format
+        self.partition_by = partition_by or []
+        self.output_path = PARQUET_OUTPUT if output_format == 'parquet' else OUTPUT_FILE
+        self.s3_client = s3_client
+        self.transfer = transfer or transfer_config()
+        self.content = ContentHasher()
+        # Serialized output kept for upload by in-memory runs
+        self._payload = None
+        self.upload_path = self.output_path
+        # Incremental runs: only new or changed rows are uploaded/applied
+        self.incremental = incremental
+        self.delta = None
+        self.delta_path = self.output_path.with_name(
+            self.output_path.stem + "_delta" + self.output_path.suffix
+        )
+        # Per-row stages run on `workers` processes, started on first use
+        self.workers = max(1, workers)
+        self._pool = None
+        # StageProfiler for --profile runs
+        self.profiler = profiler
+    
+    def _row_count(self):
+        if self.df is not None:
+            return len(self.df)
+        # Chunked runs hold no frame; the statistics carry the row count
+        return self.stats.get('total_patients')
     
+    def _map(self, func, shards, *args):
+        """
+        Yield func(shard, *args) for each shard, in shard order
+        
+        With more than one worker the shards are processed on the
+        process pool, at most two per worker in flight so a lazily read
+        input (the chunked run) stays bounded in memory.
+        """
+        if self.workers == 1:
+            for shard in shards:
+                yield func(shard, *args)
+            return
+        
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        pending = deque()
+        for shard in shards:
+            pending.append(self._pool.submit(func, shard, *args))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    
+    def close(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+    
+    @stage
     def load_data(self):
         """Load diabetes dataset from CSV"""
         print("Loading dataset...")
@@ -46,195 +678,359 @@ class DataPipeline:
         print(f"Columns: {list(self.df.columns)}")
         return self
     
+    @stage
     def validate_data(self):
         """Validate dataset structure and content"""
         print("\nValidating data...")
         
-        required_columns = [
-            'Pregnancies', 'Glucose', 'BloodPressure',
-            'SkinThickness', 'Insulin', 'BMI',
-            'DiabetesPedigreeFunction', 'Age', 'Outcome'
-        ]
-        
-        # Check columns
-        missing = set(required_columns) - set(self.df.columns)
-        if missing:
-            raise ValueError(f"Missing columns: {missing}")
+        null_counts, issues = check_frame(self.df)
+        self._report_validation(null_counts, issues)
         
-        # Check for nulls
-        null_counts = self.df[required_columns].isnull().sum()
+        print("Validation complete")
+        return self
+    
+    def _report_validation(self, null_counts, issues):
         if null_counts.any():
             print(f"WARNING: Found null values:\n{null_counts[null_counts > 0]}")
         
-        # Check value ranges
-        issues = []
-        if (self.df['Glucose'] > 300).any():
-            issues.append("Glucose > 300")
-        if (self.df['BloodPressure'] > 200).any():
-            issues.append("BloodPressure > 200")
-        if (self.df['BMI'] > 60).any():
-            issues.append("BMI > 60")
-        
         if issues:
             print(f"WARNING: Found outliers: {', '.join(issues)}")
-        
-        print("Validation complete")
-        return self
     
+    @stage
     def clean_data(self):
         """Clean and transform dataset"""
         print("\nCleaning data...")
         
         # Replace zero values with median (medical impossibility)
-        zero_cols = ['Glucose', 'BloodPressure', 'BMI']
-        for col in zero_cols:
-            if col in self.df.columns:
-                median = self.df[self.df[col] != 0][col].median()
-                zero_count = (self.df[col] == 0).sum()
-                if zero_count > 0:
-                    print(f"Replacing {zero_count} zero values in {col} with median {median}")
-                    self.df.loc[self.df[col] == 0, col] = median
-        
-        # Remove extreme outliers
-        outlier_threshold = {
-            'Glucose': (40, 300),
-            'BloodPressure': (40, 200),
-            'BMI': (15, 60)
+        medians = {
+            col: self.df[self.df[col] != 0][col].median()
+            for col in ZERO_COLUMNS if col in self.df.columns
         }
         
-        for col, (min_val, max_val) in outlier_threshold.items():
-            if col in self.df.columns:
-                removed = len(self.df[(self.df[col] < min_val) | (self.df[col] > max_val)])
-                if removed > 0:
-                    print(f"Removing {removed} outliers from {col}")
-                    self.df = self.df[(self.df[col] >= min_val) & (self.df[col] <= max_val)]
+        # Remove extreme outliers; both steps are per row, so shards are
+        # cleaned independently with the medians of the whole dataset
+        shards, replaced, removed = [], {}, {}
+        for shard, shard_replaced, shard_removed in self._map(
+                clean_shard, split_frame(self.df, self.workers), medians):
+            shards.append(shard)
+            add_counts(replaced, shard_replaced)
+            add_counts(removed, shard_removed)
+        self.df = pd.concat(shards) if len(shards) > 1 else shards[0]
+        self._report_imputation(replaced, medians)
+        self._report_outliers(removed)
         
         print(f"Records after cleaning: {len(self.df)}")
         return self
     
+    def _report_imputation(self, replaced, medians):
+        for col, zero_count in replaced.items():
+            if zero_count > 0:
+                print(f"Replacing {zero_count} zero values in {col} with median {medians[col]}")
+    
+    def _report_outliers(self, removed):
+        for col, count in removed.items():
+            if count > 0:
+                print(f"Removing {count} outliers from {col}")
+    
+    @stage
     def anonymize_data(self):
         """Add patient IDs and anonymize"""
         print("\nAnonymizing data...")
         
-        # Generate patient IDs
-        self.df['patient_id'] = [f"PT-{i:05d}" for i in range(1, len(self.df) + 1)]
-        
-        # Add timestamp
-        self.df['ingestion_timestamp'] = int(datetime.utcnow().timestamp())
-        
-        # Reorder columns
-        cols = ['patient_id', 'ingestion_timestamp'] + [col for col in self.df.columns if col not in ['patient_id', 'ingestion_timestamp']]
-        self.df = self.df[cols]
+        # Generate patient IDs and add timestamp
+        self.df = assign_ids(self.df, 1, int(datetime.utcnow().timestamp()))
         
         print("Anonymization complete")
         return self
     
+    @stage
     def engineer_features(self):
         """Create derived features for analysis"""
         print("\nEngineering features...")
         
-        # Risk score (0-1 scale)
-        self.df['risk_score'] = (
-            (self.df['Glucose'] / 200) * 0.3 +
-            (self.df['BMI'] / 50) * 0.2 +
-            (self.df['Age'] / 100) * 0.2 +
-            (self.df['BloodPressure'] / 150) * 0.15 +
-            (self.df['DiabetesPedigreeFunction']) * 0.15
-        ).clip(0, 1)
-        
-        # Risk level categories
-        self.df['risk_level'] = pd.cut(
-            self.df['risk_score'],
-            bins=[0, 0.3, 0.5, 0.7, 1.0],
-            labels=['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
-        )
-        
-        # Age groups
-        self.df['age_group'] = pd.cut(
-            self.df['Age'],
-            bins=[0, 30, 40, 50, 60, 100],
-            labels=['<30', '30-40', '40-50', '50-60', '60+']
-        )
-        
-        # BMI categories
-        self.df['bmi_category'] = pd.cut(
-            self.df['BMI'],
-            bins=[0, 18.5, 25, 30, 100],
-            labels=['Underweight', 'Normal', 'Overweight', 'Obese']
-        )
+        shards = list(self._map(add_features, split_frame(self.df, self.workers)))
+        self.df = pd.concat(shards) if len(shards) > 1 else shards[0]
         
         print("Feature engineering complete")
         return self
     
+    @stage
     def generate_statistics(self):
         """Calculate dataset statistics"""
         print("\nGenerating statistics...")
         
-        self.stats = {
-            'total_patients': len(self.df),
-            'diabetes_prevalence': float(self.df['Outcome'].mean()),
-            'avg_age': float(self.df['Age'].mean()),
-            'avg_glucose': float(self.df['Glucose'].mean()),
-            'avg_bmi': float(self.df['BMI'].mean()),
-            'risk_distribution': {
-                str(k): int(v) for k, v in self.df['risk_level'].value_counts().to_dict().items()
-            },
-            'age_distribution': {
-                str(k): int(v) for k, v in self.df['age_group'].value_counts().to_dict().items()
-            },
-            'processing_timestamp': datetime.utcnow().isoformat()
-        }
+        stats = StatsAccumulator()
+        columns = self.df[StatsAccumulator.columns()]
+        for partial in self._map(stats_shard, split_frame(columns, self.workers)):
+            stats.merge(partial)
+        self.stats = stats.result()
+        self._report_statistics()
         
+        return self
+    
+    def _report_statistics(self):
         print("Statistics:")
         print(f"  Total patients: {self.stats['total_patients']}")
         print(f"  Diabetes prevalence: {self.stats['diabetes_prevalence']:.1%}")
         print(f"  Average age: {self.stats['avg_age']:.1f}")
         print(f"  Average glucose: {self.stats['avg_glucose']:.1f}")
         print(f"  Risk distribution: {self.stats['risk_distribution']}")
-        
-        return self
     
+    @stage
     def save_local(self):
         """Save processed data locally"""
-        print(f"\nSaving to {OUTPUT_FILE}...")
+        print(f"\nSaving to {self.output_path}...")
+        
+        payload = self._write_output(self.df, self.output_path)
+        if self.delta is None:
+            self.content.update(self.df)
+            self._payload = payload
+        else:
+            print(f"Saving {len(self.delta)} new or changed records to {self.delta_path}...")
+            self.content.update(self.delta)
+            self._payload = self._write_output(self.delta, self.delta_path)
+            self.upload_path = self.delta_path
+            self.ids.save()
+        self.save_statistics()
+        
+        print("Local save complete")
+        return self
+    
+    def _write_output(self, df, path):
+        """
+        Write a frame in the configured format
+        
+        Returns the serialized bytes for single-file output; they are
+        uploaded from memory by upload_to_s3 instead of re-reading the file.
+        """
+        if self.partition_by:
+            sink = ParquetSink(path, partition_by=self.partition_by)
+            sink.write(df)
+            sink.close()
+            return None
+        
+        if self.output_format == 'parquet':
+            payload = parquet_bytes(df)
+        else:
+            payload = df.to_csv(index=False).encode('utf-8')
+        if path.is_dir():
+            shutil.rmtree(path)
+        path.write_bytes(payload)
+        return payload
+    
+    @stage
+    def process_incremental(self, clean=True):
+        """
+        Checkpointed run that only emits new or changed rows
+        
+        The cleaned and feature-engineered frames are cached under
+        data/.cache keyed by the input file's fingerprint and the stage
+        parameters, so an unchanged input skips loading, validation,
+        cleaning and feature engineering. IDs come from the IdMap: rows
+        seen before keep their patient_id and ingestion_timestamp, and
+        only new or changed rows end up in the delta output that is
+        uploaded and applied to the aggregates.
+        
+        Parameters:
+        - clean: Apply zero imputation and outlier removal
+        """
+        cache = StageCache()
+        print("Fingerprinting input...")
+        clean_key = fingerprint(
+            'clean', file_fingerprint(INPUT_FILE), clean, ZERO_COLUMNS, OUTLIER_THRESHOLDS, ROW_KEY
+        )
+        feature_key = fingerprint('features', clean_key, SCORER.describe())
+        
+        self.df = cache.load('features', feature_key)
+        if self.df is not None:
+            print("Input unchanged; using cached features")
+        else:
+            self.df = cache.load('clean', clean_key)
+            if self.df is not None:
+                print("Using cached clean stage")
+            else:
+                self.load_data()
+                self.validate_data()
+                # Keyed on the source values, before imputation rewrites them
+                self.df[ROW_KEY] = IdMap.row_keys(self.df)
+                if clean:
+                    self.clean_data()
+                cache.save('clean', clean_key, self.df)
+            self.engineer_features()
+            cache.save('features', feature_key, self.df)
         
-        self.df.to_csv(OUTPUT_FILE, index=False)
+        print("\nAssigning patient IDs...")
+        self.ids = IdMap()
+        self.df, emitted = self.ids.assign(self.df, int(datetime.utcnow().timestamp()))
+        self.delta = self.df[emitted]
+        print(f"{len(self.delta)} new or changed records, {int((~emitted).sum())} unchanged")
         
-        # Save statistics
+        self.generate_statistics()
+        return self
+    
+    @stage
+    def save_statistics(self):
+        """Write statistics.json next to the processed CSV"""
         stats_file = DATA_DIR / "statistics.json"
         with open(stats_file, 'w') as f:
             json.dump(self.stats, f, indent=2)
+        return self
+    
+    def _open_sink(self):
+        if self.output_format == 'parquet':
+            return ParquetSink(self.output_path, partition_by=self.partition_by)
+        return CsvSink(self.output_path)
+    
+    def _read_chunks(self, dtype=None):
+        return pd.read_csv(INPUT_FILE, chunksize=self.chunk_size, dtype=dtype)
+    
+    @stage
+    def scan_input(self, clean=True):
+        """
+        First pass of the chunked run: validate every chunk and collect
+        what the second pass needs globally
         
-        print("Local save complete")
+        Returns (column dtypes, zero-imputation medians). Medians are
+        exact: the non-zero value counts of each ZERO_COLUMNS column are
+        accumulated (bounded by the number of distinct values) and the
+        median is read off the combined counts.
+        """
+        print(f"Scanning dataset in chunks of {self.chunk_size} rows...")
+        
+        if not INPUT_FILE.exists():
+            raise FileNotFoundError(
+                f"Dataset not found: {INPUT_FILE}\n"
+                f"Run: python scripts/download-dataset.py"
+            )
+        
+        rows = 0
+        dtypes = {}
+        null_counts = None
+        issues = []
+        value_counts = {col: pd.Series(dtype='int64') for col in ZERO_COLUMNS}
+        
+        for chunk in self._read_chunks():
+            rows += len(chunk)
+            for col, dtype in chunk.dtypes.items():
+                dtypes[col] = _common_dtype(dtypes.get(col, dtype), dtype)
+            
+            nulls, chunk_issues = check_frame(chunk)
+            null_counts = nulls if null_counts is None else null_counts + nulls
+            issues.extend(i for i in chunk_issues if i not in issues)
+            
+            if clean:
+                for col in ZERO_COLUMNS:
+                    counts = chunk.loc[chunk[col] != 0, col].value_counts()
+                    value_counts[col] = value_counts[col].add(counts, fill_value=0)
+        
+        print(f"Loaded {rows} records")
+        print(f"Columns: {list(dtypes)}")
+        print("\nValidating data...")
+        self._report_validation(null_counts, issues)
+        print("Validation complete")
+        
+        medians = {col: median_from_counts(counts) for col, counts in value_counts.items()}
+        return dtypes, medians
+    
+    @stage
+    def process_chunked(self, clean=True):
+        """
+        Bounded-memory run: clean, anonymize, engineer features and
+        accumulate statistics chunk by chunk, appending each processed
+        chunk to the output CSV
+        
+        Produces the same CSV and statistics as the in-memory path;
+        only one chunk is held in memory at a time.
+        
+        Parameters:
+        - clean: Apply zero imputation and outlier removal
+        """
+        dtypes, medians = self.scan_input(clean)
+        
+        print("\nProcessing chunks...")
+        timestamp = int(datetime.utcnow().timestamp())
+        next_id = 1
+        replaced_total = {}
+        removed_total = {}
+        stats = StatsAccumulator()
+        sink = self._open_sink()
+        
+        # Chunks are processed on the worker pool; IDs are assigned here,
+        # in input order, as the results come back
+        chunks = self._read_chunks(dtype=dtypes)
+        for chunk, replaced, removed, partial in self._map(process_chunk, chunks, medians, clean):
+            add_counts(replaced_total, replaced)
+            add_counts(removed_total, removed)
+            
+            chunk = assign_ids(chunk, next_id, timestamp)
+            next_id += len(chunk)
+            stats.merge(partial)
+            self.content.update(chunk)
+            
+            sink.write(chunk)
+        
+        sink.close()
+        if clean:
+            self._report_imputation(replaced_total, medians)
+            self._report_outliers(removed_total)
+            print(f"Records after cleaning: {stats.count}")
+        
+        print(f"\nWrote {stats.count} records to {self.output_path}")
+        print("\nGenerating statistics...")
+        self.stats = stats.result()
+        self._report_statistics()
         return self
     
+    @stage
     def upload_to_s3(self):
-        """Upload processed data to S3"""
+        """
+        Upload processed data and statistics to S3
+        
+        Keys are content-addressed (processed rows hashed without
+        VOLATILE_COLUMNS) and the hash is stored in the object metadata.
+        Artifacts already in the bucket with the same hash are skipped,
+        so an unchanged dataset does not re-trigger Lambda processing.
+        Files are sent with multipart uploads (S3_PART_SIZE_MB parts,
+        S3_MAX_CONCURRENCY at a time).
+        """
         print(f"\nUploading to S3 bucket: {S3_BUCKET}...")
         
         try:
-            s3_client = boto3.client('s3', region_name=AWS_REGION)
-            
-            # Upload CSV
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            s3_key = f"processed/diabetes_processed_{timestamp}.csv"
-            
-            s3_client.upload_file(
-                str(OUTPUT_FILE),
-                S3_BUCKET,
-                s3_key
+            s3_client = self.s3_client or boto3.client(
+                's3',
+                region_name=AWS_REGION,
+                endpoint_url=S3_ENDPOINT_URL
             )
-            print(f"Uploaded: s3://{S3_BUCKET}/{s3_key}")
             
-            # Upload statistics
-            stats_key = f"statistics/stats_{timestamp}.json"
-            s3_client.put_object(
-                Bucket=S3_BUCKET,
-                Key=stats_key,
-                Body=json.dumps(self.stats, indent=2),
-                ContentType='application/json'
+            # Upload processed data (CSV, Parquet file or every file
+            # of a partitioned Parquet dataset)
+            digest = self.content.hexdigest()
+            objects = list(self._output_objects(digest[:16]))
+            if self.delta is not None and self.delta.empty:
+                print("No new or changed records; nothing to upload")
+                objects = []
+            with ThreadPoolExecutor(max_workers=max(1, min(len(objects), S3_MAX_CONCURRENCY))) as pool:
+                list(pool.map(
+                    lambda obj: self._upload_object(s3_client, *obj, digest),
+                    objects
+                ))
+            
+            # Upload statistics; the processing timestamp and float
+            # summation noise are ignored when deciding whether they changed
+            stable_stats = {
+                k: round(v, 9) if isinstance(v, float) else v
+                for k, v in self.stats.items() if k != 'processing_timestamp'
+            }
+            stats_digest = hashlib.sha256(
+                json.dumps(stable_stats, sort_keys=True).encode('utf-8')
+            ).hexdigest()
+            self._upload_object(
+                s3_client,
+                json.dumps(self.stats, indent=2).encode('utf-8'),
+                f"statistics/stats_{stats_digest[:16]}.json",
+                'application/json',
+                stats_digest
             )
-            print(f"Uploaded: s3://{S3_BUCKET}/{stats_key}")
             
             print("S3 upload complete")
             
@@ -243,30 +1039,119 @@ class DataPipeline:
             raise
         
         return self
+    
+    def _output_objects(self, tag):
+        """(bytes or local path, S3 key, content type) for the processed output"""
+        name = f"processed/diabetes_processed_{tag}"
+        content_type = 'text/csv' if self.output_format == 'csv' else 'application/vnd.apache.parquet'
+        if self._payload is not None:
+            yield self._payload, name + self.upload_path.suffix, content_type
+        elif self.upload_path.is_dir():
+            for path in sorted(self.upload_path.rglob("*.parquet")):
+                yield path, f"{name}/{path.relative_to(self.upload_path).as_posix()}", content_type
+        else:
+            yield self.upload_path, name + self.upload_path.suffix, content_type
+    
+    def _upload_object(self, s3_client, source, key, content_type, digest):
+        """Upload bytes or a file unless the same content is already at key"""
+        if self._is_uploaded(s3_client, key, digest):
+            print(f"Unchanged, skipped: s3://{S3_BUCKET}/{key}")
+            return False
+        
+        extra_args = {
+            'ContentType': content_type,
+            'Metadata': {CONTENT_HASH_KEY: digest}
+        }
+        if isinstance(source, Path):
+            with open(source, 'rb') as f:
+                s3_client.upload_fileobj(f, S3_BUCKET, key, ExtraArgs=extra_args, Config=self.transfer)
+        else:
+            s3_client.upload_fileobj(io.BytesIO(source), S3_BUCKET, key, ExtraArgs=extra_args, Config=self.transfer)
+        print(f"Uploaded: s3://{S3_BUCKET}/{key}")
+        return True
+    
+    def _is_uploaded(self, s3_client, key, digest):
+        try:
+            head = s3_client.head_object(Bucket=S3_BUCKET, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return head.get('Metadata', {}).get(CONTENT_HASH_KEY) == digest
 
 def main():
     parser = argparse.ArgumentParser(description='AIER Data Pipeline')
     parser.add_argument('--upload', action='store_true', help='Upload to AWS S3')
     parser.add_argument('--skip-clean', action='store_true', help='Skip data cleaning')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Process the input in chunks of N rows with bounded memory')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help='Processed output format')
+    parser.add_argument('--partition-by', default='',
+                        help=f"Comma-separated Parquet partition columns ({', '.join(PARTITION_COLUMNS)})")
+    parser.add_argument('--incremental', action='store_true',
+                        help='Reuse cached stages and IDs; only emit new or changed rows')
+    parser.add_argument('--workers', type=int, default=PIPELINE_WORKERS,
+                        help='Worker processes for cleaning, features and statistics')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'Record per-stage time, memory and rows to {PROFILE_FILE.name}')
+    parser.add_argument('--profile-memory', choices=StageProfiler.MEMORY_SOURCES, default='tracemalloc',
+                        help='Peak memory source for --profile (rss: Linux, no overhead)')
+    parser.add_argument('--cprofile', action='store_true',
+                        help=f'With --profile, also dump cProfile stats per stage to {CPROFILE_DIR.name}/')
     args = parser.parse_args()
     
+    partition_by = [c.strip() for c in args.partition_by.split(',') if c.strip()]
+    if partition_by and args.format != 'parquet':
+        parser.error('--partition-by requires --format parquet')
+    if set(partition_by) - set(PARTITION_COLUMNS):
+        parser.error(f"--partition-by must be one of: {', '.join(PARTITION_COLUMNS)}")
+    if args.incremental and args.chunk_size:
+        parser.error('--incremental runs in memory; drop --chunk-size')
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.cprofile and not args.profile:
+        parser.error('--cprofile requires --profile')
+    
     print("=" * 60)
     print("AIER Alert System - Data Pipeline")
     print("=" * 60)
     print("")
     
+    pipeline = None
+    profiler = None
+    if args.profile:
+        try:
+            profiler = StageProfiler(CPROFILE_DIR if args.cprofile else None, memory=args.profile_memory)
+        except ValueError as e:
+            parser.error(str(e))
     try:
-        pipeline = DataPipeline()
-        pipeline.load_data()
-        pipeline.validate_data()
-        
-        if not args.skip_clean:
-            pipeline.clean_data()
+        pipeline = DataPipeline(
+            chunk_size=args.chunk_size,
+            output_format=args.format,
+            partition_by=partition_by,
+            incremental=args.incremental,
+            workers=args.workers,
+            profiler=profiler
+        )
         
-        pipeline.anonymize_data()
-        pipeline.engineer_features()
-        pipeline.generate_statistics()
-        pipeline.save_local()
+        if args.chunk_size:
+            pipeline.process_chunked(clean=not args.skip_clean)
+            pipeline.save_statistics()
+        elif args.incremental:
+            pipeline.process_incremental(clean=not args.skip_clean)
+            pipeline.save_local()
+        else:
+            pipeline.load_data()
+            pipeline.validate_data()
+            
+            if not args.skip_clean:
+                pipeline.clean_data()
+            
+            pipeline.anonymize_data()
+            pipeline.engineer_features()
+            pipeline.generate_statistics()
+            pipeline.save_local()
         
         if args.upload:
             pipeline.upload_to_s3()
@@ -279,8 +1164,10 @@ def main():
         print("=" * 60)
         print("")
         print("Output files:")
-        print(f"  {OUTPUT_FILE}")
+        print(f"  {pipeline.output_path}")
         print(f"  {DATA_DIR / 'statistics.json'}")
+        if args.profile:
+            print(f"  {PROFILE_FILE}")
         print("")
         
         if args.upload:
@@ -296,6 +1183,18 @@ def main():
     except Exception as e:
         print(f"\nERROR: Pipeline failed - {e}")
         sys.exit(1)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+        if profiler is not None:
+            # Written for failed runs too, covering the stages that ran
+            path = profiler.write(
+                workers=args.workers,
+                chunk_size=args.chunk_size,
+                format=args.format,
+                incremental=args.incremental
+            )
+            print(f"Profile written to {path}")
 
 if __name__ == "__main__":
     main()
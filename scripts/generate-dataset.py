@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+AIER Alert System - Synthetic Dataset Generator
+Writes diabetes-schema CSVs of any size without network access
+
+Columns follow the Pima Indians diabetes dataset: vitals are sampled
+per outcome class with vectorized NumPy draws, zeros are injected at
+the rates seen in the real data (e.g. half of Insulin), and a small
+share of rows get implausible values so the pipeline's outlier
+removal has work to do. Rows are generated and appended in chunks, so
+memory stays flat for millions of rows; a given seed, size and chunk
+size always produce the same file.
+
+Usage:
+    python scripts/generate-dataset.py --rows 1000000
+    python scripts/generate-dataset.py --rows 5000000 --output /tmp/diabetes.csv
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+OUTPUT_FILE = Path(__file__).parent.parent / "data" / "diabetes.csv"
+
+COLUMNS = [
+    'Pregnancies', 'Glucose', 'BloodPressure',
+    'SkinThickness', 'Insulin', 'BMI',
+    'DiabetesPedigreeFunction', 'Age', 'Outcome'
+]
+
+# Share of diabetic patients in the source dataset
+OUTCOME_RATE = 0.349
+
+# Share of zero ("not measured") values per column in the source dataset
+ZERO_RATES = {
+    'Glucose': 0.0065,
+    'BloodPressure': 0.0456,
+    'SkinThickness': 0.2956,
+    'Insulin': 0.4870,
+    'BMI': 0.0143,
+}
+
+# Values outside the pipeline's OUTLIER_THRESHOLDS, drawn for a share
+# (--outlier-rate) of rows in each column
+OUTLIER_RANGES = {
+    'Glucose': (301, 600),
+    'BloodPressure': (201, 300),
+    'BMI': (60.1, 90.0),
+}
+
+
+def generate_chunk(rng: np.random.Generator, rows: int, outlier_rate: float) -> pd.DataFrame:
+    """One chunk of synthetic patients"""
+    outcome = rng.random(rows) < OUTCOME_RATE
+    diabetic = outcome.astype(np.float64)
+
+    df = pd.DataFrame({
+        'Pregnancies': rng.poisson(3.3 + 1.6 * diabetic).clip(0, 17),
+        'Glucose': rng.normal(110 + 31 * diabetic, 25 + 6 * diabetic).round().clip(44, 199),
+        'BloodPressure': rng.normal(70.9 + 4.4 * diabetic, 12).round().clip(24, 122),
+        'SkinThickness': rng.normal(27.2 + 5.5 * diabetic, 10).round().clip(7, 99),
+        'Insulin': rng.lognormal(4.7 + 0.3 * diabetic, 0.6).round().clip(14, 846),
+        'BMI': rng.normal(30.9 + 4.5 * diabetic, 6.5).round(1).clip(18.2, 67.1),
+        'DiabetesPedigreeFunction': (rng.gamma(2.0, 0.2 + 0.07 * diabetic) + 0.078).round(3).clip(0.078, 2.42),
+        'Age': (21 + rng.gamma(1.3 + 0.9 * diabetic, 9.0)).astype(np.int64).clip(21, 81),
+        'Outcome': outcome.astype(np.int64),
+    }, columns=COLUMNS)
+
+    for col, rate in ZERO_RATES.items():
+        df.loc[rng.random(rows) < rate, col] = 0
+    if outlier_rate > 0:
+        for col, (low, high) in OUTLIER_RANGES.items():
+            mask = rng.random(rows) < outlier_rate
+            values = rng.uniform(low, high, int(mask.sum()))
+            df.loc[mask, col] = values.round(1) if col == 'BMI' else values.round()
+
+    # Integer columns stay integers in the CSV, like the Kaggle file
+    for col in ('Glucose', 'BloodPressure', 'SkinThickness', 'Insulin'):
+        df[col] = df[col].astype(np.int64)
+    return df
+
+
+def generate(path, rows: int, seed: int = 0, outlier_rate: float = 0.002, chunk_size: int = 500_000) -> int:
+    """
+    Write `rows` synthetic patients to a CSV file
+
+    Parameters:
+    - path: Output CSV
+    - rows: Number of patients
+    - seed: Random seed
+    - outlier_rate: Share of rows per OUTLIER_RANGES column given an implausible value
+    - chunk_size: Rows generated and written at a time
+    """
+    rng = np.random.default_rng(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    written = 0
+    with open(path, 'w', newline='') as f:
+        f.write(",".join(COLUMNS) + "\n")
+        while written < rows:
+            chunk = generate_chunk(rng, min(chunk_size, rows - written), outlier_rate)
+            chunk.to_csv(f, index=False, header=False)
+            written += len(chunk)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AIER Synthetic Dataset Generator')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Number of patients to generate')
+    parser.add_argument('--output', default=str(OUTPUT_FILE), help='Output CSV path')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--outlier-rate', type=float, default=0.002,
+                        help='Share of rows per column with implausible Glucose/BloodPressure/BMI')
+    parser.add_argument('--chunk-size', type=int, default=500_000, help='Rows generated per chunk')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = generate(args.output, args.rows, args.seed, args.outlier_rate, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {rows:,} rows to {args.output} in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
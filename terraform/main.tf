@@ -107,6 +107,10 @@ resource "aws_dynamodb_table" "patient_data" {
   hash_key       = "patient_id"
   range_key      = "timestamp"
   
+  # Change stream read by the API's alert feed (/api/alerts/stream)
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+  
   attribute {
     name = "patient_id"
     type = "S"
@@ -127,6 +131,16 @@ resource "aws_dynamodb_table" "patient_data" {
     type = "S"
   }
   
+  attribute {
+    name = "sync_day"
+    type = "S"
+  }
+  
+  attribute {
+    name = "synced_at"
+    type = "N"
+  }
+  
   # Global Secondary Index for risk level queries
   global_secondary_index {
     name            = "RiskLevelIndex"
@@ -143,11 +157,74 @@ resource "aws_dynamodb_table" "patient_data" {
     projection_type = "ALL"
   }
   
+  # Global Secondary Index for delta sync (/api/sync): items by loader
+  # write time. sync_day is "<UTC date>#<shard>", the shard derived from
+  # patient_id, so a day's writes spread over SYNC_SHARDS partitions
+  global_secondary_index {
+    name            = "SyncIndex"
+    hash_key        = "sync_day"
+    range_key       = "synced_at"
+    projection_type = "ALL"
+  }
+  
   tags = {
     Name = "AIER Patient Data"
   }
 }
 
+# DynamoDB Table for delta sync tombstones
+# One item per deleted patient record, keyed like SyncIndex; expired by
+# TTL once no client watermark can be older (SYNC_RETENTION_DAYS)
+resource "aws_dynamodb_table" "patient_tombstones" {
+  name         = "${var.project_name}-patient-tombstones"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "sync_day"
+  range_key    = "tombstone_key"
+  
+  attribute {
+    name = "sync_day"
+    type = "S"
+  }
+  
+  attribute {
+    name = "tombstone_key"
+    type = "S"
+  }
+  
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+  
+  tags = {
+    Name = "AIER Patient Tombstones"
+  }
+}
+
+# DynamoDB Table for materialized patient aggregates
+# Single item of flat counters updated with ADD on every ingestion
+# Read by /api/statistics and /api/visualizations/distribution
+# Loader chunk markers (applied#...) expire by TTL (AGGREGATE_MARKER_DAYS)
+resource "aws_dynamodb_table" "patient_aggregates" {
+  name         = "${var.project_name}-patient-aggregates"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "aggregate_id"
+  
+  attribute {
+    name = "aggregate_id"
+    type = "S"
+  }
+  
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+  
+  tags = {
+    Name = "AIER Patient Aggregates"
+  }
+}
+
 # IAM Role for Lambda Execution
 resource "aws_iam_role" "lambda_execution" {
   name = "${var.project_name}-lambda-execution"
@@ -200,9 +277,13 @@ resource "aws_iam_role_policy" "lambda_policy" {
         Action = [
           "dynamodb:PutItem",
           "dynamodb:BatchWriteItem",
+          "dynamodb:BatchGetItem",
           "dynamodb:UpdateItem"
         ]
-        Resource = aws_dynamodb_table.patient_data.arn
+        Resource = [
+          aws_dynamodb_table.patient_data.arn,
+          aws_dynamodb_table.patient_aggregates.arn
+        ]
       }
     ]
   })
@@ -220,8 +301,9 @@ resource "aws_lambda_function" "data_processor" {
   
   environment {
     variables = {
-      DYNAMODB_TABLE_NAME = aws_dynamodb_table.patient_data.name
-      S3_BUCKET_NAME      = aws_s3_bucket.data_storage.id
+      DYNAMODB_TABLE_NAME   = aws_dynamodb_table.patient_data.name
+      AGGREGATES_TABLE_NAME = aws_dynamodb_table.patient_aggregates.name
+      S3_BUCKET_NAME        = aws_s3_bucket.data_storage.id
     }
   }
   
@@ -240,6 +322,13 @@ resource "aws_s3_bucket_notification" "data_upload" {
     filter_prefix       = "processed/"
     filter_suffix       = ".csv"
   }
+  
+  lambda_function {
+    lambda_function_arn = aws_lambda_function.data_processor.arn
+    events              = ["s3:ObjectCreated:*"]
+    filter_prefix       = "processed/"
+    filter_suffix       = ".parquet"
+  }
 }
 
 # Lambda Permission for S3
@@ -329,6 +418,21 @@ output "dynamodb_table_name" {
   value       = aws_dynamodb_table.patient_data.name
 }
 
+output "patient_data_stream_arn" {
+  description = "DynamoDB Stream of the patient table, read by the alert feed"
+  value       = aws_dynamodb_table.patient_data.stream_arn
+}
+
+output "tombstones_table_name" {
+  description = "DynamoDB table name for delta sync tombstones"
+  value       = aws_dynamodb_table.patient_tombstones.name
+}
+
+output "aggregates_table_name" {
+  description = "DynamoDB table name for materialized patient aggregates"
+  value       = aws_dynamodb_table.patient_aggregates.name
+}
+
 output "cloudfront_url" {
   description = "CloudFront distribution URL"
   value       = "https://${aws_cloudfront_distribution.frontend.domain_name}"